@@ -1,11 +1,23 @@
 from django.contrib import admin
-from .models import League, Season, Team, Game, LeagueStanding
+from . import search
+from .models import League, Season, Team, Game, LeagueStanding, Job
+
+
+class FullTextSearchMixin:
+    """Answer the changelist search box from the full-text index instead of LIKE scans."""
+    search_kind = None
+
+    def get_search_results(self, request, queryset, search_term):
+        if not search_term or not search.is_available():
+            return super().get_search_results(request, queryset, search_term)
+        return queryset.filter(pk__in=search.matching_ids(search_term, self.search_kind)), False
 
 
 @admin.register(League)
-class LeagueAdmin(admin.ModelAdmin):
+class LeagueAdmin(FullTextSearchMixin, admin.ModelAdmin):
     list_display = ('name', 'country', 'created_at')
     search_fields = ('name', 'country')
+    search_kind = 'league'
     list_filter = ('country',)
 
 
@@ -30,10 +42,11 @@ class SeasonAdmin(admin.ModelAdmin):
 
 
 @admin.register(Team)
-class TeamAdmin(admin.ModelAdmin):
+class TeamAdmin(FullTextSearchMixin, admin.ModelAdmin):
     list_display = ('name', 'league', 'short_name', 'founded_year', 'created_at')
     list_filter = ('league',)
     search_fields = ('name', 'short_name')
+    search_kind = 'team'
 
 
 @admin.register(Game)
@@ -65,3 +78,13 @@ class LeagueStandingAdmin(admin.ModelAdmin):
 
     def has_add_permission(self, request):
         return False  # Standings are automatically generated
+
+
+@admin.register(Job)
+class JobAdmin(admin.ModelAdmin):
+    list_display = ('id', 'kind', 'status', 'priority', 'attempts', 'progress', 'created_at', 'finished_at')
+    list_filter = ('status', 'kind')
+    search_fields = ('dedup_key',)
+    readonly_fields = ('attempts', 'progress', 'progress_message', 'result', 'error', 'worker',
+                       'heartbeat_at', 'created_at', 'started_at', 'finished_at')
+    ordering = ('-created_at',)
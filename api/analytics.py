@@ -0,0 +1,149 @@
+"""Goal-timing analytics for a season, computed with NumPy.
+
+A season's played games and credited goals are loaded once as integer
+columns; every figure below is then a handful of array operations over all
+teams at once (``bincount`` per team and minute bucket, a per-game running
+score difference from a cumulative sum), instead of queries or loops per
+team and game. Results are cached per season data version (see ``api.versioning``).
+
+Per team:
+    scored / conceded per 15-minute bucket (stoppage time counts in the last one)
+    scored_first / conceded_first: games, won, drawn, lost and the win rate
+    comebacks: games won after trailing; leads_lost: games lost after leading
+    penalty_share / own_goal_share: of the goals credited to the team
+
+Game results come from the recorded scores; who led when comes from the
+goal rows, so games whose goals do not add up to the score may disagree.
+"""
+import numpy as np
+
+from . import metrics
+from .models import Game, Goal, Team
+from .versioning import season_scope, versioned_key
+
+BUCKET_MINUTES = 15
+BUCKETS = ('1-15', '16-30', '31-45', '46-60', '61-75', '76-90+')
+CACHE_TIMEOUT = 60 * 60
+
+
+def _columns(queryset, fields):
+    """``values_list`` rows as a 2-D int64 array with one column per field."""
+    rows = list(queryset.order_by().values_list(*fields))
+    return np.array(rows, dtype=np.int64).reshape(len(rows), len(fields))
+
+
+def _rate(won, games):
+    return round(won / games, 3) if games else None
+
+
+def build_goal_timing(season):
+    """Goal-timing figures for every team of ``season`` and the season as a whole."""
+    teams = list(Team.objects.filter(league_id=season.league_id).order_by('pk').values_list('pk', 'name'))
+    team_ids = np.array([pk for pk, _ in teams], dtype=np.int64)
+    n_teams, n_buckets = len(teams), len(BUCKETS)
+
+    played = Game.objects.filter(season=season, home_score__isnull=False, away_score__isnull=False)
+    games = _columns(played, ('pk', 'home_team_id', 'away_team_id', 'home_score', 'away_score'))
+    goals = _columns(
+        Goal.objects.filter(game__in=played, team__isnull=False),
+        ('game_id', 'minute', 'id', 'team_id', 'is_penalty', 'is_own_goal'),
+    )
+    games = games[np.argsort(games[:, 0], kind='stable')]
+
+    home = np.searchsorted(team_ids, games[:, 1])
+    away = np.searchsorted(team_ids, games[:, 2])
+    # 1 home win, 0 draw, -1 away win
+    outcome = np.sign(games[:, 3] - games[:, 4])
+
+    game = np.searchsorted(games[:, 0], goals[:, 0])
+    minute, credited = goals[:, 1], goals[:, 3]
+    is_penalty, is_own_goal = goals[:, 4].astype(bool), goals[:, 5].astype(bool)
+    for_home = credited == games[game, 1]
+    team = np.where(for_home, home[game], away[game])
+    opponent = np.where(for_home, away[game], home[game])
+
+    bucket = np.clip((minute - 1) // BUCKET_MINUTES, 0, n_buckets - 1)
+    scored = np.bincount(team * n_buckets + bucket, minlength=n_teams * n_buckets).reshape(n_teams, n_buckets)
+    conceded = np.bincount(opponent * n_buckets + bucket, minlength=n_teams * n_buckets).reshape(n_teams, n_buckets)
+    penalties = np.bincount(team, weights=is_penalty, minlength=n_teams)
+    own_goals = np.bincount(team, weights=is_own_goal, minlength=n_teams)
+
+    first = {key: np.zeros((n_teams, 3), dtype=np.int64) for key in ('scored_first', 'conceded_first')}
+    comebacks = np.zeros(n_teams, dtype=np.int64)
+    leads_lost = np.zeros(n_teams, dtype=np.int64)
+    if len(goals):
+        # Goals in match order; the running home-minus-away difference within each game
+        order = np.lexsort((goals[:, 2], minute, game))
+        step = np.where(for_home, 1, -1)[order]
+        in_game = game[order]
+        starts = np.flatnonzero(np.r_[True, in_game[1:] != in_game[:-1]])
+        running = np.cumsum(step)
+        before = np.repeat(running[starts] - step[starts], np.diff(np.r_[starts, len(step)]))
+        difference = running - before
+        lowest = np.minimum.reduceat(difference, starts)
+        highest = np.maximum.reduceat(difference, starts)
+
+        scored_games = in_game[starts]
+        home_first = step[starts] > 0
+        result = outcome[scored_games]
+        first_team = np.where(home_first, home[scored_games], away[scored_games])
+        other_team = np.where(home_first, away[scored_games], home[scored_games])
+        first_result = np.where(home_first, result, -result)
+        for key, teams_at, results in (
+            ('scored_first', first_team, first_result), ('conceded_first', other_team, -first_result)
+        ):
+            # Columns: won, drawn, lost
+            index = teams_at * 3 + (1 - results)
+            first[key] = np.bincount(index, minlength=n_teams * 3).reshape(n_teams, 3)
+
+        home_ids, away_ids = home[scored_games], away[scored_games]
+        comebacks += np.bincount(home_ids[(lowest < 0) & (result == 1)], minlength=n_teams)
+        comebacks += np.bincount(away_ids[(highest > 0) & (result == -1)], minlength=n_teams)
+        leads_lost += np.bincount(home_ids[(highest > 0) & (result == -1)], minlength=n_teams)
+        leads_lost += np.bincount(away_ids[(lowest < 0) & (result == 1)], minlength=n_teams)
+
+    goals_for, goals_against = scored.sum(axis=1), conceded.sum(axis=1)
+
+    def first_goal(counts):
+        won, drawn, lost = (int(n) for n in counts)
+        games_count = won + drawn + lost
+        return {'games': games_count, 'won': won, 'drawn': drawn, 'lost': lost, 'win_rate': _rate(won, games_count)}
+
+    rows = []
+    for i, (pk, name) in enumerate(teams):
+        rows.append({
+            'team': pk,
+            'name': name,
+            'goals_for': int(goals_for[i]),
+            'goals_against': int(goals_against[i]),
+            'scored': scored[i].tolist(),
+            'conceded': conceded[i].tolist(),
+            'scored_first': first_goal(first['scored_first'][i]),
+            'conceded_first': first_goal(first['conceded_first'][i]),
+            'comebacks': int(comebacks[i]),
+            'leads_lost': int(leads_lost[i]),
+            'penalty_share': _rate(int(penalties[i]), int(goals_for[i])),
+            'own_goal_share': _rate(int(own_goals[i]), int(goals_for[i])),
+        })
+
+    total_goals = int(goals_for.sum())
+    return {
+        'season': season.pk,
+        'buckets': list(BUCKETS),
+        'totals': {
+            'games': len(games),
+            'goals': total_goals,
+            'scored': scored.sum(axis=0).tolist(),
+            'scored_first': first_goal(first['scored_first'].sum(axis=0)),
+            'comebacks': int(comebacks.sum()),
+            'penalty_share': _rate(int(penalties.sum()), total_goals),
+            'own_goal_share': _rate(int(own_goals.sum()), total_goals),
+        },
+        'teams': rows,
+    }
+
+
+def goal_timing(season):
+    """Cached ``build_goal_timing`` for the season's current data version."""
+    key = versioned_key(season_scope(season.pk), 'goal_timing')
+    return metrics.cached('goal_timing', key, lambda: build_goal_timing(season), CACHE_TIMEOUT)
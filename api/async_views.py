@@ -0,0 +1,167 @@
+"""Async versions of the read-heavy pages and API actions.
+
+The async ORM runs every query on one shared thread, which keeps queries
+sequential. ``run_concurrently`` instead hands each independent query to its
+own worker thread (and therefore its own database connection, kept by the
+thread for ``CONN_MAX_AGE``), so a page's fan-out costs roughly its slowest
+query rather than the sum of all of them.
+
+The API views answer plain JSON requests directly, with output identical to
+the DRF actions, and hand anything else (e.g. the browsable API) to the DRF
+viewset.
+"""
+import asyncio
+
+from asgiref.sync import sync_to_async
+from django.db import close_old_connections
+from django.db.models import Q
+from django.http import Http404, HttpResponse, StreamingHttpResponse
+from django.shortcuts import render
+from django.utils import timezone
+from rest_framework.renderers import JSONRenderer
+
+from . import events, queries
+from .fastpath import GameValuesSerializer, LeagueStandingValuesSerializer, render_json
+from .models import League, Season, Team, Game, LeagueStanding
+from .views import LeagueViewSet, TeamViewSet
+
+
+def _isolated(func):
+    def run():
+        # Pool threads keep their connections between queries, so the
+        # connection setup (pragmas) isn't repeated for every query; like a
+        # request thread, drop the ones that broke or outlived CONN_MAX_AGE.
+        close_old_connections()
+        return func()
+    return run
+
+
+async def run_concurrently(funcs):
+    """Run ``{name: callable}`` blocking queries concurrently, return ``{name: result}``."""
+    names = list(funcs)
+    results = await asyncio.gather(*(
+        sync_to_async(_isolated(funcs[name]), thread_sensitive=False)() for name in names
+    ))
+    return dict(zip(names, results))
+
+
+def _json_response(data, status=200):
+    response = HttpResponse(render_json(data), status=status, content_type=JSONRenderer.media_type)
+    response['Vary'] = 'Accept'
+    return response
+
+
+def _wants_plain_json(request):
+    """True when DRF content negotiation would pick compact JSON."""
+    fmt = request.GET.get('format')
+    if fmt:
+        return fmt == 'json'
+    accept = request.headers.get('Accept', '*/*')
+    return 'text/html' not in accept and 'indent' not in accept
+
+
+async def _drf_fallback(viewset, action, request, **kwargs):
+    view = viewset.as_view({'get': action})
+    return await sync_to_async(view)(request, **kwargs)
+
+
+async def dashboard(request):
+    """Dashboard view showing league standings and recent games."""
+    league = await League.objects.afirst()
+    if not league:
+        return render(request, 'dashboard.html', {'error': 'No leagues found'})
+
+    season = await league.seasons.filter(is_active=True).afirst()
+    if not season:
+        return render(request, 'dashboard.html', {'error': 'No active season found'})
+
+    results = await run_concurrently(queries.dashboard_queries(season, timezone.now()))
+    return render(request, 'dashboard.html', queries.dashboard_context(league, season, results))
+
+
+async def league_detail(request, pk):
+    """View for showing detailed league information."""
+    league = await League.objects.filter(pk=pk).afirst()
+    if league is None:
+        raise Http404('No League matches the given query.')
+    seasons = [season async for season in league.seasons.all().order_by('-start_date')]
+    active_season = next((s for s in seasons if s.is_active), None)
+
+    if active_season:
+        results = await run_concurrently(queries.league_detail_queries(active_season, timezone.now()))
+    else:
+        results = {'standings': [], 'recent_games': [], 'upcoming_games': []}
+
+    return render(request, 'league_detail.html', {
+        'league': league,
+        'seasons': seasons,
+        'active_season': active_season,
+        **results,
+    })
+
+
+async def league_standings(request, pk):
+    """Async ``LeagueViewSet.standings``: standings for the league's active season."""
+    if request.method != 'GET' or not _wants_plain_json(request):
+        return await _drf_fallback(LeagueViewSet, 'standings', request, pk=pk)
+    try:
+        active_season = await Season.objects.aget(league_id=pk, is_active=True)
+    except Season.DoesNotExist:
+        if not await League.objects.filter(pk=pk).aexists():
+            return _json_response({'detail': 'No League matches the given query.'}, status=404)
+        return _json_response({'detail': 'No active season found for this league.'}, status=404)
+    standings = LeagueStanding.objects.filter(season=active_season)
+    data = await sync_to_async(LeagueStandingValuesSerializer().serialize)(standings)
+    return _json_response(data)
+
+
+async def team_fixtures(request, pk):
+    """Async ``TeamViewSet.fixtures``: the team's games in its league's active season."""
+    if request.method != 'GET' or not _wants_plain_json(request):
+        return await _drf_fallback(TeamViewSet, 'fixtures', request, pk=pk)
+    team = await Team.objects.filter(pk=pk).afirst()
+    if team is None:
+        return _json_response({'detail': 'No Team matches the given query.'}, status=404)
+    try:
+        active_season = await Season.objects.aget(league_id=team.league_id, is_active=True)
+    except Season.DoesNotExist:
+        return _json_response({'detail': "No active season found for this team's league."}, status=404)
+    games = Game.objects.filter(
+        Q(home_team=team) | Q(away_team=team),
+        season=active_season
+    ).order_by('played_at', 'created_at')
+    data = await sync_to_async(GameValuesSerializer().serialize)(games)
+    return _json_response(data)
+
+
+def _event_stream(request, channel):
+    # Needs an ASGI server: under WSGI an endless async stream never finishes.
+    last_event_id = request.headers.get('Last-Event-ID')
+
+    async def stream():
+        subscription = events.broker.subscribe(channel, last_event_id=last_event_id)
+        try:
+            yield b'retry: 3000\n\n'
+            async for payload in subscription.stream():
+                yield payload
+        finally:
+            subscription.close()
+
+    response = StreamingHttpResponse(stream(), content_type='text/event-stream')
+    response['Cache-Control'] = 'no-cache'
+    response['X-Accel-Buffering'] = 'no'
+    return response
+
+
+async def season_events(request, pk):
+    """Server-sent events for a season: `score`, `goal` and `standings`."""
+    if not await Season.objects.filter(pk=pk).aexists():
+        return _json_response({'detail': 'No Season matches the given query.'}, status=404)
+    return _event_stream(request, events.season_channel(pk))
+
+
+async def game_events(request, pk):
+    """Server-sent events for a single game: `score` and `goal`."""
+    if not await Game.objects.filter(pk=pk).aexists():
+        return _json_response({'detail': 'No Game matches the given query.'}, status=404)
+    return _event_stream(request, events.game_channel(pk))
@@ -0,0 +1,218 @@
+"""JWT authentication that takes the user from the token instead of the database.
+
+Tokens issued by ``/api/auth/token/`` carry ``username``, ``is_staff`` and
+``is_superuser`` claims next to the user id, so ``StatelessJWTAuthentication``
+builds a simplejwt ``TokenUser`` from them without a query. Tokens without
+those claims (issued before they were added) fall back to loading the
+``User``, kept in a small per-process cache for ``JWT_USER_CACHE_TTL``
+seconds.
+
+Since the user row is no longer read, revocation is checked against the
+``TokenRevocation`` table instead: ``revoke_token()`` blocks a single token
+until it expires and ``revoke_user_tokens()`` blocks every token issued to a
+user so far (used when a user is changed, deactivated or deleted). Expired
+revocations are deleted as new ones are made.
+
+Each process checks tokens against a snapshot of the unexpired revocations,
+read from the primary at most every ``JWT_REVOCATION_TTL`` seconds. A
+revocation drops the snapshot of its own process when it commits and bumps a
+counter in the default cache, so processes sharing that cache reload theirs
+on their next check; others see it within ``JWT_REVOCATION_TTL`` seconds.
+"""
+import threading
+import time
+from datetime import datetime, timezone
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db import DEFAULT_DB_ALIAS, transaction
+from rest_framework_simplejwt.authentication import JWTStatelessUserAuthentication
+from rest_framework_simplejwt.exceptions import AuthenticationFailed, InvalidToken
+from rest_framework_simplejwt.models import TokenUser
+from rest_framework_simplejwt.serializers import TokenRefreshSerializer, TokenVerifySerializer
+from rest_framework_simplejwt.tokens import UntypedToken
+from rest_framework_simplejwt.settings import api_settings
+
+from .models import TokenRevocation
+
+USER_CLAIMS = ('username', 'is_staff', 'is_superuser')
+USER_CACHE_SIZE = 10000
+DEFAULT_REVOCATION_TTL = 5
+REVOCATIONS_CHANGED_KEY = 'jwt:revocations'
+
+
+def add_user_claims(token, user):
+    """Copy the user fields ``TokenUser`` reads into ``token``."""
+    for claim in USER_CLAIMS:
+        token[claim] = getattr(user, claim)
+    return token
+
+
+def _revoked_token_key(jti):
+    return f'jti:{jti}'
+
+
+def _revoked_user_key(user_id):
+    return f'user:{user_id}'
+
+
+def _revocations():
+    # Never the replica: a revocation must apply as soon as it commits
+    return TokenRevocation.objects.using(DEFAULT_DB_ALIAS)
+
+
+class _RevocationSnapshot:
+    """``{key: (expires_at, issued_before)}`` of unexpired revocations, kept ``JWT_REVOCATION_TTL`` seconds."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._snapshot = None  # (expires, cache counter it was read at, entries)
+
+    def get(self):
+        ttl = getattr(settings, 'JWT_REVOCATION_TTL', DEFAULT_REVOCATION_TTL)
+        # Read before the rows: a revocation committed after the query changes it
+        changed = cache.get(REVOCATIONS_CHANGED_KEY)
+        now = time.monotonic()
+        snapshot = self._snapshot
+        if snapshot is not None and snapshot[0] > now and snapshot[1] == changed:
+            return snapshot[2]
+        rows = _revocations().filter(expires_at__gt=datetime.now(timezone.utc))
+        entries = {key: (expires_at, issued_before) for key, expires_at, issued_before in rows.values_list(
+            'key', 'expires_at', 'issued_before'
+        )}
+        if ttl > 0:
+            with self._lock:
+                self._snapshot = (now + ttl, changed, entries)
+        return entries
+
+    def discard(self):
+        with self._lock:
+            self._snapshot = None
+        cache.add(REVOCATIONS_CHANGED_KEY, 0, timeout=None)
+        try:
+            cache.incr(REVOCATIONS_CHANGED_KEY)
+        except ValueError:
+            pass  # evicted in between; the snapshots reload anyway
+
+
+_revoked = _RevocationSnapshot()
+
+
+def _revoke(key, expires_at, issued_before=None):
+    now = datetime.now(timezone.utc)
+    _revocations().filter(expires_at__lte=now).delete()
+    _revocations().update_or_create(key=key, defaults={'issued_before': issued_before, 'expires_at': expires_at})
+    # Not before the commit, or a snapshot read in between would miss it
+    transaction.on_commit(_revoked.discard, using=DEFAULT_DB_ALIAS)
+
+
+def revoke_token(token):
+    """Reject ``token`` (a validated simplejwt token) until it would have expired anyway."""
+    if token['exp'] > time.time():
+        _revoke(_revoked_token_key(token[api_settings.JTI_CLAIM]), datetime.fromtimestamp(token['exp'], timezone.utc))
+
+
+def revoke_user_tokens(user_id):
+    """Reject every token issued to ``user_id`` up to now, access and refresh alike."""
+    lifetime = max(api_settings.ACCESS_TOKEN_LIFETIME, api_settings.REFRESH_TOKEN_LIFETIME)
+    now = int(time.time())
+    _revoke(_revoked_user_key(user_id), datetime.fromtimestamp(now, timezone.utc) + lifetime, issued_before=now)
+    _users.discard(user_id)
+
+
+def forget_revocations():
+    """Drop the revocation snapshots of this process (and of those sharing its cache)."""
+    _revoked.discard()
+
+
+def is_revoked(token):
+    revoked = _revoked.get()
+    now = datetime.now(timezone.utc)
+    token_revocation = revoked.get(_revoked_token_key(token.get(api_settings.JTI_CLAIM)))
+    if token_revocation is not None and token_revocation[0] > now:
+        return True
+    user_revocation = revoked.get(_revoked_user_key(token.get(api_settings.USER_ID_CLAIM)))
+    # Tokens issued within the second of a revocation are rejected too
+    return user_revocation is not None and user_revocation[0] > now and token.get('iat', 0) <= user_revocation[1]
+
+
+class _UserCache:
+    """``{user_id: User}`` entries that expire after ``JWT_USER_CACHE_TTL`` seconds."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._entries = {}
+
+    def get(self, user_id):
+        ttl = getattr(settings, 'JWT_USER_CACHE_TTL', 0)
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(user_id)
+        if entry is not None and entry[0] > now:
+            return entry[1]
+        user = get_user_model().objects.filter(pk=user_id).first()
+        if ttl > 0 and user is not None:
+            with self._lock:
+                if len(self._entries) >= USER_CACHE_SIZE:
+                    self._entries.clear()
+                self._entries[user_id] = (now + ttl, user)
+        return user
+
+    def discard(self, user_id):
+        with self._lock:
+            self._entries.pop(user_id, None)
+
+
+_users = _UserCache()
+
+
+def load_user(user_id):
+    """The ``User`` row for ``user_id`` (or None), from the per-process cache when fresh."""
+    return _users.get(user_id)
+
+
+class StatelessJWTAuthentication(JWTStatelessUserAuthentication):
+    """Bearer-token authentication without a per-request user query."""
+
+    def get_user(self, validated_token):
+        if is_revoked(validated_token):
+            raise InvalidToken('Token has been revoked')
+        if all(claim in validated_token for claim in USER_CLAIMS):
+            return super().get_user(validated_token)
+
+        user = load_user(validated_token.get(api_settings.USER_ID_CLAIM))
+        if user is None:
+            raise AuthenticationFailed('User not found', code='user_not_found')
+        if not user.is_active:
+            raise AuthenticationFailed('User is inactive', code='user_inactive')
+        return user
+
+
+class RevocationCheckingTokenRefreshSerializer(TokenRefreshSerializer):
+    """Refuse to refresh revoked tokens, so revocation also stops new access tokens."""
+
+    def validate(self, attrs):
+        refresh = self.token_class(attrs['refresh'])
+        if is_revoked(refresh):
+            raise InvalidToken('Token has been revoked')
+        return super().validate(attrs)
+
+
+class RevocationCheckingTokenVerifySerializer(TokenVerifySerializer):
+    """Report revoked tokens as invalid."""
+
+    def validate(self, attrs):
+        data = super().validate(attrs)
+        if is_revoked(UntypedToken(attrs['token'])):
+            raise InvalidToken('Token has been revoked')
+        return data
+
+
+def database_user(user):
+    """``user`` as a ``User`` model instance, loading it for token users; None if it is gone or inactive."""
+    if isinstance(user, TokenUser):
+        user = load_user(user.pk)
+    if user is None or not user.is_active:
+        return None
+    return user
@@ -0,0 +1,128 @@
+"""Data derived from a season's games and goals, checked and rebuilt per season.
+
+Steps, in the order they run (later ones read what earlier ones fix):
+
+- ``goal_teams``: the side credited with each goal (``Goal.resolve_team_id()``);
+- ``goal_counts``: the cached per-side goal counts of each game;
+- ``standings``: the league table (``LeagueStanding``), rebuilt through
+  ``update_standings()`` so it is serialized with live result entry.
+
+Player season stats, leaderboards, goal timing and predictions are computed
+on read and cached per season data version; bumping a season's version
+after its rebuild clears them. ``rebuild_season()`` only writes what differs from the stored
+rows; with ``dry_run`` it only reports it, checking ``goal_counts`` against
+the goal teams ``goal_teams`` would have written, so a dry run reports what
+a real run would change.
+"""
+from collections import Counter
+
+from django.db import router
+from django.db.models import Count, F, Q
+
+from . import sharding, sync
+from .models import Game, Goal, LeagueStanding, Season
+from .sqlite import write_transaction
+
+STEPS = ('goal_teams', 'goal_counts', 'standings')
+# Compared between the stored and the recomputed table
+STANDING_FIELDS = tuple(field for field in sync.STANDING_FIELDS if field != 'team_id')
+
+
+def stale_goal_counts(games):
+    """``games`` whose cached goal counts differ from their goal rows, annotated with the actual counts."""
+    return games.annotate(
+        home_goals=Count('goals', filter=Q(goals__team=F('home_team'))),
+        away_goals=Count('goals', filter=Q(goals__team=F('away_team'))),
+    ).exclude(home_goal_count=F('home_goals'), away_goal_count=F('away_goals'))
+
+
+def _recount(games, resolved):
+    """Like ``stale_goal_counts()`` as rows, with the goal teams in ``resolved`` (``{goal id: team id}``)."""
+    counts = {}
+    for goal_id, game_id, team_id in Goal.objects.filter(game__in=games).values_list('pk', 'game_id', 'team_id'):
+        counts.setdefault(game_id, Counter())[resolved.get(goal_id, team_id)] += 1
+    stale = []
+    for pk, home_team_id, away_team_id, home_count, away_count in games.order_by('pk').values_list(
+        'pk', 'home_team_id', 'away_team_id', 'home_goal_count', 'away_goal_count'
+    ):
+        goals = counts.get(pk, Counter())
+        if (goals[home_team_id], goals[away_team_id]) != (home_count, away_count):
+            stale.append((pk, home_count, away_count, goals[home_team_id], goals[away_team_id]))
+    return stale
+
+
+def _goal_teams(season, dry_run, resolved):
+    goals = Goal.objects.filter(game__season=season).select_related('game').order_by('pk')
+    changed = []
+    for goal in goals:
+        team_id = goal.resolve_team_id()
+        if team_id != goal.team_id:
+            changed.append(f'goal {goal.pk}: team {goal.team_id} -> {team_id}')
+            goal.team_id = resolved[goal.pk] = team_id
+            if not dry_run:
+                Goal.objects.filter(pk=goal.pk).update(team_id=team_id)
+                # update() sends no signals, so log the change for delta sync here
+                sync.record(season.pk, 'goal', goal.pk, 'update', sync.goal_data(goal))
+    return changed
+
+
+def _goal_counts(season, dry_run, resolved):
+    games = Game.objects.filter(season=season)
+    if dry_run and resolved:
+        # The goal teams a real run would have fixed first
+        stale = _recount(games, resolved)
+    else:
+        stale = stale_goal_counts(games).order_by('pk').values_list(
+            'pk', 'home_goal_count', 'away_goal_count', 'home_goals', 'away_goals'
+        )
+    changed = [
+        f'game {pk}: goals {home_count}-{away_count} -> {home_goals}-{away_goals}'
+        for pk, home_count, away_count, home_goals, away_goals in stale
+    ]
+    if changed and not dry_run:
+        Game.update_goal_counts([row[0] for row in stale])
+    return changed
+
+
+def _standings(season):
+    stored = {standing.team_id: standing for standing in LeagueStanding.objects.filter(season=season)}
+    changed = []
+    for standing in LeagueStanding.compute_standings(season):
+        old = stored.pop(standing.team_id, None)
+        if old is None:
+            changed.append(f'team {standing.team_id}: missing')
+            continue
+        fields = [
+            f'{field} {getattr(old, field)} -> {getattr(standing, field)}'
+            for field in STANDING_FIELDS if getattr(old, field) != getattr(standing, field)
+        ]
+        if fields:
+            changed.append(f'team {standing.team_id}: ' + ', '.join(fields))
+    changed.extend(f'team {team_id}: not in the league' for team_id in stored)
+    return changed
+
+
+def rebuild_season(season, steps=STEPS, dry_run=False):
+    """Check, and unless ``dry_run`` fix, ``steps`` of ``season``; returns ``{step: [mismatches]}``."""
+    using = router.db_for_write(Game, instance=season)
+    report, resolved = {}, {}
+    with sharding.use_instance(season):
+        if 'goal_teams' in steps:
+            report['goal_teams'] = write_transaction(_goal_teams, season, dry_run, resolved, using=using)
+        if 'goal_counts' in steps:
+            report['goal_counts'] = write_transaction(_goal_counts, season, dry_run, resolved, using=using)
+        if 'standings' in steps:
+            report['standings'] = _standings(season)
+            if report['standings'] and not dry_run:
+                LeagueStanding.update_standings(season)
+    return report
+
+
+def seasons(season_ids=None, league_ids=None):
+    """Seasons in every database, in id order, optionally only those listed or of the listed leagues."""
+    queryset = Season.objects.select_related('league').order_by('pk')
+    if season_ids:
+        queryset = queryset.filter(pk__in=season_ids)
+    if league_ids:
+        queryset = queryset.filter(league_id__in=league_ids)
+    return sharding.gather_list(queryset)
@@ -0,0 +1,231 @@
+"""In-process pub/sub for live score and standings events (server-sent events).
+
+Writes publish to a channel (``season:<id>`` or ``game:<id>``) once, with the
+payload encoded once. The broker hands that same byte string to every
+subscriber queue, batching the hand-off per event loop, so one write fans out
+to thousands of open streams without any of them touching the database.
+
+With several worker processes, set ``EVENTS_RELAY = 'host:port'`` and run
+``manage.py event_relay``: every worker then publishes through the relay,
+which echoes each event back to all connected workers. If the relay cannot
+be reached, events are still delivered to the local process.
+"""
+import asyncio
+import itertools
+import json
+import logging
+import os
+import socket
+import threading
+import time
+from collections import defaultdict, deque
+
+from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
+
+logger = logging.getLogger(__name__)
+
+KEEPALIVE_SECONDS = 15
+QUEUE_SIZE = 256
+HISTORY_SIZE = 100
+
+
+def season_channel(season_id):
+    return f'season:{season_id}'
+
+
+def game_channel(game_id):
+    return f'game:{game_id}'
+
+
+def encode_event(event_id, event, data):
+    """Encode one event in the text/event-stream wire format."""
+    body = json.dumps(data, separators=(',', ':'), cls=DjangoJSONEncoder)
+    return f'id: {event_id}\nevent: {event}\ndata: {body}\n\n'.encode()
+
+
+class Subscription:
+    """One client's view of a channel: a bounded queue of encoded events."""
+
+    def __init__(self, broker, channel, loop):
+        self.broker = broker
+        self.channel = channel
+        self.loop = loop
+        self.queue = asyncio.Queue(QUEUE_SIZE)
+        self.dropped = 0
+
+    def put(self, payload):
+        # Slow clients lose their oldest events instead of growing without bound.
+        if self.queue.full():
+            self.queue.get_nowait()
+            self.dropped += 1
+        self.queue.put_nowait(payload)
+
+    async def stream(self, keepalive=KEEPALIVE_SECONDS):
+        """Yield encoded events, with a comment line when the channel is idle."""
+        while True:
+            try:
+                yield await asyncio.wait_for(self.queue.get(), keepalive)
+            except asyncio.TimeoutError:
+                yield b': keepalive\n\n'
+
+    def close(self):
+        self.broker.unsubscribe(self)
+
+
+class EventBroker:
+    """Thread-safe fan-out of encoded events to asyncio subscribers."""
+
+    def __init__(self, history=HISTORY_SIZE):
+        self._lock = threading.Lock()
+        # channel -> event loop -> subscriptions
+        self._subscribers = defaultdict(lambda: defaultdict(set))
+        self._history = defaultdict(lambda: deque(maxlen=history))
+        self._ids = itertools.count(1)
+        self._prefix = f'{os.getpid()}-{int(time.time())}'
+
+    def next_id(self):
+        return f'{self._prefix}-{next(self._ids)}'
+
+    def subscribe(self, channel, last_event_id=None):
+        """Subscribe from inside a running event loop.
+
+        With ``last_event_id`` the events published after it (if still in the
+        channel's short history) are queued straight away.
+        """
+        subscription = Subscription(self, channel, asyncio.get_running_loop())
+        with self._lock:
+            self._subscribers[channel][subscription.loop].add(subscription)
+            history = list(self._history.get(channel, ()))
+        if last_event_id:
+            ids = [event_id for event_id, _ in history]
+            if last_event_id in ids:
+                for _, payload in history[ids.index(last_event_id) + 1:]:
+                    subscription.put(payload)
+        return subscription
+
+    def unsubscribe(self, subscription):
+        with self._lock:
+            loops = self._subscribers.get(subscription.channel)
+            if not loops:
+                return
+            subscribers = loops.get(subscription.loop)
+            if subscribers is not None:
+                subscribers.discard(subscription)
+                if not subscribers:
+                    del loops[subscription.loop]
+            if not loops:
+                del self._subscribers[subscription.channel]
+
+    def subscriber_count(self, channel=None):
+        with self._lock:
+            channels = [channel] if channel else list(self._subscribers)
+            return sum(len(subs) for c in channels for subs in self._subscribers.get(c, {}).values())
+
+    def queued_events(self):
+        """Events waiting in subscriber queues, across all channels."""
+        with self._lock:
+            subscriptions = [s for loops in self._subscribers.values() for subs in loops.values() for s in subs]
+        return sum(subscription.queue.qsize() for subscription in subscriptions)
+
+    def deliver(self, channel, event_id, payload):
+        """Queue an already encoded event for every local subscriber of ``channel``."""
+        with self._lock:
+            self._history[channel].append((event_id, payload))
+            targets = [(loop, list(subs)) for loop, subs in self._subscribers.get(channel, {}).items()]
+        for loop, subscriptions in targets:
+            # One cross-thread hand-off per loop, not per subscriber.
+            try:
+                loop.call_soon_threadsafe(_put_all, subscriptions, payload)
+            except RuntimeError:  # loop closed under us
+                pass
+
+    def publish(self, channel, event, data):
+        """Encode an event once and fan it out (through the relay when configured)."""
+        event_id = self.next_id()
+        payload = encode_event(event_id, event, data)
+        if relay_client() is None or not relay_client().send(channel, event_id, payload):
+            self.deliver(channel, event_id, payload)
+        return event_id
+
+
+def _put_all(subscriptions, payload):
+    for subscription in subscriptions:
+        subscription.put(payload)
+
+
+class RelayClient:
+    """Connection from one worker to ``manage.py event_relay``.
+
+    Messages are JSON lines ``{"channel", "id", "payload"}``. A background
+    thread reads events relayed from any worker (including this one) and
+    delivers them to the local broker, reconnecting with backoff.
+    """
+
+    def __init__(self, address, broker):
+        host, _, port = address.rpartition(':')
+        self.address = (host or '127.0.0.1', int(port))
+        self.broker = broker
+        self._sock = None
+        self._lock = threading.Lock()
+        self._thread = threading.Thread(target=self._read_loop, name='events-relay', daemon=True)
+        self._thread.start()
+
+    def send(self, channel, event_id, payload):
+        message = json.dumps({'channel': channel, 'id': event_id, 'payload': payload.decode()}) + '\n'
+        with self._lock:
+            if self._sock is None:
+                return False
+            try:
+                self._sock.sendall(message.encode())
+                return True
+            except OSError:
+                self._sock = None
+                return False
+
+    def _read_loop(self):
+        delay = 0.5
+        while True:
+            try:
+                sock = socket.create_connection(self.address, timeout=5)
+                sock.settimeout(None)
+            except OSError:
+                time.sleep(delay)
+                delay = min(delay * 2, 10)
+                continue
+            delay = 0.5
+            with self._lock:
+                self._sock = sock
+            try:
+                for line in sock.makefile('rb'):
+                    message = json.loads(line)
+                    self.broker.deliver(message['channel'], message['id'], message['payload'].encode())
+            except (OSError, ValueError, KeyError):
+                logger.warning('Event relay connection lost, reconnecting')
+            finally:
+                with self._lock:
+                    if self._sock is sock:
+                        self._sock = None
+                sock.close()
+
+
+broker = EventBroker()
+_relay = None
+_relay_lock = threading.Lock()
+
+
+def relay_client():
+    """The process' relay connection, or None when ``EVENTS_RELAY`` is unset."""
+    global _relay
+    address = getattr(settings, 'EVENTS_RELAY', None)
+    if not address:
+        return None
+    if _relay is None:
+        with _relay_lock:
+            if _relay is None:
+                _relay = RelayClient(address, broker)
+    return _relay
+
+
+def publish(channel, event, data):
+    return broker.publish(channel, event, data)
@@ -0,0 +1,214 @@
+"""Static export of finished league, season, team and game pages.
+
+``manage.py export_static`` renders the pages of everything that can no
+longer change into a directory a plain file server can serve:
+
+- the season and game pages of inactive seasons, plus JSON copies of their
+  standings and fixtures;
+- the league and team pages of leagues without an active season.
+
+Pages are written where their URL points (``/seasons/3/`` becomes
+``seasons/3/index.html``), so links between them keep working. JSON copies
+get content-hashed names (``api/seasons/3/standings.<hash>.json``) and can be
+cached forever; ``manifest.json`` maps each logical URL
+(``/api/seasons/3/standings.json``) to its current file. Every file is
+written next to ``.gz`` and, with the ``brotli`` package installed, ``.br``
+variants.
+
+Re-exports only render what changed: a season's pages depend on its row,
+its change log version (see ``api.sync``) and the teams of its league, and a
+league's pages on its row, its teams and its seasons. Files whose content is
+unchanged (the manifest included) are not rewritten, and files of objects
+that left the export are removed. Player and contract edits are not
+tracked; export with ``full=True`` after making them.
+"""
+import gzip
+import hashlib
+import json
+import os
+import tempfile
+
+from asgiref.sync import async_to_sync, iscoroutinefunction
+from django.contrib.auth.models import AnonymousUser
+from django.test import RequestFactory
+from django.urls import resolve, reverse
+
+from .fastpath import GameValuesSerializer, LeagueStandingValuesSerializer, render_json
+from .models import Game, League, LeagueStanding, Season, SeasonSyncState, Team
+
+try:  # optional, adds .br variants
+    import brotli
+except ImportError:  # pragma: no cover - depends on the environment
+    brotli = None
+
+MANIFEST = 'manifest.json'
+
+
+class ExportError(Exception):
+    pass
+
+
+def _digest(data):
+    return hashlib.sha256(data).hexdigest()
+
+
+def _signature(*parts):
+    return _digest(json.dumps(parts, sort_keys=True, default=str).encode())[:16]
+
+
+def render_page(url):
+    """The body of ``url`` as rendered for an anonymous visitor."""
+    request = RequestFactory().get(url)
+    request.user = AnonymousUser()
+    match = resolve(url)
+    view = async_to_sync(match.func) if iscoroutinefunction(match.func) else match.func
+    response = view(request, *match.args, **match.kwargs)
+    if response.status_code != 200:
+        raise ExportError(f'{url} returned {response.status_code}')
+    return response.content
+
+
+def _season_json(season):
+    standings = LeagueStanding.objects.filter(season=season)
+    games = Game.objects.filter(season=season).order_by('played_at', 'created_at')
+    return {
+        f'/api/seasons/{season.pk}/standings.json': render_json(LeagueStandingValuesSerializer().serialize(standings)),
+        f'/api/seasons/{season.pk}/fixtures.json': render_json(GameValuesSerializer().serialize(games)),
+    }
+
+
+def _hashed_path(url, data):
+    stem, ext = os.path.splitext(url.lstrip('/'))
+    return f'{stem}.{_digest(data)[:12]}{ext}'
+
+
+def _page_path(url):
+    return url.lstrip('/') + 'index.html'
+
+
+class Exporter:
+    def __init__(self, output, full=False):
+        self.output = output
+        self.full = full
+        self.written = self.unchanged = self.removed = 0
+        try:
+            with open(os.path.join(output, MANIFEST)) as f:
+                self.manifest = json.load(f)
+        except (OSError, ValueError):
+            self.manifest = {}
+        # Kept with ``full`` too, to skip identical writes and remove stale files
+        self.files = self.manifest.get('files', {})
+        self.sources = self.manifest.get('sources', {}) if not full else {}
+
+    def _scope(self):
+        """``({source key: signature}, {source key: [urls]}, [(source key, kind, object)])``."""
+        teams = {}
+        for team in Team.objects.order_by('pk'):
+            teams.setdefault(team.league_id, []).append(
+                [team.pk, team.name, team.short_name, team.founded_year]
+            )
+        versions = dict(SeasonSyncState.objects.values_list('season_id', 'version'))
+        seasons = list(Season.objects.select_related('league').order_by('pk'))
+        active_leagues = {season.league_id for season in seasons if season.is_active}
+        game_ids = {}
+        for game_id, season_id in Game.objects.filter(season__is_active=False).order_by('pk').values_list('pk', 'season_id'):
+            game_ids.setdefault(season_id, []).append(game_id)
+
+        signatures, urls, objects = {}, {}, []
+        for season in seasons:
+            if season.is_active:
+                continue
+            key = f'season:{season.pk}'
+            signatures[key] = _signature(
+                season.name, season.start_date, season.end_date, season.league_id,
+                versions.get(season.pk, 0), teams.get(season.league_id, []),
+            )
+            urls[key] = [
+                reverse('season_detail', args=[season.pk]),
+                *(reverse('game_detail', args=[game_id]) for game_id in game_ids.get(season.pk, [])),
+                f'/api/seasons/{season.pk}/standings.json',
+                f'/api/seasons/{season.pk}/fixtures.json',
+            ]
+            objects.append((key, 'season', season))
+
+        for league in League.objects.exclude(pk__in=active_leagues).order_by('pk'):
+            key = f'league:{league.pk}'
+            league_seasons = [s for s in seasons if s.league_id == league.pk]
+            signatures[key] = _signature(
+                league.name, league.country, teams.get(league.pk, []),
+                [[s.pk, s.name, s.start_date, signatures.get(f'season:{s.pk}')] for s in league_seasons],
+            )
+            urls[key] = [
+                reverse('league_detail', args=[league.pk]),
+                *(reverse('team_detail', args=[team[0]]) for team in teams.get(league.pk, [])),
+            ]
+            objects.append((key, 'league', league))
+        return signatures, urls, objects
+
+    def _write(self, path, data):
+        target = os.path.join(self.output, path)
+        os.makedirs(os.path.dirname(target), exist_ok=True)
+        variants = [('', data), ('.gz', gzip.compress(data, 9, mtime=0))]
+        if brotli is not None:
+            variants.append(('.br', brotli.compress(data)))
+        for suffix, content in variants:
+            handle, temporary = tempfile.mkstemp(dir=os.path.dirname(target), suffix='.tmp')
+            with os.fdopen(handle, 'wb') as f:
+                f.write(content)
+            os.replace(temporary, target + suffix)
+
+    def _remove(self, path):
+        for suffix in ('', '.gz', '.br'):
+            try:
+                os.remove(os.path.join(self.output, path + suffix))
+            except FileNotFoundError:
+                pass
+
+    def _store(self, url, data, hashed):
+        digest = _digest(data)
+        path = _hashed_path(url, data) if hashed else _page_path(url)
+        previous = self.files.get(url)
+        if previous and previous['sha256'] == digest and os.path.exists(os.path.join(self.output, path)):
+            self.unchanged += 1
+            return
+        self._write(path, data)
+        if previous and previous['path'] != path:
+            self._remove(previous['path'])
+        self.files[url] = {'path': path, 'sha256': digest}
+        self.written += 1
+
+    def _export(self, kind, obj, urls):
+        if kind == 'season':
+            for url, data in _season_json(obj).items():
+                self._store(url, data, hashed=True)
+        for url in urls:
+            if not url.endswith('.json'):
+                self._store(url, render_page(url), hashed=False)
+
+    def run(self):
+        """Export what changed since the last run; returns the source keys rendered."""
+        signatures, urls, objects = self._scope()
+        current = {url for group in urls.values() for url in group}
+        for url in [url for url in self.files if url not in current]:
+            self._remove(self.files.pop(url)['path'])
+            self.removed += 1
+
+        rendered = []
+        for key, kind, obj in objects:
+            if self.sources.get(key) == signatures[key] and all(url in self.files for url in urls[key]):
+                continue
+            self._export(kind, obj, urls[key])
+            rendered.append(key)
+
+        manifest = {'sources': signatures, 'files': dict(sorted(self.files.items()))}
+        if manifest != self.manifest:
+            self.manifest = manifest
+            os.makedirs(self.output, exist_ok=True)
+            self._write_manifest()
+        return rendered
+
+    def _write_manifest(self):
+        handle, temporary = tempfile.mkstemp(dir=self.output, suffix='.tmp')
+        with os.fdopen(handle, 'w') as f:
+            json.dump(self.manifest, f, indent=1)
+        os.replace(temporary, os.path.join(self.output, MANIFEST))
@@ -0,0 +1,280 @@
+"""Read-only fast path for large API list responses.
+
+The DRF serializers instantiate a model object and a tree of field objects
+for every row, which dominates CPU time on long lists. The serializers here
+read plain tuples from ``values_list()`` instead, map each column through a
+mapper compiled once per request, and render the result with a preconfigured
+JSON encoder. The output is byte-identical to the matching DRF serializer
+rendered by ``JSONRenderer``.
+"""
+import json
+
+from django.conf import settings
+from django.http import HttpResponse
+from django.utils import timezone
+from rest_framework.renderers import JSONRenderer
+
+from .models import League, Season, Team, Game, LeagueStanding, Player, Goal
+
+try:  # optional, noticeably faster on very long lists
+    import orjson
+except ImportError:  # pragma: no cover - depends on the environment
+    orjson = None
+
+
+# Column mapper kinds
+DATE = 'date'
+DATETIME = 'datetime'
+
+# Keep ``pk__in`` lookups under SQLite's bound-parameter limit.
+IN_BATCH_SIZE = 900
+
+# Same options JSONRenderer passes to json.dumps() with the default settings
+# (UNICODE_JSON, COMPACT_JSON and STRICT_JSON all enabled). Rows only hold
+# primitives, so no ``default`` hook is needed and the C encoder is used.
+_encoder = json.JSONEncoder(ensure_ascii=False, separators=(',', ':'), allow_nan=False)
+
+
+def render_json(data):
+    """Render primitive data to the exact bytes JSONRenderer would produce."""
+    if orjson is not None:
+        ret = orjson.dumps(data)
+        if b'\xe2\x80\xa8' in ret or b'\xe2\x80\xa9' in ret:
+            ret = ret.replace('\u2028'.encode(), b'\\u2028').replace('\u2029'.encode(), b'\\u2029')
+        return ret
+    ret = _encoder.encode(data)
+    return ret.replace('\u2028', '\\u2028').replace('\u2029', '\\u2029').encode()
+
+
+def _date(value):
+    return value.isoformat() if value else None
+
+
+def _make_datetime(tz):
+    def _datetime(value):
+        if value is None:
+            return None
+        if timezone.is_aware(value):
+            value = value.astimezone(tz)
+        else:
+            value = timezone.make_aware(value, tz)
+        value = value.isoformat()
+        if value.endswith('+00:00'):
+            value = value[:-6] + 'Z'
+        return value
+    return _datetime
+
+
+class ValuesSerializer:
+    """Serialize rows from ``values_list()`` using declared field mappers.
+
+    ``fields`` is a sequence of ``(key, source, mapper)`` triples in output order:
+
+    - ``source`` is a column name, or a tuple of column names for mappers
+      that combine several columns.
+    - ``mapper`` is ``None`` (value used as-is), ``DATE``, ``DATETIME``,
+      another ``ValuesSerializer`` subclass (``source`` is then a foreign key
+      column and the related row is nested), or a plain callable.
+    """
+    model = None
+    fields = ()
+
+    def __init__(self):
+        self._tz = timezone.get_current_timezone() if settings.USE_TZ else None
+        self.columns = []
+        self.nested = {}
+        self._getters = [(key, self._compile(source, mapper)) for key, source, mapper in self.fields]
+
+    def _index(self, column):
+        if column not in self.columns:
+            self.columns.append(column)
+        return self.columns.index(column)
+
+    def _compile(self, source, mapper):
+        if isinstance(source, tuple):
+            indexes = [self._index(column) for column in source]
+            return lambda row, lookups: mapper(*[row[i] for i in indexes])
+
+        i = self._index(source)
+        if mapper is None:
+            return lambda row, lookups: row[i]
+        if mapper == DATE:
+            return lambda row, lookups: _date(row[i])
+        if mapper == DATETIME:
+            convert = _make_datetime(self._tz) if self._tz else lambda v: v.isoformat() if v else None
+            return lambda row, lookups: convert(row[i])
+        if isinstance(mapper, type) and issubclass(mapper, ValuesSerializer):
+            self.nested[source] = (i, mapper)
+            return lambda row, lookups: lookups[source].get(row[i])
+        return lambda row, lookups: mapper(row[i])
+
+    def _to_dicts(self, rows):
+        # One query per nested serializer class, even when several columns
+        # (e.g. home_team and away_team) point at the same model.
+        ids_by_class = {}
+        for i, serializer_class in self.nested.values():
+            ids_by_class.setdefault(serializer_class, set()).update(
+                row[i] for row in rows if row[i] is not None
+            )
+        maps = {cls: cls().serialize_map(ids) for cls, ids in ids_by_class.items()}
+        lookups = {source: maps[cls] for source, (i, cls) in self.nested.items()}
+        getters = self._getters
+        return [{key: getter(row, lookups) for key, getter in getters} for row in rows]
+
+    def serialize(self, queryset):
+        """Return a list of dicts for ``queryset``, preserving its ordering."""
+        rows = list(queryset.values_list(*self.columns))
+        return self._to_dicts(rows)
+
+    def serialize_map(self, ids):
+        """Return ``{pk: dict}`` for the given primary keys (used for nesting)."""
+        if 'id' not in self.columns:
+            raise ValueError(f'{type(self).__name__} needs an "id" field to be nested')
+        pk_index = self.columns.index('id')
+        ids = list(ids)
+        rows = []
+        for start in range(0, len(ids), IN_BATCH_SIZE):
+            batch = ids[start:start + IN_BATCH_SIZE]
+            rows.extend(self.model._base_manager.filter(pk__in=batch).order_by().values_list(*self.columns))
+        return {row[pk_index]: data for row, data in zip(rows, self._to_dicts(rows))}
+
+
+class LeagueValuesSerializer(ValuesSerializer):
+    """Mirrors ``LeagueSerializer``."""
+    model = League
+    fields = (
+        ('id', 'id', None),
+        ('name', 'name', None),
+        ('country', 'country', None),
+        ('created_at', 'created_at', DATETIME),
+    )
+
+
+class SeasonValuesSerializer(ValuesSerializer):
+    """Mirrors ``SeasonSerializer`` (read fields only)."""
+    model = Season
+    fields = (
+        ('id', 'id', None),
+        ('name', 'name', None),
+        ('league', 'league_id', LeagueValuesSerializer),
+        ('is_active', 'is_active', None),
+        ('start_date', 'start_date', DATE),
+        ('end_date', 'end_date', DATE),
+        ('created_at', 'created_at', DATETIME),
+    )
+
+
+class TeamValuesSerializer(ValuesSerializer):
+    """Mirrors ``TeamSerializer`` (read fields only)."""
+    model = Team
+    fields = (
+        ('id', 'id', None),
+        ('name', 'name', None),
+        ('league', 'league_id', LeagueValuesSerializer),
+        ('short_name', 'short_name', None),
+        ('founded_year', 'founded_year', None),
+        ('created_at', 'created_at', DATETIME),
+    )
+
+
+def _winner_id(home_score, away_score, home_team_id, away_team_id):
+    """Same result as ``Game.winner()``, without loading the teams."""
+    if home_score is None or away_score is None:
+        return None
+    if home_score > away_score:
+        return home_team_id
+    if away_score > home_score:
+        return away_team_id
+    return None
+
+
+class GameValuesSerializer(ValuesSerializer):
+    """Mirrors ``GameSerializer`` (read fields only)."""
+    model = Game
+    fields = (
+        ('id', 'id', None),
+        ('season', 'season_id', SeasonValuesSerializer),
+        ('home_team', 'home_team_id', TeamValuesSerializer),
+        ('away_team', 'away_team_id', TeamValuesSerializer),
+        ('home_score', 'home_score', None),
+        ('away_score', 'away_score', None),
+        ('played_at', 'played_at', DATETIME),
+        ('created_at', 'created_at', DATETIME),
+        ('winner_id', ('home_score', 'away_score', 'home_team_id', 'away_team_id'), _winner_id),
+    )
+
+
+class LeagueStandingValuesSerializer(ValuesSerializer):
+    """Mirrors ``LeagueStandingSerializer``."""
+    model = LeagueStanding
+    fields = (
+        ('id', 'id', None),
+        ('season', 'season_id', SeasonValuesSerializer),
+        ('team', 'team_id', TeamValuesSerializer),
+        ('position', 'position', None),
+        ('played', 'played', None),
+        ('won', 'won', None),
+        ('drawn', 'drawn', None),
+        ('lost', 'lost', None),
+        ('goals_for', 'goals_for', None),
+        ('goals_against', 'goals_against', None),
+        ('goal_difference', 'goal_difference', None),
+        ('points', 'points', None),
+        ('last_updated', 'last_updated', DATETIME),
+    )
+
+
+class PlayerValuesSerializer(ValuesSerializer):
+    """Mirrors ``PlayerSerializer``."""
+    model = Player
+    fields = (
+        ('id', 'id', None),
+        ('name', 'name', None),
+        ('position', 'position', None),
+        ('nationality', 'nationality', None),
+        ('birth_date', 'birth_date', DATE),
+        ('height', 'height', None),
+        ('weight', 'weight', None),
+        ('created_at', 'created_at', DATETIME),
+    )
+
+
+class GoalValuesSerializer(ValuesSerializer):
+    """Mirrors ``GoalSerializer``."""
+    model = Goal
+    fields = (
+        ('id', 'id', None),
+        ('game', 'game_id', None),
+        ('scorer', 'scorer_id', None),
+        ('assistant', 'assistant_id', None),
+        ('team', 'team_id', None),
+        ('minute', 'minute', None),
+        ('is_penalty', 'is_penalty', None),
+        ('is_own_goal', 'is_own_goal', None),
+        ('created_at', 'created_at', DATETIME),
+    )
+
+
+class FastListMixin:
+    """Serve ``list`` from a ``ValuesSerializer`` when plain JSON is requested.
+
+    Falls back to the regular serializer for the browsable API, indented
+    JSON, pagination, or when ``fast_serializer_class`` is not set.
+    """
+    fast_serializer_class = None
+
+    def can_use_fast_list(self, request):
+        renderer = getattr(request, 'accepted_renderer', None)
+        return (
+            self.fast_serializer_class is not None
+            and type(renderer) is JSONRenderer
+            and 'indent' not in (request.accepted_media_type or '')
+            and self.paginator is None
+        )
+
+    def list(self, request, *args, **kwargs):
+        if not self.can_use_fast_list(request):
+            return super().list(request, *args, **kwargs)
+        queryset = self.filter_queryset(self.get_queryset())
+        data = self.fast_serializer_class().serialize(queryset)
+        return HttpResponse(render_json(data), content_type=JSONRenderer.media_type)
@@ -1,5 +1,7 @@
 from django import forms
+from . import lookups
 from .models import League, Season, Team, Game, Player, PlayerContract, Goal
+from .widgets import AutocompleteSelect
 
 
 class LeagueForm(forms.ModelForm):
@@ -29,6 +31,9 @@ class GameForm(forms.ModelForm):
         model = Game
         fields = ['season', 'home_team', 'away_team', 'played_at', 'home_score', 'away_score']
         widgets = {
+            'season': AutocompleteSelect('season'),
+            'home_team': AutocompleteSelect('team', scope={'season': 'season'}),
+            'away_team': AutocompleteSelect('team', scope={'season': 'season'}),
             'played_at': forms.DateTimeInput(attrs={'type': 'datetime-local'}),
         }
 
@@ -60,6 +65,8 @@ class PlayerContractForm(forms.ModelForm):
         model = PlayerContract
         fields = ['player', 'team', 'number', 'start_date', 'end_date']
         widgets = {
+            'player': AutocompleteSelect('player'),
+            'team': AutocompleteSelect('team'),
             'start_date': forms.DateInput(attrs={'type': 'date'}),
             'end_date': forms.DateInput(attrs={'type': 'date'}),
         }
@@ -74,16 +81,11 @@ class PlayerContractForm(forms.ModelForm):
         if start and end and start > end:
             raise forms.ValidationError('End date must be after start date')
 
-        # Check for overlapping contracts
+        # Check for overlapping contracts (in the database, not the cached timelines
+        # another worker may not have refreshed yet)
         if player and start and end:
-            overlapping = PlayerContract.objects.filter(
-                player=player,
-                start_date__lte=end,
-                end_date__gte=start
-            )
-            if self.instance:
-                overlapping = overlapping.exclude(pk=self.instance.pk)
-            if overlapping.exists():
+            overlapping = PlayerContract.objects.filter(player=player, start_date__lte=end, end_date__gte=start)
+            if overlapping.exclude(pk=self.instance.pk).exists():
                 raise forms.ValidationError('Player already has a contract during this period')
         
         return cleaned
@@ -93,17 +95,12 @@ class GoalForm(forms.ModelForm):
     class Meta:
         model = Goal
         fields = ['game', 'scorer', 'assistant', 'minute', 'is_penalty', 'is_own_goal']
-    
-    def __init__(self, *args, **kwargs):
-        super().__init__(*args, **kwargs)
-        if self.instance and self.instance.game:
-            players = (
-                self.instance.game.home_team_players.all() |
-                self.instance.game.away_team_players.all()
-            ).distinct()
-            self.fields['scorer'].queryset = players
-            self.fields['assistant'].queryset = players
-    
+        widgets = {
+            'game': AutocompleteSelect('game'),
+            'scorer': AutocompleteSelect('player', scope={'game': 'game'}),
+            'assistant': AutocompleteSelect('player', scope={'game': 'game'}),
+        }
+
     def clean(self):
         cleaned = super().clean()
         game = cleaned.get('game')
@@ -118,10 +115,13 @@ class GoalForm(forms.ModelForm):
         if scorer and assistant and scorer == assistant:
             raise forms.ValidationError('Scorer and assistant must be different players')
 
-        if game and scorer and scorer not in game.home_team_players.all() and scorer not in game.away_team_players.all():
-            raise forms.ValidationError('Scorer must be in one of the teams')
-
-        if game and assistant and assistant not in game.home_team_players.all() and assistant not in game.away_team_players.all():
-            raise forms.ValidationError('Assistant must be in one of the teams')
+        # Check only the submitted players against the game's eligible players
+        if game and (scorer or assistant):
+            submitted = [player.pk for player in (scorer, assistant) if player]
+            eligible = set(lookups.game_players(game).filter(pk__in=submitted).values_list('pk', flat=True))
+            if scorer and scorer.pk not in eligible:
+                raise forms.ValidationError('Scorer must be in one of the teams')
+            if assistant and assistant.pk not in eligible:
+                raise forms.ValidationError('Assistant must be in one of the teams')
 
         return cleaned
\ No newline at end of file
@@ -0,0 +1,363 @@
+"""Live match event ingestion (see ``manage.py ingest_events``).
+
+The feed sends one JSON object per line, each with a unique ``id`` and a
+``type``::
+
+    kickoff        {game}
+    goal           {game, scorer, minute, assistant?, penalty?, own_goal?}
+    assist         {goal_event, assistant}        adds the assistant to an earlier goal event
+    lineup         {game, team, starters, substitutes?}
+    substitution   {game, team, player_off, player_on, minute}
+    final_whistle  {game, home_score?, away_score?}
+
+An optional ``ts`` (epoch seconds or ISO 8601) is the time the feed emitted
+the event and is only used for lag metrics.
+
+Events are applied in batches, one short transaction per batch with a
+savepoint per event, so a bad event is rejected on its own. Goal recounts
+and change log entries are coalesced per batch (see
+``signals.deferred_writes``). Every event id
+is recorded as an ``IngestedEvent`` in the same transaction, so replayed or
+duplicated events are skipped, even across restarts. Live scores follow the
+goal counts and are saved once per game per batch, and standings are
+rebuilt once per touched season after the batch commits. Leaderboards are
+keyed by the data version and rebuilt lazily on the next read.
+"""
+import json
+import statistics
+import time
+from collections import deque
+from datetime import datetime
+
+from django.core.exceptions import ValidationError
+from django.db import IntegrityError, transaction
+
+from .models import Appearance, Game, Goal, IngestedEvent, LeagueStanding, Player, Season
+from .signals import deferred_writes
+from .sqlite import write_transaction
+
+MAX_ID_LENGTH = IngestedEvent._meta.get_field('event_id').max_length
+FULL_TIME = 90
+
+
+class EventError(Exception):
+    """An event that cannot be applied; it is recorded as rejected."""
+
+
+def parse(line):
+    """Decode one feed line into an event dict, raising ``EventError`` if it is malformed."""
+    try:
+        event = json.loads(line)
+    except ValueError as exc:
+        raise EventError(f'invalid JSON: {exc}')
+    if not isinstance(event, dict):
+        raise EventError('event is not an object')
+    event_id = event.get('id')
+    if not isinstance(event_id, (str, int)) or not str(event_id) or len(str(event_id)) > MAX_ID_LENGTH:
+        raise EventError('missing or invalid event id')
+    event['id'] = str(event_id)
+    if event.get('type') not in HANDLERS:
+        raise EventError(f"unknown event type {event.get('type')!r}")
+    return event
+
+
+def feed_time(event):
+    """Epoch seconds at which the feed emitted ``event``, or None."""
+    ts = event.get('ts')
+    if isinstance(ts, (int, float)) and not isinstance(ts, bool):
+        return float(ts)
+    if isinstance(ts, str):
+        try:
+            parsed = datetime.fromisoformat(ts.replace('Z', '+00:00'))
+        except ValueError:
+            return None
+        return parsed.timestamp() if parsed.tzinfo else None
+    return None
+
+
+def _int(event, key, required=True):
+    value = event.get(key)
+    if value is None and not required:
+        return None
+    if isinstance(value, bool) or not isinstance(value, int) or value < 0:
+        raise EventError(f'{key} must be a non-negative integer')
+    return value
+
+
+class _Batch:
+    """Games, players and goals referenced by a batch, loaded up front."""
+
+    def __init__(self, events):
+        game_ids, player_ids, goal_events = set(), set(), set()
+        for event in events:
+            if isinstance(event.get('game'), int):
+                game_ids.add(event['game'])
+            for key in ('scorer', 'assistant', 'player_off', 'player_on'):
+                if isinstance(event.get(key), int):
+                    player_ids.add(event[key])
+            for key in ('starters', 'substitutes'):
+                if isinstance(event.get(key), list):
+                    player_ids.update(p for p in event[key] if isinstance(p, int))
+            if event['type'] == 'assist':
+                goal_events.add(str(event.get('goal_event')))
+
+        self.games = Game.objects.select_related(
+            'home_team__league', 'away_team__league', 'season__league'
+        ).in_bulk(game_ids)
+        self.players = set(Player.objects.filter(pk__in=player_ids).values_list('pk', flat=True))
+        # Goal ids of goal events from earlier batches; this batch's goals are added as they are created
+        self.goal_ids = dict(
+            IngestedEvent.objects.filter(event_id__in=goal_events, goal__isnull=False)
+            .values_list('event_id', 'goal_id')
+        )
+        self.live = set()  # games whose score follows their goal counts
+        self.seasons = set()  # seasons whose standings need a rebuild
+        self.records = []
+
+    def game(self, event):
+        game = self.games.get(_int(event, 'game'))
+        if game is None:
+            raise EventError(f"unknown game {event['game']}")
+        return game
+
+    def player(self, event, key, required=True):
+        return self.known_player(_int(event, key, required))
+
+    def known_player(self, player_id):
+        if player_id is not None and player_id not in self.players:
+            raise EventError(f'unknown player {player_id}')
+        return player_id
+
+    def side(self, game, event):
+        team_id = _int(event, 'team')
+        if team_id == game.home_team_id:
+            return team_id, 'home'
+        if team_id == game.away_team_id:
+            return team_id, 'away'
+        raise EventError(f'team {team_id} does not play in game {game.pk}')
+
+    def record(self, event, game=None, goal=None, error=''):
+        self.records.append(IngestedEvent(
+            event_id=event['id'], event_type=event['type'], game=game, goal=goal, error=error[:200]
+        ))
+
+    def flush_scores(self):
+        """Save the live score of every game whose goals changed, once per game."""
+        counts = Game.objects.filter(pk__in=self.live).values_list('pk', 'home_goal_count', 'away_goal_count')
+        for pk, home, away in counts:
+            game = self.games[pk]
+            if (game.home_score, game.away_score) != (home, away):
+                game.home_score, game.away_score = home, away
+                game.save(update_fields=['home_score', 'away_score'])
+                self.seasons.add(game.season_id)
+
+
+def _kickoff(batch, event):
+    game = batch.game(event)
+    batch.live.add(game.pk)
+    return game, None
+
+
+def _goal(batch, event):
+    game = batch.game(event)
+    goal = Goal(
+        game=game,
+        scorer_id=batch.player(event, 'scorer'),
+        assistant_id=batch.player(event, 'assistant', required=False),
+        minute=_int(event, 'minute'),
+        is_penalty=bool(event.get('penalty')),
+        is_own_goal=bool(event.get('own_goal')),
+    )
+    goal.save()
+    if goal.team_id is None:
+        raise EventError(f'scorer {goal.scorer_id} plays for neither team')
+    batch.goal_ids[event['id']] = goal.pk
+    batch.live.add(game.pk)
+    return game, goal
+
+
+def _assist(batch, event):
+    goal_id = batch.goal_ids.get(str(event.get('goal_event')))
+    if goal_id is None:
+        raise EventError(f"unknown goal event {event.get('goal_event')!r}")
+    goal = Goal.objects.select_related('game').get(pk=goal_id)
+    goal.assistant_id = batch.player(event, 'assistant')
+    goal.save(update_fields=['assistant'])
+    return goal.game, goal
+
+
+def _lineup(batch, event):
+    game = batch.game(event)
+    team_id, side = batch.side(game, event)
+    starters, substitutes = event.get('starters'), event.get('substitutes') or []
+    if not isinstance(starters, list) or not isinstance(substitutes, list):
+        raise EventError('starters and substitutes must be lists of player ids')
+    for started, players in ((True, starters), (False, substitutes)):
+        for player_id in players:
+            Appearance.objects.update_or_create(
+                game=game,
+                player_id=batch.known_player(player_id),
+                defaults={'team_id': team_id, 'side': side, 'started': started, 'minutes': FULL_TIME if started else 0},
+            )
+    return game, None
+
+
+def _substitution(batch, event):
+    game = batch.game(event)
+    team_id, side = batch.side(game, event)
+    minute = min(_int(event, 'minute'), FULL_TIME)
+    player_off, player_on = batch.player(event, 'player_off'), batch.player(event, 'player_on')
+    updated = Appearance.objects.filter(game=game, team_id=team_id, player_id=player_off).first()
+    if updated is None:
+        raise EventError(f'player {player_off} is not in the squad')
+    # A player who came on earlier only played from their own entry
+    updated.minutes = max(0, minute - (FULL_TIME - updated.minutes))
+    updated.save(update_fields=['minutes'])
+    Appearance.objects.update_or_create(
+        game=game, player_id=player_on,
+        defaults={'team_id': team_id, 'side': side, 'started': False, 'minutes': FULL_TIME - minute},
+    )
+    return game, None
+
+
+def _final_whistle(batch, event):
+    game = batch.game(event)
+    home, away = _int(event, 'home_score', False), _int(event, 'away_score', False)
+    if (home is None) != (away is None):
+        raise EventError('final_whistle needs both scores or neither')
+    if home is None:
+        batch.live.add(game.pk)
+    else:
+        batch.live.discard(game.pk)
+        game.home_score, game.away_score = home, away
+        game.save(update_fields=['home_score', 'away_score'])
+    batch.seasons.add(game.season_id)
+    return game, None
+
+
+HANDLERS = {
+    'kickoff': _kickoff,
+    'goal': _goal,
+    'assist': _assist,
+    'lineup': _lineup,
+    'substitution': _substitution,
+    'final_whistle': _final_whistle,
+}
+
+
+class BatchResult:
+    def __init__(self):
+        self.applied = 0
+        self.duplicates = 0
+        self.rejected = []  # (event id, reason)
+        self.seasons = set()
+
+
+def apply_batch(events):
+    """Apply parsed events in one transaction, skipping ids seen before; returns a ``BatchResult``.
+
+    Only one worker should consume a given feed: two workers applying the same
+    event at once fail the later batch on the unique event id. A batch that
+    finds the database locked is retried whole.
+    """
+    return write_transaction(_apply_batch, events)
+
+
+def _apply_batch(events):
+    result = BatchResult()
+    fresh = {}
+    for event in events:
+        if event['id'] in fresh:
+            result.duplicates += 1
+        else:
+            fresh[event['id']] = event
+    seen = set(IngestedEvent.objects.filter(event_id__in=list(fresh)).values_list('event_id', flat=True))
+    result.duplicates += len(seen)
+    fresh = [event for event_id, event in fresh.items() if event_id not in seen]
+    if not fresh:
+        return result
+
+    with transaction.atomic(), deferred_writes() as writes:
+        batch = _Batch(fresh)
+        for event in fresh:
+            try:
+                with writes.savepoint():
+                    game, goal = HANDLERS[event['type']](batch, event)
+            except (EventError, ValidationError, IntegrityError, ValueError) as exc:
+                reason = '; '.join(exc.messages) if isinstance(exc, ValidationError) else str(exc)
+                result.rejected.append((event['id'], reason))
+                game_id = event.get('game')
+                batch.record(event, game=batch.games.get(game_id) if isinstance(game_id, int) else None, error=reason)
+            else:
+                result.applied += 1
+                batch.record(event, game=game, goal=goal)
+        writes.recount()
+        batch.flush_scores()
+        IngestedEvent.objects.bulk_create(batch.records)
+    result.seasons = batch.seasons
+    return result
+
+
+def rebuild_standings(season_ids):
+    """Rebuild the standings of each season once, each in its own transaction."""
+    for season in Season.objects.filter(pk__in=season_ids).select_related('league'):
+        LeagueStanding.update_standings(season)
+
+
+class Metrics:
+    """Throughput and lag counters of an ingestion run.
+
+    Ingest lag is the time from reading an event to committing its batch;
+    feed lag is the time from the event's ``ts`` to the commit.
+    """
+
+    def __init__(self, window=10000):
+        self.started = time.monotonic()
+        self.received = 0
+        self.applied = 0
+        self.duplicates = 0
+        self.rejected = 0
+        self.batches = 0
+        self.ingest_lags = deque(maxlen=window)
+        self.feed_lags = deque(maxlen=window)
+        self._last_snapshot = (self.started, 0)
+
+    def observe(self, result, received_at, feed_times):
+        """Account for a committed batch read at the ``received_at`` monotonic times."""
+        now, wall = time.monotonic(), time.time()
+        self.batches += 1
+        self.applied += result.applied
+        self.duplicates += result.duplicates
+        self.rejected += len(result.rejected)
+        self.ingest_lags.extend(now - t for t in received_at)
+        self.feed_lags.extend(wall - t for t in feed_times if t is not None)
+
+    @staticmethod
+    def _percentiles(lags):
+        if not lags:
+            return None
+        ordered = sorted(lags)
+        return {
+            'p50': statistics.median(ordered),
+            'p95': ordered[min(len(ordered) - 1, int(len(ordered) * 0.95))],
+            'max': ordered[-1],
+        }
+
+    def snapshot(self):
+        """Counters so far, with the rate since the previous snapshot and the lags of recent events."""
+        now = time.monotonic()
+        elapsed = now - self.started
+        since, applied_then = self._last_snapshot
+        self._last_snapshot = (now, self.applied)
+        return {
+            'elapsed': elapsed,
+            'received': self.received,
+            'applied': self.applied,
+            'duplicates': self.duplicates,
+            'rejected': self.rejected,
+            'batches': self.batches,
+            'events_per_second': self.applied / elapsed if elapsed else 0.0,
+            'recent_events_per_second': (self.applied - applied_then) / (now - since) if now > since else 0.0,
+            'ingest_lag': self._percentiles(self.ingest_lags),
+            'feed_lag': self._percentiles(self.feed_lags),
+        }
@@ -0,0 +1,359 @@
+"""Background jobs queued in the database and run by ``manage.py run_jobs``.
+
+``enqueue()`` adds a ``Job`` row for a registered task (``@task(kind)``).
+``Runner`` claims due jobs, highest ``priority`` first, and runs them on a
+thread or process pool on the same machine; there is no broker.
+
+- Deduplication: while a job with a ``dedup_key`` is queued or running,
+  enqueueing the same key returns that job (a partial unique index backs it).
+- Retries: a task that raises is queued again after ``retry_backoff`` seconds,
+  doubling per attempt, until ``max_attempts``. ``JobError`` fails it at once.
+- Progress: tasks get a ``progress(done, total=None, message='')`` callback
+  whose values ``GET /api/jobs/<id>/`` reports.
+- Crashes: the runner refreshes ``heartbeat_at`` of the jobs it runs. A running
+  job without a heartbeat for ``stale_after`` seconds is treated as a failed
+  attempt, so a killed worker's jobs run again.
+
+Job rows are always read and written on ``'default'``, never the replica.
+"""
+import inspect
+import logging
+import os
+import socket
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, ThreadPoolExecutor, wait
+from datetime import date, timedelta
+
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, IntegrityError, connections, router
+from django.db.models import F
+from django.utils import timezone
+
+from . import metrics, sharding
+from .models import Game, Job, LeagueStanding, Season, StandingsState
+from .sqlite import write_transaction
+
+logger = logging.getLogger(__name__)
+
+DEFAULTS = {
+    'retry_backoff': 10,
+    'stale_after': 300,
+}
+# Progress is written at most this often (seconds)
+PROGRESS_INTERVAL = 1.0
+
+JOBS_FINISHED = metrics.Counter(
+    'jobs_finished_total', 'Background job attempts, per kind and outcome', ('kind', 'status'),
+)
+
+TASKS = {}
+
+
+class JobError(Exception):
+    """Fails a job without retrying it."""
+
+
+def _config():
+    return {**DEFAULTS, **getattr(settings, 'JOBS', {})}
+
+
+def task(kind):
+    """Register a function as the task run for jobs of ``kind``: ``func(progress, **job.args)``."""
+    def register(func):
+        TASKS[kind] = func
+        return func
+    return register
+
+
+def primary():
+    return Job.objects.using(DEFAULT_DB_ALIAS)
+
+
+def check_args(kind, args):
+    """Raise ``ValueError`` unless ``kind`` is registered and takes ``args``."""
+    if kind not in TASKS:
+        raise ValueError(f'Unknown job kind: {kind}')
+    try:
+        inspect.signature(TASKS[kind]).bind(None, **args)
+    except TypeError as exc:
+        raise ValueError(f'Invalid arguments for {kind}: {exc}')
+
+
+def enqueue(kind, args=None, priority=0, dedup_key=None, max_attempts=3, run_after=None, created_by=None):
+    """Queue a job; returns ``(job, created)``.
+
+    With a ``dedup_key`` that a queued or running job already has, that job
+    is returned instead. Raises ``ValueError`` for an unknown ``kind`` or
+    arguments its task does not take. ``created_by`` is a user id.
+    """
+    check_args(kind, args or {})
+
+    def create():
+        if dedup_key is not None:
+            existing = primary().filter(dedup_key=dedup_key, status__in=Job.ACTIVE).first()
+            if existing is not None:
+                return existing, False
+        return primary().create(
+            kind=kind, args=args or {}, priority=priority, dedup_key=dedup_key,
+            max_attempts=max_attempts, run_after=run_after or timezone.now(), created_by_id=created_by,
+        ), True
+
+    try:
+        return write_transaction(create)
+    except IntegrityError:
+        # Another request queued the same key in between
+        return primary().get(dedup_key=dedup_key, status__in=Job.ACTIVE), False
+
+
+def claim(worker, limit=1):
+    """Mark up to ``limit`` due jobs as running for ``worker``; returns their ids, highest priority first."""
+    def take():
+        now = timezone.now()
+        ids = list(
+            primary().select_for_update(skip_locked=True)
+            .filter(status=Job.QUEUED, run_after__lte=now)
+            .order_by('-priority', 'run_after', 'pk')
+            .values_list('pk', flat=True)[:limit]
+        )
+        if ids:
+            primary().filter(pk__in=ids).update(
+                status=Job.RUNNING, worker=worker, attempts=F('attempts') + 1,
+                started_at=now, heartbeat_at=now, finished_at=None,
+            )
+        return ids
+
+    return write_transaction(take) if limit > 0 else []
+
+
+def heartbeat(job_ids):
+    if job_ids:
+        primary().filter(pk__in=job_ids, status=Job.RUNNING).update(heartbeat_at=timezone.now())
+
+
+def _record_failure(job, message, permanent=False):
+    now = timezone.now()
+    running = primary().filter(pk=job.pk, status=Job.RUNNING)
+    if permanent or job.attempts >= job.max_attempts:
+        running.update(status=Job.FAILED, error=message[:500], finished_at=now, heartbeat_at=now)
+        status = Job.FAILED
+    else:
+        delay = _config()['retry_backoff'] * 2 ** max(0, job.attempts - 1)
+        running.update(
+            status=Job.QUEUED, error=message[:500], worker='', run_after=now + timedelta(seconds=delay),
+        )
+        status = Job.QUEUED
+    JOBS_FINISHED.inc(kind=job.kind, status='retry' if status == Job.QUEUED else status)
+    return status
+
+
+def recover_stale():
+    """Count running jobs whose worker stopped sending heartbeats as failed attempts; returns how many."""
+    cutoff = timezone.now() - timedelta(seconds=_config()['stale_after'])
+    stale = list(primary().filter(status=Job.RUNNING, heartbeat_at__lt=cutoff))
+    for job in stale:
+        _record_failure(job, f'Worker {job.worker} stopped responding')
+    return len(stale)
+
+
+class _Progress:
+    """The ``progress(done, total=None, message='')`` callback of a running job."""
+
+    def __init__(self, job_id):
+        self.job_id = job_id
+        self._written = 0.0
+
+    def __call__(self, done, total=None, message=''):
+        fraction = done / total if total else done
+        now = time.monotonic()
+        if now - self._written < PROGRESS_INTERVAL and fraction < 1:
+            return
+        self._written = now
+        primary().filter(pk=self.job_id, status=Job.RUNNING).update(
+            progress=min(1.0, max(0.0, fraction)), progress_message=str(message)[:200],
+            heartbeat_at=timezone.now(),
+        )
+
+
+def run(job_id):
+    """Run a claimed job and record its outcome; returns its new status."""
+    job = primary().get(pk=job_id)
+    try:
+        check_args(job.kind, job.args)
+    except ValueError as exc:
+        return _record_failure(job, str(exc), permanent=True)
+    try:
+        result = TASKS[job.kind](_Progress(job.pk), **job.args)
+    except JobError as exc:
+        logger.warning('Job %s (%s) failed: %s', job.pk, job.kind, exc)
+        return _record_failure(job, f'{type(exc).__name__}: {exc}', permanent=True)
+    except Exception as exc:
+        logger.exception('Job %s (%s) failed', job.pk, job.kind)
+        return _record_failure(job, f'{type(exc).__name__}: {exc}')
+    now = timezone.now()
+    primary().filter(pk=job.pk, status=Job.RUNNING).update(
+        status=Job.SUCCEEDED, result=result, progress=1.0, error='', finished_at=now, heartbeat_at=now,
+    )
+    JOBS_FINISHED.inc(kind=job.kind, status=Job.SUCCEEDED)
+    return Job.SUCCEEDED
+
+
+def _execute(job_id, flush_metrics=False):
+    try:
+        return run(job_id)
+    finally:
+        # Pool threads and processes outlive the job; don't keep its connections
+        connections.close_all()
+        if flush_metrics:
+            metrics.flush()
+
+
+def _init_process():
+    import django
+    django.setup()
+
+
+class Runner:
+    """Claims jobs and runs up to ``workers`` of them at once on threads or processes."""
+
+    def __init__(self, workers=4, processes=False, poll=1.0, log=None):
+        self.workers = max(1, workers)
+        self.processes = processes
+        self.poll = poll
+        self.log = log or (lambda message: None)
+        self.name = f'{socket.gethostname()}:{os.getpid()}'
+        self.stop = threading.Event()
+
+    def _executor(self):
+        if self.processes:
+            # Children must not share the parent's database connections
+            connections.close_all()
+            return ProcessPoolExecutor(self.workers, initializer=_init_process)
+        return ThreadPoolExecutor(self.workers, thread_name_prefix='job')
+
+    def run(self, once=False):
+        """Run jobs until ``stop`` is set (or, with ``once``, until none are due)."""
+        config = _config()
+        beat_every = max(1.0, config['stale_after'] / 5)
+        inflight = {}
+        last_beat = 0.0
+        with self._executor() as executor:
+            while True:
+                if time.monotonic() - last_beat >= beat_every:
+                    heartbeat(list(inflight.values()))
+                    recovered = recover_stale()
+                    if recovered:
+                        self.log(f'{recovered} stale job(s) requeued or failed')
+                    last_beat = time.monotonic()
+
+                claimed = [] if self.stop.is_set() else claim(self.name, self.workers - len(inflight))
+                for job_id in claimed:
+                    inflight[executor.submit(_execute, job_id, self.processes)] = job_id
+                if not inflight:
+                    if once or self.stop.is_set():
+                        return
+                    self.stop.wait(self.poll)
+                    continue
+
+                done, _ = wait(list(inflight), timeout=self.poll, return_when=FIRST_COMPLETED)
+                for future in done:
+                    job_id = inflight.pop(future)
+                    try:
+                        status = future.result()
+                    except Exception as exc:
+                        # The pool itself broke (e.g. a killed process)
+                        job = primary().get(pk=job_id)
+                        status = _record_failure(job, f'{type(exc).__name__}: {exc}')
+                    self.log(f'job {job_id}: {status}')
+
+
+def _season(season_id):
+    alias = sharding.locate(Season, season_id)
+    try:
+        if alias is None:
+            raise Season.DoesNotExist
+        return sharding.on(Season.objects.select_related('league'), alias).get(pk=season_id)
+    except Season.DoesNotExist:
+        raise JobError(f'Season {season_id} does not exist')
+
+
+@task('generate_fixtures')
+def generate_fixtures(progress, season_id, start_date=None, matchdays_interval=7):
+    from .scheduling import generate_fixtures
+
+    season = _season(season_id)
+    with sharding.use_instance(season):
+        if Game.objects.filter(season=season).exists():
+            raise JobError(f'Season {season_id} already has fixtures')
+        try:
+            games = generate_fixtures(
+                season, date.fromisoformat(start_date) if start_date else None, matchdays_interval,
+            )
+        except ValueError as exc:
+            raise JobError(str(exc))
+    return {'games': len(games)}
+
+
+def _standings_behind(season):
+    with sharding.use_instance(season):
+        return StandingsState.objects.filter(season=season, requested__gt=F('computed')).exists()
+
+
+@task('rebuild_standings')
+def rebuild_standings(progress, season_ids=None):
+    seasons = sharding.gather_list(Season.objects.select_related('league').order_by('pk'))
+    if season_ids is not None:
+        wanted = set(season_ids)
+        seasons = [season for season in seasons if season.pk in wanted]
+    for done, season in enumerate(seasons, 1):
+        LeagueStanding.update_standings(season)
+        # A change that took its ticket after the recompute read the results was deduplicated into this job
+        while _standings_behind(season):
+            LeagueStanding.update_standings(season)
+        progress(done, len(seasons), f'Season {season.pk}')
+    return {'seasons': len(seasons)}
+
+
+def queue_standings(season, created_by=None):
+    """Recompute ``season``'s standings in a ``rebuild_standings`` job; returns ``(job, created)``.
+
+    Call it once the result change committed. The change takes a
+    ``StandingsState`` ticket and joins the season's queued or running job
+    (``dedup_key`` ``standings:<id>``); a running job recomputes again
+    before it finishes when a ticket arrived after its recompute read the
+    results.
+    """
+    using = router.db_for_write(StandingsState, instance=season)
+    with sharding.use_instance(season):
+        write_transaction(StandingsState.request, season, using=using)
+    return enqueue(
+        'rebuild_standings', {'season_ids': [season.pk]}, dedup_key=f'standings:{season.pk}', created_by=created_by,
+    )
+
+
+@task('simulate_season')
+def simulate_season(progress, season_id, iterations=1000, seed=None):
+    from .simulation import simulate_season
+
+    season = _season(season_id)
+    with sharding.use_instance(season):
+        return simulate_season(season, iterations, seed, progress)
+
+
+@task('export_static')
+def export_static(progress, full=False):
+    # The directory is configuration, never a job argument: the exporter replaces and deletes files there
+    from .export import ExportError, Exporter
+
+    output = getattr(settings, 'STATIC_EXPORT_ROOT', None)
+    if not output:
+        raise JobError('STATIC_EXPORT_ROOT is not set')
+    exporter = Exporter(output, full=full)
+    try:
+        rendered = exporter.run()
+    except ExportError as exc:
+        raise JobError(str(exc))
+    return {
+        'rendered': len(rendered), 'written': exporter.written,
+        'unchanged': exporter.unchanged, 'removed': exporter.removed,
+    }
@@ -0,0 +1,148 @@
+"""Player and team leaderboards for a season or a whole league.
+
+All boards are built from a single grouped pass over the scope's goals,
+squads and results. The resulting tallies are cached per version of their
+season, league or of all leagues (see ``api.versioning``), and top-K
+requests are answered from them with a bounded heap instead of sorting
+every player.
+"""
+import heapq
+from collections import Counter
+
+from django.db.models import Count, Sum
+
+from . import metrics
+from .fastpath import PlayerValuesSerializer, TeamValuesSerializer
+from .models import Appearance, Game, Goal
+from .versioning import ALL, league_scope, season_scope, versioned_key
+
+PLAYER_BOARDS = (
+    'goals', 'assists', 'goal_contributions', 'penalties', 'own_goals', 'goals_per_appearance',
+    'minutes', 'goals_per_90',
+)
+TEAM_BOARDS = ('clean_sheets',)
+BOARDS = PLAYER_BOARDS + TEAM_BOARDS
+
+DEFAULT_LIMIT = 10
+MAX_LIMIT = 100
+
+# Tallies are invalidated by the data version; the timeout only bounds memory.
+CACHE_TIMEOUT = 60 * 60
+
+
+def _scope_games(season=None, league=None):
+    if season is not None:
+        return Game.objects.filter(season=season)
+    if league is not None:
+        return Game.objects.filter(season__league=league)
+    return Game.objects.all()
+
+
+def build_tallies(season=None, league=None):
+    """Aggregate every board's raw counts for a season, a league or everything."""
+    games = _scope_games(season, league).order_by()
+
+    goals = Counter()
+    assists = Counter()
+    penalties = Counter()
+    own_goals = Counter()
+    rows = Goal.objects.filter(game__in=games).order_by().values_list(
+        'scorer_id', 'assistant_id', 'is_penalty', 'is_own_goal'
+    )
+    for scorer_id, assistant_id, is_penalty, is_own_goal in rows:
+        if is_own_goal:
+            own_goals[scorer_id] += 1
+            continue
+        goals[scorer_id] += 1
+        if is_penalty:
+            penalties[scorer_id] += 1
+        if assistant_id is not None:
+            assists[assistant_id] += 1
+
+    appearances = {}
+    minutes = {}
+    rows = (
+        Appearance.objects.filter(game__in=games).order_by()
+        .values('player_id').annotate(n=Count('id'), m=Sum('minutes'))
+        .values_list('player_id', 'n', 'm')
+    )
+    for player_id, n, m in rows:
+        appearances[player_id] = n
+        minutes[player_id] = m
+
+    clean_sheets = Counter()
+    results = games.filter(home_score__isnull=False, away_score__isnull=False).values_list(
+        'home_team_id', 'away_team_id', 'home_score', 'away_score'
+    )
+    for home_team_id, away_team_id, home_score, away_score in results:
+        if away_score == 0:
+            clean_sheets[home_team_id] += 1
+        if home_score == 0:
+            clean_sheets[away_team_id] += 1
+
+    return {
+        'goals': dict(goals),
+        'assists': dict(assists),
+        'penalties': dict(penalties),
+        'own_goals': dict(own_goals),
+        'appearances': appearances,
+        'minutes': minutes,
+        'clean_sheets': dict(clean_sheets),
+    }
+
+
+def get_tallies(season=None, league=None):
+    """Cached ``build_tallies`` for the current data version of the scope."""
+    if season is not None:
+        key = versioned_key(season_scope(season.pk), 'leaderboards')
+    elif league is not None:
+        key = versioned_key(league_scope(league.pk), 'leaderboards')
+    else:
+        key = versioned_key(ALL, 'leaderboards')
+    return metrics.cached('leaderboards', key, lambda: build_tallies(season, league), CACHE_TIMEOUT)
+
+
+def _board_values(tallies, board, min_appearances=1):
+    """Return ``{id: value}`` for a board, deriving combined boards on the fly."""
+    if board == 'goal_contributions':
+        values = Counter(tallies['goals'])
+        values.update(tallies['assists'])
+        return values
+    if board == 'goals_per_appearance':
+        goals = tallies['goals']
+        return {
+            player_id: round(goals.get(player_id, 0) / apps, 3)
+            for player_id, apps in tallies['appearances'].items()
+            if apps >= min_appearances and goals.get(player_id)
+        }
+    if board == 'goals_per_90':
+        goals, minutes = tallies['goals'], tallies['minutes']
+        return {
+            player_id: round(goals.get(player_id, 0) * 90 / minutes[player_id], 3)
+            for player_id, apps in tallies['appearances'].items()
+            if apps >= min_appearances and goals.get(player_id) and minutes.get(player_id)
+        }
+    return tallies[board]
+
+
+def top_k(values, k):
+    """Top ``k`` ``(id, value)`` pairs, ties broken by lower id, in O(n log k)."""
+    return heapq.nlargest(k, values.items(), key=lambda item: (item[1], -item[0]))
+
+
+def leaderboards(tallies, boards=BOARDS, limit=DEFAULT_LIMIT, min_appearances=1):
+    """Resolve the requested boards into serialized ``{player|team, value}`` rows."""
+    ranked = {board: top_k(_board_values(tallies, board, min_appearances), limit) for board in boards}
+
+    player_ids = {pk for board in boards if board in PLAYER_BOARDS for pk, _ in ranked[board]}
+    team_ids = {pk for board in boards if board in TEAM_BOARDS for pk, _ in ranked[board]}
+    players = PlayerValuesSerializer().serialize_map(player_ids) if player_ids else {}
+    teams = TeamValuesSerializer().serialize_map(team_ids) if team_ids else {}
+
+    data = {}
+    for board in boards:
+        if board in TEAM_BOARDS:
+            data[board] = [{'team': teams[pk], 'value': value} for pk, value in ranked[board] if pk in teams]
+        else:
+            data[board] = [{'player': players[pk], 'value': value} for pk, value in ranked[board] if pk in players]
+    return data
@@ -0,0 +1,191 @@
+"""Keyset pagination, filtering and sorting for the HTML list pages.
+
+Pages are addressed by an opaque cursor holding the sort value and id of the
+last row shown, so fetching page N costs the same as page 1 (no OFFSET
+scans). Rows are always ordered by the sort column plus ``id`` as tie
+breaker, and NULLs sort as the smallest values (SQLite's native order).
+"""
+import base64
+import binascii
+import json
+from datetime import datetime, time, timedelta
+
+from django.db.models import F, Q
+from django.utils import timezone
+from django.utils.dateparse import parse_date
+
+from . import sharding
+
+DEFAULT_PAGE_SIZE = 50
+MAX_PAGE_SIZE = 200
+
+
+def encode_cursor(value, pk):
+    if hasattr(value, 'isoformat'):
+        value = value.isoformat()
+    raw = json.dumps([value, pk], separators=(',', ':')).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip('=')
+
+
+def decode_cursor(cursor):
+    """Return ``(value, pk)`` or None for a missing or malformed cursor."""
+    if not cursor:
+        return None
+    try:
+        raw = base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4))
+        value, pk = json.loads(raw)
+        return value, int(pk)
+    except (ValueError, TypeError, binascii.Error):
+        return None
+
+
+def _after(field_name, value, pk, descending, nullable):
+    """Rows that come after ``(value, pk)`` in the page ordering."""
+    op = 'lt' if descending else 'gt'
+    if value is None:
+        same_null = Q(**{f'{field_name}__isnull': True, f'id__{op}': pk})
+        return same_null if descending else same_null | Q(**{f'{field_name}__isnull': False})
+    after = Q(**{f'{field_name}__{op}': value}) | Q(**{field_name: value, f'id__{op}': pk})
+    if nullable and descending:
+        after |= Q(**{f'{field_name}__isnull': True})
+    return after
+
+
+class KeysetPage:
+    """One page of rows plus the query strings for the first and next pages."""
+
+    def __init__(self, object_list, sort, next_cursor, params):
+        self.object_list = object_list
+        self.sort = sort
+        self.next_cursor = next_cursor
+        self._params = params
+
+    def __iter__(self):
+        return iter(self.object_list)
+
+    def __len__(self):
+        return len(self.object_list)
+
+    @property
+    def has_next(self):
+        return self.next_cursor is not None
+
+    @property
+    def is_first(self):
+        return 'cursor' not in self._params
+
+    def first_query(self):
+        params = self._params.copy()
+        params.pop('cursor', None)
+        return params.urlencode()
+
+    def next_query(self):
+        params = self._params.copy()
+        params['cursor'] = self.next_cursor
+        return params.urlencode()
+
+
+def _merge(rows_by_database, attname, descending):
+    """Rows of several databases, each already in page order, in page order."""
+    def key(row):
+        value = getattr(row, attname)
+        # NULLs first ascending, last descending, as in the queries
+        return value is not None, value, row.pk
+    rows = [row for rows in rows_by_database for row in rows]
+    return sorted(rows, key=key, reverse=descending)
+
+
+def keyset_queryset(queryset, field_name, descending=False, cursor=None):
+    """``queryset`` in page order, starting after ``cursor`` (``(value, pk)``, as decoded)."""
+    field = queryset.model._meta.get_field(field_name)
+    if field.null:
+        expression = F(field_name).desc(nulls_last=True) if descending else F(field_name).asc(nulls_first=True)
+    else:
+        expression = F(field_name).desc() if descending else F(field_name).asc()
+    queryset = queryset.order_by(expression, '-id' if descending else 'id')
+
+    if cursor:
+        value, pk = cursor
+        try:
+            value = field.to_python(value) if value is not None else None
+        except Exception:
+            value, pk = None, None
+        if pk is not None:
+            queryset = queryset.filter(_after(field_name, value, pk, descending, field.null))
+    return queryset
+
+
+def keyset_paginate(request, queryset, sortable, default_sort, databases=None):
+    """Order ``queryset`` by the requested sort and return the current ``KeysetPage``.
+
+    ``sortable`` maps the public ``sort`` names to model fields, each of
+    which needs a ``(field, id)`` index so pages are read in index order.
+    With ``databases`` (see ``api.sharding``), the page is read from each of
+    them and merged.
+    """
+    sort = request.GET.get('sort', default_sort)
+    if sort.lstrip('-') not in sortable:
+        sort = default_sort
+    descending = sort.startswith('-')
+    field_name = sortable[sort.lstrip('-')]
+    field = queryset.model._meta.get_field(field_name)
+    queryset = keyset_queryset(queryset, field_name, descending, decode_cursor(request.GET.get('cursor')))
+
+    try:
+        page_size = int(request.GET.get('page_size', DEFAULT_PAGE_SIZE))
+    except ValueError:
+        page_size = DEFAULT_PAGE_SIZE
+    page_size = max(1, min(page_size, MAX_PAGE_SIZE))
+
+    if databases:
+        rows_by_database = []
+        for alias in databases:
+            with sharding.use_db(alias):
+                rows_by_database.append(list(sharding.on(queryset, alias)[:page_size + 1]))
+        rows = _merge(rows_by_database, field.attname, descending)[:page_size + 1]
+    else:
+        rows = list(queryset[:page_size + 1])
+    next_cursor = None
+    if len(rows) > page_size:
+        rows = rows[:page_size]
+        last = rows[-1]
+        next_cursor = encode_cursor(getattr(last, field.attname), last.pk)
+    return KeysetPage(rows, sort, next_cursor, request.GET.copy())
+
+
+def int_param(request, name):
+    try:
+        return int(request.GET[name])
+    except (KeyError, ValueError):
+        return None
+
+
+def _parse_day(value):
+    try:
+        return parse_date(value) if value else None
+    except ValueError:
+        return None
+
+
+def date_range(request, prefix='date'):
+    """Aware ``(start, end)`` datetimes for ``<prefix>_from``/``<prefix>_to`` (end exclusive)."""
+    day_from = _parse_day(request.GET.get(f'{prefix}_from'))
+    day_to = _parse_day(request.GET.get(f'{prefix}_to'))
+    start = timezone.make_aware(datetime.combine(day_from, time.min)) if day_from else None
+    end = timezone.make_aware(datetime.combine(day_to + timedelta(days=1), time.min)) if day_to else None
+    return start, end
+
+
+def select_filter(name, label, choices, value):
+    """Context for a <select> in ``includes/list_filters.html``."""
+    return {
+        'name': name,
+        'label': label,
+        'type': 'select',
+        'choices': [(str(pk), text) for pk, text in choices],
+        'value': '' if value is None else str(value),
+    }
+
+
+def date_filter(name, label, request):
+    return {'name': name, 'label': label, 'type': 'date', 'value': request.GET.get(name, '')}
@@ -0,0 +1,114 @@
+"""Scoped choice lookups behind the autocomplete form widgets.
+
+``GET /api/lookup/<kind>/?q=<text>&<scope>=<id>`` returns at most ``LIMIT``
+``{id, text}`` choices, so forms never render or query a whole table. Scopes
+narrow the choices to what the form can accept, e.g. ``player?game=<id>``
+lists only the players who can appear in that game. Forms validate submitted
+ids against the same scopes (see ``api.forms``).
+"""
+from django.db.models import Q
+from django.utils import timezone
+
+from . import rosters, search
+from .models import Season, Team, Game, Player
+
+LIMIT = 20
+
+
+def _scope_id(params, name):
+    try:
+        return int(params[name])
+    except (KeyError, TypeError, ValueError):
+        return None
+
+
+def _matching(queryset, text, kind, relations=('',)):
+    """Rows where a ``kind`` object (itself, or one of ``relations``) matches ``text`` by name."""
+    if not text:
+        return queryset
+    condition = Q()
+    if search.is_available():
+        ids = search.matching_ids(text, kind)
+        for relation in relations:
+            condition |= Q(**{f'{relation}pk__in': ids})
+    else:
+        for relation in relations:
+            condition |= Q(**{f'{relation}name__icontains': text})
+    return queryset.filter(condition)
+
+
+def contracted_players(team_ids, day):
+    """Players under contract with any of ``team_ids`` on ``day``."""
+    timelines = rosters.team_timelines(team_ids)
+    return Player.objects.filter(pk__in={c.player_id for t in timelines.values() for c in t.active_at(day)})
+
+
+def game_players(game):
+    """Players who can score or assist in ``game``.
+
+    Those contracted to either team on the match date (today for unscheduled
+    games), plus anyone already named in the game's squads.
+    """
+    day = timezone.localdate(game.played_at) if game.played_at else timezone.localdate()
+    return Player.objects.filter(
+        Q(pk__in=contracted_players([game.home_team_id, game.away_team_id], day).values('pk'))
+        | Q(pk__in=game.appearances.values('player_id'))
+    )
+
+
+def player_choices(text, params):
+    players = Player.objects.all()
+    game_id, team_id = _scope_id(params, 'game'), _scope_id(params, 'team')
+    if game_id is not None:
+        game = Game.objects.filter(pk=game_id).first()
+        players = game_players(game) if game else Player.objects.none()
+    elif team_id is not None:
+        players = contracted_players([team_id], timezone.localdate())
+    elif text and search.is_available():
+        # Unscoped: take the best ranked matches instead of sorting every match by name.
+        ids = [hit['id'] for hit in search.search(text, ['player'], LIMIT)]
+        found = Player.objects.in_bulk(ids)
+        return [found[pk] for pk in ids if pk in found]
+    return _matching(players, text, 'player').order_by('name')
+
+
+def team_choices(text, params):
+    teams = Team.objects.select_related('league')
+    season_id, league_id = _scope_id(params, 'season'), _scope_id(params, 'league')
+    if season_id is not None:
+        teams = teams.filter(league__seasons=season_id)
+    elif league_id is not None:
+        teams = teams.filter(league_id=league_id)
+    return _matching(teams, text, 'team').order_by('name')
+
+
+def season_choices(text, params):
+    seasons = Season.objects.select_related('league')
+    league_id = _scope_id(params, 'league')
+    if league_id is not None:
+        seasons = seasons.filter(league_id=league_id)
+    if text:
+        seasons = seasons.filter(Q(name__icontains=text) | Q(league__name__icontains=text))
+    return seasons.order_by('-start_date')
+
+
+def game_choices(text, params):
+    games = Game.objects.select_related('home_team__league', 'away_team__league')
+    season_id = _scope_id(params, 'season')
+    if season_id is not None:
+        games = games.filter(season_id=season_id)
+    return _matching(games, text, 'team', ('home_team__', 'away_team__')).order_by('-played_at')
+
+
+LOOKUPS = {
+    'player': player_choices,
+    'team': team_choices,
+    'season': season_choices,
+    'game': game_choices,
+}
+
+
+def lookup(kind, text, params):
+    """``[{id, text}]`` for an autocomplete ``kind``; raises KeyError for unknown kinds."""
+    choices = LOOKUPS[kind](text.strip(), params)[:LIMIT]
+    return [{'id': obj.pk, 'text': str(obj)} for obj in choices]
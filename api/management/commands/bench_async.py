@@ -0,0 +1,103 @@
+import asyncio
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections
+from django.test import RequestFactory
+
+from api import async_views, views
+from api.models import League, Team
+
+
+class Command(BaseCommand):
+    help = 'Load-test the sync and async read views side by side with a local load generator'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--requests',
+            type=int,
+            help='Requests per endpoint and mode',
+            default=100
+        )
+        parser.add_argument(
+            '--concurrency',
+            type=int,
+            help='Requests in flight at once',
+            default=10
+        )
+
+    def _endpoints(self):
+        league = League.objects.first()
+        team = Team.objects.filter(league=league).first()
+        if league is None or team is None:
+            raise CommandError('Needs at least one league with a team (try seed_data).')
+        return [
+            ('dashboard', views.dashboard, async_views.dashboard, {}, 'text/html'),
+            ('league_detail', views.league_detail, async_views.league_detail, {'pk': league.pk}, 'text/html'),
+            ('league standings',
+             views.LeagueViewSet.as_view({'get': 'standings'}), async_views.league_standings,
+             {'pk': league.pk}, 'application/json'),
+            ('team fixtures',
+             views.TeamViewSet.as_view({'get': 'fixtures'}), async_views.team_fixtures,
+             {'pk': team.pk}, 'application/json'),
+        ]
+
+    def _run_sync(self, view, kwargs, accept, total, concurrency):
+        factory = RequestFactory()
+
+        def one(_):
+            start = time.perf_counter()
+            response = view(factory.get('/', HTTP_ACCEPT=accept), **kwargs)
+            if hasattr(response, 'render'):
+                response.render()
+            connections.close_all()
+            return time.perf_counter() - start
+
+        started = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=concurrency) as pool:
+            latencies = list(pool.map(one, range(total)))
+        return latencies, time.perf_counter() - started
+
+    def _run_async(self, view, kwargs, accept, total, concurrency):
+        factory = RequestFactory()
+
+        async def main():
+            semaphore = asyncio.Semaphore(concurrency)
+
+            async def one():
+                async with semaphore:
+                    start = time.perf_counter()
+                    response = await view(factory.get('/', HTTP_ACCEPT=accept), **kwargs)
+                    if hasattr(response, 'render'):
+                        response.render()
+                    return time.perf_counter() - start
+
+            started = time.perf_counter()
+            latencies = await asyncio.gather(*(one() for _ in range(total)))
+            return latencies, time.perf_counter() - started
+
+        return asyncio.run(main())
+
+    def _summary(self, latencies, elapsed):
+        latencies = sorted(latencies)
+        p50 = latencies[len(latencies) // 2] * 1000
+        p95 = latencies[min(len(latencies) - 1, int(len(latencies) * 0.95))] * 1000
+        return p50, p95, len(latencies) / elapsed
+
+    def handle(self, *args, **options):
+        total = options['requests']
+        concurrency = options['concurrency']
+        self.stdout.write(f'{total} requests per run, concurrency {concurrency}')
+
+        for name, sync_view, async_view, kwargs, accept in self._endpoints():
+            # warm up caches and connections so both modes start equal
+            self._run_sync(sync_view, kwargs, accept, 1, 1)
+            self._run_async(async_view, kwargs, accept, 1, 1)
+
+            sync_p50, sync_p95, sync_rps = self._summary(*self._run_sync(sync_view, kwargs, accept, total, concurrency))
+            async_p50, async_p95, async_rps = self._summary(*self._run_async(async_view, kwargs, accept, total, concurrency))
+            self.stdout.write(
+                f'{name:<17} sync:  p50 {sync_p50:7.2f} ms  p95 {sync_p95:7.2f} ms  {sync_rps:7.1f} req/s\n'
+                f'{"":<17} async: p50 {async_p50:7.2f} ms  p95 {async_p95:7.2f} ms  {async_rps:7.1f} req/s'
+            )
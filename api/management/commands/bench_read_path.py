@@ -0,0 +1,79 @@
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import connection, reset_queries
+from django.test.utils import CaptureQueriesContext
+from rest_framework.test import APIRequestFactory
+
+from api.views import GameViewSet, GoalViewSet, PlayerViewSet, LeagueStandingViewSet
+
+
+class Command(BaseCommand):
+    help = 'Compare the serializer and values_list() fast paths for the API list actions'
+
+    viewsets = {
+        'games': GameViewSet,
+        'goals': GoalViewSet,
+        'players': PlayerViewSet,
+        'standings': LeagueStandingViewSet,
+    }
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--iterations',
+            type=int,
+            help='Number of timed requests per path',
+            default=20
+        )
+        parser.add_argument(
+            '--endpoint',
+            action='append',
+            choices=sorted(self.viewsets),
+            help='Endpoint(s) to benchmark (default: all)'
+        )
+
+    def _run(self, viewset, fast):
+        view = viewset.as_view({'get': 'list'}, fast_serializer_class=viewset.fast_serializer_class if fast else None)
+        request = APIRequestFactory().get('/', HTTP_ACCEPT='application/json')
+        response = view(request)
+        if hasattr(response, 'render'):
+            response.render()
+        return response.content
+
+    def _time(self, viewset, fast, iterations):
+        timings = []
+        for _ in range(iterations):
+            start = time.perf_counter()
+            self._run(viewset, fast)
+            timings.append(time.perf_counter() - start)
+        timings.sort()
+        return timings[len(timings) // 2], timings[0]
+
+    def handle(self, *args, **options):
+        iterations = options['iterations']
+        names = options['endpoint'] or sorted(self.viewsets)
+
+        for name in names:
+            viewset = self.viewsets[name]
+            reset_queries()
+            with CaptureQueriesContext(connection) as slow_queries:
+                slow_body = self._run(viewset, fast=False)
+            reset_queries()
+            with CaptureQueriesContext(connection) as fast_queries:
+                fast_body = self._run(viewset, fast=True)
+
+            identical = slow_body == fast_body
+            slow_median, slow_best = self._time(viewset, False, iterations)
+            fast_median, fast_best = self._time(viewset, True, iterations)
+            speedup = slow_median / fast_median if fast_median else float('inf')
+
+            self.stdout.write(
+                f'{name:<10} bytes={len(fast_body):<9} '
+                f'serializer: {slow_median * 1000:8.2f} ms (best {slow_best * 1000:.2f}, {len(slow_queries)} queries)  '
+                f'fast: {fast_median * 1000:8.2f} ms (best {fast_best * 1000:.2f}, {len(fast_queries)} queries)  '
+                f'x{speedup:.1f}'
+            )
+            if identical:
+                self.stdout.write(self.style.SUCCESS('           output identical'))
+            else:
+                self.stdout.write(self.style.ERROR('           output differs'))
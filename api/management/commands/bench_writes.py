@@ -0,0 +1,143 @@
+import os
+import random
+import sqlite3
+import tempfile
+import threading
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import OperationalError, connections
+from django.test.utils import override_settings
+
+from api.metrics import STANDINGS_REQUESTS
+from api.models import Game, LeagueStanding
+from api.sqlite import is_lock_error
+
+# SQLite's own defaults, deferred transactions and no retries
+BASELINE_PROFILE = {
+    'journal_mode': 'delete',
+    'synchronous': 'full',
+    'mmap_size': 0,
+    'cache_size': -2000,
+    'temp_store': 'default',
+    'busy_timeout': 5000,
+    'retries': 0,
+}
+
+
+class Command(BaseCommand):
+    help = (
+        'Stress-test concurrent result entry (score update plus standings recompute) on a copy of the database, '
+        'with SQLite defaults and with the SQLITE_PROFILE settings'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--writes',
+            type=int,
+            help='Results entered per run',
+            default=200
+        )
+        parser.add_argument(
+            '--concurrency',
+            type=int,
+            help='Writer threads',
+            default=8
+        )
+        parser.add_argument(
+            '--profile',
+            choices=['baseline', 'tuned', 'both'],
+            help='Which configuration to run',
+            default='both'
+        )
+
+    def _copy(self, path):
+        source = connections['default']
+        source.ensure_connection()
+        target = sqlite3.connect(path)
+        try:
+            source.connection.backup(target)
+        finally:
+            target.close()
+
+    def _standings_requests(self):
+        return {labels[0]: value for labels, value in STANDINGS_REQUESTS.samples()}
+
+    def _run(self, game_ids, writes, concurrency):
+        latencies, failures = [], []
+        lock = threading.Lock()
+
+        def writer(count, seed):
+            rng = random.Random(seed)
+            try:
+                for _ in range(count):
+                    start = time.perf_counter()
+                    try:
+                        game = Game.objects.select_related('season__league').get(pk=rng.choice(game_ids))
+                        game.home_score, game.away_score = rng.randint(0, 4), rng.randint(0, 4)
+                        game.save(update_fields=['home_score', 'away_score'])
+                        LeagueStanding.update_standings(game.season)
+                    except OperationalError as exc:
+                        if not is_lock_error(exc):
+                            raise
+                        with lock:
+                            failures.append(str(exc))
+                    else:
+                        with lock:
+                            latencies.append(time.perf_counter() - start)
+            finally:
+                connections.close_all()
+
+        shares = [writes // concurrency + (i < writes % concurrency) for i in range(concurrency)]
+        threads = [threading.Thread(target=writer, args=(share, i)) for i, share in enumerate(shares)]
+        started = time.perf_counter()
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        return latencies, failures, time.perf_counter() - started
+
+    def handle(self, *args, **options):
+        settings_dict = connections['default'].settings_dict
+        if connections['default'].vendor != 'sqlite':
+            raise CommandError('Only SQLite databases are benchmarked.')
+        game_ids = list(Game.objects.values_list('pk', flat=True))
+        if not game_ids:
+            raise CommandError('Needs at least one game (try seed_data).')
+        writes, concurrency = options['writes'], max(1, options['concurrency'])
+        modes = ['baseline', 'tuned'] if options['profile'] == 'both' else [options['profile']]
+        self.stdout.write(f'{writes} results per run, {concurrency} writer threads')
+
+        name, db_options = settings_dict['NAME'], settings_dict.get('OPTIONS', {})
+        with tempfile.TemporaryDirectory() as directory:
+            for mode in modes:
+                path = os.path.join(directory, f'{mode}.sqlite3')
+                self._copy(path)
+                connections.close_all()
+                settings_dict['NAME'] = path
+                if mode == 'baseline':
+                    settings_dict['OPTIONS'] = {**db_options, 'transaction_mode': None}
+                    profile = override_settings(SQLITE_PROFILE=BASELINE_PROFILE)
+                else:
+                    settings_dict['OPTIONS'] = {**db_options, 'transaction_mode': 'IMMEDIATE'}
+                    profile = override_settings()
+                before = self._standings_requests()
+                try:
+                    with profile:
+                        latencies, failures, elapsed = self._run(game_ids, writes, concurrency)
+                finally:
+                    connections.close_all()
+                    settings_dict['NAME'], settings_dict['OPTIONS'] = name, db_options
+                after = self._standings_requests()
+                recomputed, skipped = (
+                    after.get(result, 0) - before.get(result, 0) for result in ('recomputed', 'skipped')
+                )
+
+                latencies.sort()
+                p50 = latencies[len(latencies) // 2] * 1000 if latencies else 0.0
+                p95 = latencies[min(len(latencies) - 1, int(len(latencies) * 0.95))] * 1000 if latencies else 0.0
+                self.stdout.write(
+                    f'{mode:<9} {len(latencies) / elapsed:8.1f} writes/s  '
+                    f'p50 {p50:7.2f} ms  p95 {p95:7.2f} ms  {len(failures)} failed (database is locked)  '
+                    f'standings: {recomputed} recomputed, {skipped} covered by a newer recompute'
+                )
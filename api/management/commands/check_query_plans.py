@@ -0,0 +1,107 @@
+import re
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.db.models import Count, Q
+from django.utils import timezone
+
+from api.leaderboards import _scope_games
+from api.listing import keyset_queryset
+from api.models import (
+    Appearance, ChangeLogEntry, Game, Goal, League, LeagueStanding, Player, PlayerContract, Season, Team,
+)
+
+# "SCAN api_game" (or "SCAN TABLE api_game" on older SQLite) without a
+# "USING ... INDEX" clause reads every row of the table.
+FULL_SCAN = re.compile(r'\bSCAN (?:TABLE )?(\w+)(?!.*\bUSING\b)')
+
+
+def hot_querysets():
+    """``(name, queryset)`` for the queries behind the dashboard, standings, stats and list pages.
+
+    Only the plan matters, so placeholder ids are used and no data is needed.
+    """
+    season, team, player = 1, 1, 1
+    now = timezone.now()
+    today = now.date()
+    games = _scope_games(season=season).order_by()
+    return [
+        ('dashboard standings', LeagueStanding.objects.filter(season=season)),
+        ('dashboard recent games',
+         Game.objects.filter(season=season, played_at__lt=now, home_score__isnull=False).order_by('-played_at')[:5]),
+        ('dashboard upcoming games',
+         Game.objects.filter(season=season, played_at__gt=now).order_by('played_at')[:5]),
+        ('dashboard form table',
+         Game.objects.filter(season=season, played_at__lt=now, home_score__isnull=False).order_by('-played_at')),
+        ('league totals',
+         Game.objects.filter(season=season, home_score__isnull=False, away_score__isnull=False)),
+        ('standings rebuild (home)',
+         Game.objects.filter(season=season, home_team=team, home_score__isnull=False, away_score__isnull=False)),
+        ('standings rebuild (away)',
+         Game.objects.filter(season=season, away_team=team, home_score__isnull=False, away_score__isnull=False)),
+        ('team fixtures',
+         Game.objects.filter(Q(home_team=team) | Q(away_team=team), season=season).order_by('played_at')),
+        ('leaderboard goals',
+         Goal.objects.filter(game__in=games).order_by().values_list('scorer_id', 'assistant_id')),
+        ('leaderboard appearances',
+         Appearance.objects.filter(game__in=games).order_by().values('player_id').annotate(n=Count('id'))),
+        ('goal timing goals',
+         Goal.objects.filter(
+             game__in=Game.objects.filter(season=season, home_score__isnull=False, away_score__isnull=False),
+             team__isnull=False,
+         ).order_by().values_list('game_id', 'minute', 'id', 'team_id', 'is_penalty', 'is_own_goal')),
+        ('player season appearances',
+         Appearance.objects.filter(player=player, game__season=season).values('player_id').annotate(n=Count('id'))),
+        ('player season goals', Goal.objects.filter(scorer=player, game__season=season)),
+        ('player season assists', Goal.objects.filter(assistant=player, game__season=season)),
+        ('current squad',
+         PlayerContract.objects.filter(team=team, start_date__lte=today, end_date__gte=today)),
+        ('delta sync',
+         ChangeLogEntry.objects.filter(season=season, version__gt=0).order_by('version')),
+        ('season calendar', Game.objects.filter(season=season).order_by('played_at')),
+    ] + list_pages()
+
+
+def list_pages():
+    """The page after a cursor of each HTML list page, for every sort in both directions."""
+    now = timezone.now()
+    pages = [
+        ('league list', League.objects.all(), {'name': 'M', 'created_at': now}),
+        ('season list', Season.objects.select_related('league'), {'name': '2024', 'start_date': now.date()}),
+        ('team list', Team.objects.select_related('league'), {'name': 'M', 'founded_year': 1900}),
+        ('game list', Game.objects.select_related('home_team', 'away_team', 'season'), {'played_at': now}),
+        ('game list of a season',
+         Game.objects.select_related('home_team', 'away_team', 'season').filter(season=1), {'played_at': now}),
+        ('player list', Player.objects.all(), {'name': 'M', 'birth_date': now.date()}),
+    ]
+    return [
+        (f'{name} by {"-" if descending else ""}{field}',
+         keyset_queryset(queryset, field, descending, cursor=(value, 1))[:51])
+        for name, queryset, cursors in pages
+        for field, value in cursors.items()
+        for descending in (False, True)
+    ]
+
+
+class Command(BaseCommand):
+    help = 'Run EXPLAIN QUERY PLAN on the hot querysets and fail if any falls back to a full table scan'
+
+    def handle(self, *args, **options):
+        if connection.vendor != 'sqlite':
+            raise CommandError('Query plan checks are written against SQLite plans.')
+
+        failures = []
+        for name, queryset in hot_querysets():
+            plan = queryset.explain()
+            scans = FULL_SCAN.findall(plan)
+            if scans:
+                failures.append(name)
+                self.stdout.write(self.style.ERROR(f'FAIL {name}: full scan of {", ".join(scans)}'))
+            else:
+                self.stdout.write(f'ok   {name}')
+            if options['verbosity'] > 1:
+                self.stdout.write('     ' + plan.replace('\n', '\n     '))
+
+        if failures:
+            raise CommandError(f'{len(failures)} hot queries fall back to a full table scan.')
+        self.stdout.write(self.style.SUCCESS('All hot queries use an index.'))
@@ -0,0 +1,37 @@
+from django.core.management.base import BaseCommand
+
+from api import sync
+from api.models import SeasonSyncState
+
+
+class Command(BaseCommand):
+    help = 'Compact the delta-sync change log, keeping the most recent versions of each season intact'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--season',
+            type=int,
+            action='append',
+            help='Season id(s) to compact (default: all)'
+        )
+        parser.add_argument(
+            '--keep',
+            type=int,
+            help='Number of most recent versions to leave uncompacted',
+            default=1000
+        )
+
+    def handle(self, *args, **options):
+        states = SeasonSyncState.objects.select_related('season')
+        if options['season']:
+            states = states.filter(season__in=options['season'])
+
+        total = 0
+        for state in states:
+            horizon = state.version - options['keep']
+            if horizon <= 0:
+                continue
+            removed = sync.compact(state.season, horizon)
+            total += removed
+            self.stdout.write(f'{state.season}: removed {removed} entries up to v{horizon}')
+        self.stdout.write(self.style.SUCCESS(f'Removed {total} change log entries'))
@@ -0,0 +1,41 @@
+import asyncio
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+
+class Command(BaseCommand):
+    help = 'Run the local event relay that fans live events out to every worker process'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--address',
+            type=str,
+            help='host:port to listen on (default: EVENTS_RELAY setting or 127.0.0.1:8765)',
+            default=getattr(settings, 'EVENTS_RELAY', None) or '127.0.0.1:8765'
+        )
+
+    def handle(self, *args, **options):
+        host, _, port = options['address'].rpartition(':')
+        asyncio.run(self._serve(host or '127.0.0.1', int(port)))
+
+    async def _serve(self, host, port):
+        workers = set()
+
+        async def handle_worker(reader, writer):
+            workers.add(writer)
+            self.stdout.write(f'worker connected ({len(workers)} total)')
+            try:
+                while line := await reader.readline():
+                    for worker in list(workers):
+                        worker.write(line)
+                    await asyncio.gather(*(w.drain() for w in list(workers)), return_exceptions=True)
+            finally:
+                workers.discard(writer)
+                writer.close()
+                self.stdout.write(f'worker disconnected ({len(workers)} total)')
+
+        server = await asyncio.start_server(handle_worker, host, port)
+        self.stdout.write(self.style.SUCCESS(f'Event relay listening on {host}:{port}'))
+        async with server:
+            await server.serve_forever()
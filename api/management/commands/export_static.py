@@ -0,0 +1,36 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from api import export
+
+
+class Command(BaseCommand):
+    help = 'Pre-render finished league, season, team and game pages (and JSON copies) for a static file server'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--output',
+            type=str,
+            help='Directory to export into (default: STATIC_EXPORT_ROOT)',
+            default=getattr(settings, 'STATIC_EXPORT_ROOT', None)
+        )
+        parser.add_argument(
+            '--full',
+            action='store_true',
+            help='Render every page, not only those whose data changed since the last export'
+        )
+
+    def handle(self, *args, **options):
+        if not options['output']:
+            raise CommandError('Pass --output or set STATIC_EXPORT_ROOT.')
+        exporter = export.Exporter(options['output'], full=options['full'])
+        try:
+            rendered = exporter.run()
+        except export.ExportError as exc:
+            raise CommandError(str(exc))
+        for key in rendered:
+            self.stdout.write(f'rendered {key}')
+        self.stdout.write(self.style.SUCCESS(
+            f'{exporter.written} files written, {exporter.unchanged} unchanged, {exporter.removed} removed '
+            f"({len(exporter.files)} in {options['output']})"
+        ))
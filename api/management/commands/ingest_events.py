@@ -0,0 +1,195 @@
+import queue
+import signal
+import socketserver
+import sys
+import threading
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from api import ingest, metrics
+
+_EOF = object()
+
+
+class Command(BaseCommand):
+    help = 'Apply live match events (JSON lines) from a file or a local socket in batched transactions'
+
+    def add_arguments(self, parser):
+        source = parser.add_mutually_exclusive_group(required=True)
+        source.add_argument(
+            '--file',
+            type=str,
+            help="JSON-lines file to read events from ('-' for stdin)"
+        )
+        source.add_argument(
+            '--listen',
+            type=str,
+            help='host:port to accept JSON-lines connections on'
+        )
+        parser.add_argument(
+            '--follow',
+            action='store_true',
+            help='Keep reading the file as it grows instead of stopping at its end'
+        )
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            help='Maximum number of events per transaction',
+            default=200
+        )
+        parser.add_argument(
+            '--flush-interval',
+            type=float,
+            help='Seconds to wait for a batch to fill before applying it',
+            default=0.5
+        )
+        parser.add_argument(
+            '--buffer',
+            type=int,
+            help='Events read ahead of the writer before readers block',
+            default=10000
+        )
+        parser.add_argument(
+            '--stats-interval',
+            type=float,
+            help='Seconds between metrics reports (0 to report only at exit)',
+            default=10.0
+        )
+
+    def handle(self, *args, **options):
+        if options['batch_size'] < 1 or options['flush_interval'] <= 0:
+            raise CommandError('--batch-size and --flush-interval must be positive')
+        self.metrics = ingest.Metrics()
+        lines = queue.Queue(maxsize=max(1, options['buffer']))
+
+        if options['listen']:
+            server = self._serve(options['listen'], lines)
+            self.stdout.write(self.style.SUCCESS(f"Listening for events on {options['listen']}"))
+        else:
+            server = None
+            threading.Thread(
+                target=self._read_file, args=(options['file'], options['follow'], lines), daemon=True
+            ).start()
+
+        signal.signal(signal.SIGTERM, self._stop)
+        metrics.start_flusher()
+        try:
+            self._consume(lines, options['batch_size'], options['flush_interval'], options['stats_interval'])
+        except KeyboardInterrupt:
+            self._drain(lines)
+        finally:
+            if server is not None:
+                server.shutdown()
+            self._report(final=True)
+
+    def _stop(self, signum, frame):
+        raise KeyboardInterrupt
+
+    def _read_file(self, path, follow, lines):
+        stream = sys.stdin if path == '-' else open(path, encoding='utf-8')
+        partial = ''
+        try:
+            while True:
+                line = stream.readline()
+                if not line:
+                    if not follow:
+                        break
+                    time.sleep(0.1)
+                    continue
+                # When following, wait for the writer to finish the line
+                partial += line
+                if partial.endswith('\n') or not follow:
+                    lines.put((partial, time.monotonic()))
+                    partial = ''
+        finally:
+            if stream is not sys.stdin:
+                stream.close()
+            lines.put(_EOF)
+
+    def _serve(self, address, lines):
+        host, _, port = address.rpartition(':')
+
+        class Handler(socketserver.StreamRequestHandler):
+            def handle(self):
+                for line in self.rfile:
+                    lines.put((line.decode('utf-8', 'replace'), time.monotonic()))
+
+        server = socketserver.ThreadingTCPServer((host or '127.0.0.1', int(port)), Handler)
+        server.daemon_threads = True
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        return server
+
+    def _consume(self, lines, batch_size, flush_interval, stats_interval):
+        self.pending = []
+        deadline = None
+        next_report = time.monotonic() + stats_interval if stats_interval > 0 else None
+        while True:
+            timeout = max(0.0, deadline - time.monotonic()) if deadline else flush_interval
+            try:
+                item = lines.get(timeout=timeout)
+            except queue.Empty:
+                item = None
+            metrics.QUEUE_DEPTH.set(lines.qsize() + len(self.pending), queue='ingest')
+            if item is _EOF:
+                self._apply(self.pending)
+                return
+            if item is not None:
+                self.pending.append(item)
+                deadline = deadline or time.monotonic() + flush_interval
+            if self.pending and (len(self.pending) >= batch_size or time.monotonic() >= deadline):
+                self._apply(self.pending)
+                self.pending, deadline = [], None
+            if next_report is not None and time.monotonic() >= next_report:
+                self._report()
+                next_report = time.monotonic() + stats_interval
+
+    def _drain(self, lines):
+        """Apply what was already read (including an interrupted batch) before stopping."""
+        pending = getattr(self, 'pending', [])
+        while True:
+            try:
+                item = lines.get_nowait()
+            except queue.Empty:
+                break
+            if item is not _EOF:
+                pending.append(item)
+        self._apply(pending)
+
+    def _apply(self, pending):
+        events, received_at = [], []
+        for line, read_at in pending:
+            if not line.strip():
+                continue
+            self.metrics.received += 1
+            try:
+                events.append(ingest.parse(line))
+            except ingest.EventError as exc:
+                self.metrics.rejected += 1
+                self.stderr.write(f'skipped malformed event: {exc}')
+                continue
+            received_at.append(read_at)
+        if not events:
+            return
+
+        result = ingest.apply_batch(events)
+        ingest.rebuild_standings(result.seasons)
+        self.metrics.observe(result, received_at, [ingest.feed_time(event) for event in events])
+        for event_id, reason in result.rejected:
+            self.stderr.write(f'rejected event {event_id}: {reason}')
+
+    def _report(self, final=False):
+        stats = self.metrics.snapshot()
+        rate = stats['events_per_second'] if final else stats['recent_events_per_second']
+        line = (
+            f"{stats['applied']} applied, {stats['duplicates']} duplicate, {stats['rejected']} rejected "
+            f"in {stats['batches']} batches over {stats['elapsed']:.1f}s ({rate:.1f} events/s)"
+        )
+        for name in ('ingest_lag', 'feed_lag'):
+            if stats[name]:
+                lag = stats[name]
+                line += (
+                    f"; {name.replace('_', ' ')} p50 {lag['p50'] * 1000:.0f}ms"
+                    f" p95 {lag['p95'] * 1000:.0f}ms max {lag['max'] * 1000:.0f}ms"
+                )
+        self.stdout.write(self.style.SUCCESS(line) if final else line)
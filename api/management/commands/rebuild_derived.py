@@ -0,0 +1,168 @@
+import json
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections
+
+from api import derived, sharding
+from api.models import Season
+from api.versioning import bump_season
+
+# Mismatches listed per season and step (all of them with --verbosity 2)
+SHOWN_MISMATCHES = 5
+
+
+def _init_process():
+    import django
+    django.setup()
+
+
+def _rebuild(season_id, steps, dry_run):
+    try:
+        alias = sharding.locate(Season, season_id)
+        season = sharding.on(Season.objects.select_related('league'), alias).get(pk=season_id)
+        return derived.rebuild_season(season, steps, dry_run)
+    finally:
+        connections.close_all()
+
+
+class Command(BaseCommand):
+    help = (
+        'Rebuild derived data (goal teams, cached goal counts, standings) of all or selected seasons '
+        'on a process pool, or with --dry-run report what differs'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--season',
+            type=int,
+            action='append',
+            help='Season id to rebuild (repeatable; default all)'
+        )
+        parser.add_argument(
+            '--league',
+            type=int,
+            action='append',
+            help='Only seasons of this league id (repeatable)'
+        )
+        parser.add_argument(
+            '--steps',
+            type=str,
+            help=f'Comma-separated steps to run (default: {",".join(derived.STEPS)})',
+            default=','.join(derived.STEPS)
+        )
+        parser.add_argument(
+            '--workers',
+            type=int,
+            help='Worker processes',
+            default=min(4, os.cpu_count() or 1)
+        )
+        parser.add_argument(
+            '--dry-run',
+            action='store_true',
+            help='Report mismatches between stored and recomputed data without writing'
+        )
+        parser.add_argument(
+            '--resume',
+            action='store_true',
+            help='Skip the seasons an interrupted run already finished'
+        )
+        parser.add_argument(
+            '--checkpoint',
+            type=str,
+            help='File recording the finished seasons of a run',
+            default=os.path.join(settings.BASE_DIR, 'rebuild_derived.checkpoint.json')
+        )
+
+    def _load_checkpoint(self, path, steps):
+        try:
+            with open(path, encoding='utf-8') as file:
+                checkpoint = json.load(file)
+        except FileNotFoundError:
+            self.stdout.write('No checkpoint found; starting from the first season.')
+            return set()
+        if checkpoint['steps'] != list(steps):
+            raise CommandError(f'The checkpoint was written for steps {",".join(checkpoint["steps"])}.')
+        return set(checkpoint['done'])
+
+    def _save_checkpoint(self, path, steps, done):
+        temporary = f'{path}.tmp'
+        with open(temporary, 'w', encoding='utf-8') as file:
+            json.dump({'steps': list(steps), 'done': sorted(done)}, file)
+        os.replace(temporary, path)
+
+    def handle(self, *args, **options):
+        steps = [step.strip() for step in options['steps'].split(',') if step.strip()]
+        unknown = set(steps) - set(derived.STEPS)
+        if unknown or not steps:
+            raise CommandError(f'Unknown steps: {", ".join(sorted(unknown))} (choose from {", ".join(derived.STEPS)}).')
+        # Later steps read what earlier ones fix
+        steps = [step for step in derived.STEPS if step in steps]
+        dry_run, path = options['dry_run'], options['checkpoint']
+
+        seasons = derived.seasons(options['season'], options['league'])
+        if options['season']:
+            missing = set(options['season']) - {season.pk for season in seasons}
+            if missing:
+                raise CommandError(f'Unknown seasons: {", ".join(map(str, sorted(missing)))}.')
+        done = self._load_checkpoint(path, steps) if options['resume'] and not dry_run else set()
+        pending = [season for season in seasons if season.pk not in done]
+        names = {season.pk: f'{season.league.name} {season.name}' for season in seasons}
+        aliases = {season.pk: season._state.db for season in seasons}
+        self.stdout.write(
+            f'{"Checking" if dry_run else "Rebuilding"} {", ".join(steps)} for {len(pending)} seasons'
+            + (f' ({len(seasons) - len(pending)} already done)' if len(pending) < len(seasons) else '')
+            + f' with {max(1, options["workers"])} worker processes'
+        )
+
+        totals = dict.fromkeys(steps, 0)
+        started = time.perf_counter()
+        # Children must not share the parent's database connections
+        connections.close_all()
+        executor = ProcessPoolExecutor(max(1, options['workers']), initializer=_init_process)
+        try:
+            futures = {executor.submit(_rebuild, season.pk, steps, dry_run): season.pk for season in pending}
+            for count, future in enumerate(as_completed(futures), 1):
+                season_id = futures[future]
+                report = future.result()
+                if not dry_run:
+                    done.add(season_id)
+                    self._save_checkpoint(path, steps, done)
+                    if any(report.values()):
+                        # Cached stats and predictions of the season are keyed by its data version
+                        bump_season(season_id, using=aliases[season_id])
+                for step, mismatches in report.items():
+                    totals[step] += len(mismatches)
+                summary = ', '.join(f'{step} {len(report[step])}' for step in steps)
+                elapsed = time.perf_counter() - started
+                self.stdout.write(
+                    f'[{count}/{len(pending)}] season {season_id} ({names[season_id]}): {summary}  '
+                    f'{elapsed:.1f}s, about {elapsed / count * (len(pending) - count):.0f}s left'
+                )
+                for step in steps:
+                    shown = report[step] if options['verbosity'] > 1 else report[step][:SHOWN_MISMATCHES]
+                    for mismatch in shown:
+                        self.stdout.write(f'    {step}: {mismatch}')
+                    if len(shown) < len(report[step]):
+                        self.stdout.write(f'    {step}: ... {len(report[step]) - len(shown)} more')
+        except KeyboardInterrupt:
+            executor.shutdown(wait=True, cancel_futures=True)
+            if dry_run:
+                raise CommandError('Interrupted.')
+            raise CommandError(f'Interrupted after {len(done)} seasons; run again with --resume to continue.')
+        except Exception:
+            executor.shutdown(wait=True, cancel_futures=True)
+            raise
+        executor.shutdown()
+
+        summary = ', '.join(f'{step} {totals[step]}' for step in steps)
+        if dry_run:
+            style = self.style.WARNING if any(totals.values()) else self.style.SUCCESS
+            self.stdout.write(style(f'Mismatches (nothing written): {summary}'))
+            return
+        if os.path.exists(path):
+            os.remove(path)
+        self.stdout.write(self.style.SUCCESS(f'Rebuilt {len(pending)} seasons; rows changed: {summary}'))
@@ -0,0 +1,54 @@
+from django.core.management.base import BaseCommand
+from django.db.models import F
+
+from api.derived import stale_goal_counts
+from api.models import Game, Goal
+
+
+class Command(BaseCommand):
+    help = 'Check cached per-game goal counts against the goal rows and the recorded scores'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--fix',
+            action='store_true',
+            help='Recount games whose cached goal counts are out of date'
+        )
+        parser.add_argument(
+            '--season',
+            type=int,
+            help='Only check games of this season id'
+        )
+
+    def handle(self, *args, **options):
+        games = Game.objects.all()
+        if options['season']:
+            games = games.filter(season_id=options['season'])
+
+        stale = list(stale_goal_counts(games).values_list('pk', flat=True))
+        if stale and options['fix']:
+            Game.update_goal_counts(stale)
+            self.stdout.write(self.style.SUCCESS(f'Recounted {len(stale)} games with stale goal counts.'))
+        elif stale:
+            self.stdout.write(self.style.WARNING(f'{len(stale)} games have stale goal counts (run with --fix).'))
+
+        unassigned = Goal.objects.filter(game__in=games, team__isnull=True).count()
+        if unassigned:
+            self.stdout.write(self.style.WARNING(
+                f'{unassigned} goals could not be credited to either team (scorer not in a squad or under contract).'
+            ))
+
+        mismatched = games.filter(home_score__isnull=False, away_score__isnull=False).exclude(
+            home_goal_count=F('home_score'), away_goal_count=F('away_score')
+        ).select_related('home_team', 'away_team')
+        count = 0
+        for game in mismatched.order_by('played_at').iterator():
+            count += 1
+            self.stdout.write(
+                f'  game {game.pk}: {game.home_team.name} {game.home_score}-{game.away_score} {game.away_team.name}, '
+                f'goals recorded {game.home_goal_count}-{game.away_goal_count}'
+            )
+        if count:
+            self.stdout.write(self.style.WARNING(f'{count} played games have goals that do not add up to the score.'))
+        elif not stale and not unassigned:
+            self.stdout.write(self.style.SUCCESS('Goal counts and scores are consistent.'))
@@ -0,0 +1,35 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from api import replica
+
+
+class Command(BaseCommand):
+    help = 'Copy the primary database into the read replica (once, or every --interval seconds)'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--interval',
+            type=float,
+            help='Seconds between refreshes; refresh once when omitted',
+            default=None
+        )
+
+    def handle(self, *args, **options):
+        if not replica.enabled():
+            raise CommandError("DATABASES has no 'replica' alias")
+        interval = options['interval']
+        if interval is not None and interval <= 0:
+            raise CommandError('--interval must be positive')
+        try:
+            while True:
+                previous = replica.lag()
+                took = replica.refresh()
+                lag = 'never refreshed' if previous is None else f'{previous:.1f}s behind'
+                self.stdout.write(f'replica refreshed in {took:.2f}s (was {lag})')
+                if interval is None:
+                    break
+                time.sleep(interval)
+        except KeyboardInterrupt:
+            pass
@@ -0,0 +1,51 @@
+import signal
+
+from django.core.management.base import BaseCommand
+
+from api import jobs, metrics
+
+
+class Command(BaseCommand):
+    help = 'Run queued background jobs (see api.jobs) on a thread or process pool'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--workers',
+            type=int,
+            help='Jobs run at the same time',
+            default=4
+        )
+        parser.add_argument(
+            '--processes',
+            action='store_true',
+            help='Run jobs in worker processes instead of threads (for CPU-bound tasks)'
+        )
+        parser.add_argument(
+            '--poll',
+            type=float,
+            help='Seconds between checks for new jobs when idle',
+            default=1.0
+        )
+        parser.add_argument(
+            '--once',
+            action='store_true',
+            help='Exit once no job is due instead of waiting for more'
+        )
+
+    def handle(self, *args, **options):
+        runner = jobs.Runner(
+            workers=options['workers'], processes=options['processes'], poll=options['poll'],
+            log=self.stdout.write,
+        )
+        # Finish the jobs in progress, claim no more
+        signal.signal(signal.SIGTERM, lambda signum, frame: runner.stop.set())
+        mode = 'processes' if options['processes'] else 'threads'
+        self.stdout.write(f'Worker {runner.name}: {runner.workers} {mode}')
+        metrics.start_flusher()
+        try:
+            runner.run(once=options['once'])
+        except KeyboardInterrupt:
+            runner.stop.set()
+        finally:
+            metrics.flush()
+        self.stdout.write('Stopped')
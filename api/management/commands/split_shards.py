@@ -0,0 +1,49 @@
+from django.core.management import call_command
+from django.core.management.base import BaseCommand, CommandError
+
+from api import sharding
+from api.versioning import bump_data_version
+
+
+class Command(BaseCommand):
+    help = 'Move the leagues listed in LEAGUE_SHARDS from the default database into their shard databases'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--league',
+            type=int,
+            action='append',
+            help='League id(s) to move (default: every league in LEAGUE_SHARDS)'
+        )
+
+    def handle(self, *args, **options):
+        shard_map = sharding.shard_map()
+        if not shard_map:
+            raise CommandError('LEAGUE_SHARDS is empty')
+        leagues = options['league'] or sorted(shard_map)
+        unknown = [league_id for league_id in leagues if league_id not in shard_map]
+        if unknown:
+            raise CommandError(f"League(s) not in LEAGUE_SHARDS: {', '.join(map(str, unknown))}")
+
+        targets = sorted({shard_map[league_id] for league_id in leagues} - {sharding.DEFAULT})
+        for alias in targets:
+            with sharding.use_db(alias):
+                # The data migrations' queries follow the router
+                call_command('migrate', database=alias, verbosity=0)
+            copied = sharding.copy_players(alias)
+            self.stdout.write(f'{alias}: schema ready, {copied} players copied')
+
+        for league_id in leagues:
+            alias = shard_map[league_id]
+            if alias == sharding.DEFAULT:
+                continue
+            moved = sharding.move_league(league_id, alias)
+            summary = ', '.join(f'{rows} {name}' for name, rows in moved.items() if rows) or 'already moved'
+            self.stdout.write(f'league {league_id} -> {alias}: {summary}')
+
+        for alias in targets:
+            sharding.reserve_ids(alias)
+        bump_data_version()
+        self.stdout.write(self.style.SUCCESS(
+            f'Moved {len(leagues)} league(s); restart the web workers so they drop cached row locations'
+        ))
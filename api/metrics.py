@@ -0,0 +1,344 @@
+"""In-process Prometheus metrics, served as text by ``GET /metrics``.
+
+Counters, gauges and histograms are plain dicts behind a lock, updated by
+``metrics_middleware`` (request latency and query counts), the standings
+rebuild, the prediction views, the versioned caches and the background
+queues. Gauges can also be computed at collection time from a callback.
+
+With several worker processes, point ``METRICS_DIR`` at a directory they
+share: every process writes its samples to ``<pid>.json`` there every
+``FLUSH_INTERVAL`` seconds and at exit, and a scrape served by any process
+adds up the files of all of them. Counters and histograms of processes that
+have exited keep counting; their gauges are dropped once the file is older
+than ``STALE_AFTER``. Empty the directory when deploying.
+"""
+import atexit
+import bisect
+import functools
+import glob
+import json
+import math
+import os
+import tempfile
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from asgiref.sync import iscoroutinefunction
+from django.conf import settings
+from django.core.cache import cache
+from django.db.backends.signals import connection_created
+from django.dispatch import receiver
+from django.utils.decorators import sync_and_async_middleware
+
+CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+QUERY_BUCKETS = (0, 1, 2, 5, 10, 20, 50, 100, 200, 500)
+FLUSH_INTERVAL = 5
+STALE_AFTER = 60
+
+REGISTRY = {}
+
+
+class Metric:
+    kind = None
+
+    def __init__(self, name, documentation, labels=()):
+        self.name = name
+        self.documentation = documentation
+        self.labels = tuple(labels)
+        self._values = {}
+        self._lock = threading.Lock()
+        REGISTRY[name] = self
+
+    def _key(self, labels):
+        return tuple(str(labels[label]) for label in self.labels)
+
+    def samples(self):
+        """``[(label values, value)]`` for a snapshot."""
+        with self._lock:
+            return [(list(key), value) for key, value in self._values.items()]
+
+    def describe(self):
+        return {'kind': self.kind, 'help': self.documentation, 'labels': list(self.labels), 'samples': self.samples()}
+
+
+class Counter(Metric):
+    kind = 'counter'
+
+    def inc(self, amount=1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+
+class Gauge(Metric):
+    kind = 'gauge'
+
+    def __init__(self, name, documentation, labels=(), collect=None):
+        super().__init__(name, documentation, labels)
+        # ``collect()`` returns ``{label values tuple: value}`` at collection time
+        self.collect = collect
+
+    def set(self, value, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = value
+
+    def samples(self):
+        samples = super().samples()
+        if self.collect is not None:
+            samples.extend((list(key), value) for key, value in self.collect().items())
+        return samples
+
+
+class Histogram(Metric):
+    kind = 'histogram'
+
+    def __init__(self, name, documentation, labels=(), buckets=LATENCY_BUCKETS):
+        super().__init__(name, documentation, labels)
+        self.buckets = tuple(buckets)
+
+    def observe(self, value, **labels):
+        key = self._key(labels)
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            # Per-bucket counts (the last one is +Inf), then sum and count
+            counts = self._values.get(key)
+            if counts is None:
+                counts = self._values[key] = [0] * (len(self.buckets) + 1) + [0.0, 0]
+            counts[index] += 1
+            counts[-2] += value
+            counts[-1] += 1
+
+    def samples(self):
+        with self._lock:
+            return [(list(key), list(counts)) for key, counts in self._values.items()]
+
+    def describe(self):
+        return {**super().describe(), 'buckets': list(self.buckets)}
+
+    @contextmanager
+    def time(self, **labels):
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - started, **labels)
+
+    def timed(self, **labels):
+        """Decorator observing the duration of each call."""
+        def decorator(func):
+            @functools.wraps(func)
+            def wrapper(*args, **kwargs):
+                with self.time(**labels):
+                    return func(*args, **kwargs)
+            return wrapper
+        return decorator
+
+
+def _sse_queues():
+    from .events import broker
+    return {('sse',): broker.queued_events()}
+
+
+def _sse_subscribers():
+    from .events import broker
+    return {(): broker.subscriber_count()}
+
+
+REQUEST_LATENCY = Histogram(
+    'http_request_duration_seconds', 'Time to produce a response, per view', ('view', 'method'),
+)
+REQUESTS = Counter('http_requests_total', 'Responses per view and status code', ('view', 'method', 'status'))
+REQUEST_QUERIES = Histogram(
+    'db_queries_per_request', 'Database queries run while handling a request', ('view',), QUERY_BUCKETS,
+)
+STANDINGS_RECOMPUTE = Histogram('standings_recompute_seconds', 'Duration of LeagueStanding.update_standings()')
+STANDINGS_REQUESTS = Counter(
+    'standings_requests_total', 'Standings updates, recomputed or covered by a newer recompute', ('result',),
+)
+PREDICTION_LATENCY = Histogram('prediction_duration_seconds', 'Time to compute a prediction', ('kind',))
+CACHE_REQUESTS = Counter('cache_requests_total', 'Derived-data cache lookups', ('cache', 'result'))
+QUEUE_DEPTH = Gauge('background_queue_depth', 'Items waiting in background queues', ('queue',), collect=_sse_queues)
+SSE_SUBSCRIBERS = Gauge('sse_subscribers', 'Open live event streams', collect=_sse_subscribers)
+
+_MISSING = object()
+
+
+def cached(name, key, build, timeout):
+    """``cache.get_or_set()`` counting hits and misses as cache ``name``."""
+    value = cache.get(key, _MISSING)
+    if value is not _MISSING:
+        CACHE_REQUESTS.inc(cache=name, result='hit')
+        return value
+    CACHE_REQUESTS.inc(cache=name, result='miss')
+    value = build()
+    cache.set(key, value, timeout)
+    return value
+
+
+# Queries of the current request; a list so sync_to_async threads update the same count.
+_query_count = ContextVar('metrics_query_count', default=None)
+
+
+def _count_query(execute, sql, params, many, context):
+    count = _query_count.get()
+    if count is not None:
+        count[0] += 1
+    return execute(sql, params, many, context)
+
+
+@receiver(connection_created)
+def count_queries(sender, connection, **kwargs):
+    if _count_query not in connection.execute_wrappers:
+        # First, so connection.execute_wrapper() blocks still pop their own wrapper
+        connection.execute_wrappers.insert(0, _count_query)
+
+
+def _view_name(request):
+    match = getattr(request, 'resolver_match', None)
+    return match.view_name if match else 'unmatched'
+
+
+@sync_and_async_middleware
+def metrics_middleware(get_response):
+    """Record latency, status and query count of every request."""
+
+    def begin():
+        start_flusher()
+        return time.perf_counter(), _query_count.set([0])
+
+    def finish(request, response, started, token):
+        view, method = _view_name(request), request.method
+        REQUEST_LATENCY.observe(time.perf_counter() - started, view=view, method=method)
+        REQUESTS.inc(view=view, method=method, status=response.status_code)
+        REQUEST_QUERIES.observe(_query_count.get()[0], view=view)
+        _query_count.reset(token)
+
+    if iscoroutinefunction(get_response):
+        async def middleware(request):
+            started, token = begin()
+            response = await get_response(request)
+            finish(request, response, started, token)
+            return response
+    else:
+        def middleware(request):
+            started, token = begin()
+            response = get_response(request)
+            finish(request, response, started, token)
+            return response
+    return middleware
+
+
+def snapshot():
+    return {name: metric.describe() for name, metric in REGISTRY.items()}
+
+
+def _directory():
+    return getattr(settings, 'METRICS_DIR', None)
+
+
+def flush():
+    """Write this process' samples to ``METRICS_DIR`` (atomically)."""
+    directory = _directory()
+    if not directory:
+        return
+    os.makedirs(directory, exist_ok=True)
+    handle, path = tempfile.mkstemp(dir=directory, suffix='.tmp')
+    with os.fdopen(handle, 'w') as f:
+        json.dump(snapshot(), f)
+    os.replace(path, os.path.join(directory, f'{os.getpid()}.json'))
+
+
+_flusher = None
+_flusher_lock = threading.Lock()
+
+
+def start_flusher():
+    """Flush every ``FLUSH_INTERVAL`` seconds from a daemon thread (once per process)."""
+    global _flusher
+    if _flusher is not None or not _directory():
+        return
+    with _flusher_lock:
+        if _flusher is None:
+            def run():
+                while True:
+                    time.sleep(FLUSH_INTERVAL)
+                    flush()
+            _flusher = threading.Thread(target=run, name='metrics-flush', daemon=True)
+            _flusher.start()
+            atexit.register(flush)
+
+
+def _merge(total, name, metric, gauges):
+    if metric['kind'] == 'gauge' and not gauges:
+        return
+    target = total.setdefault(name, {**metric, 'samples': []})
+    merged = {tuple(labels): value for labels, value in target['samples']}
+    for labels, value in metric['samples']:
+        key = tuple(labels)
+        if key not in merged:
+            merged[key] = value
+        elif metric['kind'] == 'histogram':
+            merged[key] = [a + b for a, b in zip(merged[key], value)]
+        else:
+            merged[key] += value
+    target['samples'] = [[list(key), value] for key, value in merged.items()]
+
+
+def collect():
+    """Samples of this process, or of every process writing to ``METRICS_DIR``."""
+    directory = _directory()
+    if not directory:
+        return snapshot()
+    flush()
+    total = {}
+    now = time.time()
+    for path in glob.glob(os.path.join(directory, '*.json')):
+        try:
+            with open(path) as f:
+                metrics = json.load(f)
+            fresh = now - os.path.getmtime(path) < STALE_AFTER
+        except (OSError, ValueError):
+            continue  # removed or being replaced
+        for name, metric in metrics.items():
+            _merge(total, name, metric, gauges=fresh)
+    return total
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _labels(names, values, extra=()):
+    pairs = [f'{name}="{_escape(value)}"' for name, value in [*zip(names, values), *extra]]
+    return '{' + ','.join(pairs) + '}' if pairs else ''
+
+
+def _number(value):
+    if isinstance(value, float) and math.isinf(value):
+        return '+Inf' if value > 0 else '-Inf'
+    return repr(value) if isinstance(value, float) else str(value)
+
+
+def render(metrics):
+    """Prometheus text exposition format (version 0.0.4)."""
+    lines = []
+    for name in sorted(metrics):
+        metric = metrics[name]
+        lines.append(f"# HELP {name} {metric['help']}")
+        lines.append(f"# TYPE {name} {metric['kind']}")
+        names = metric['labels']
+        for values, value in sorted(metric['samples'], key=lambda sample: sample[0]):
+            if metric['kind'] != 'histogram':
+                lines.append(f'{name}{_labels(names, values)} {_number(value)}')
+                continue
+            cumulative = 0
+            for bound, count in zip([*metric['buckets'], math.inf], value):
+                cumulative += count
+                lines.append(f"{name}_bucket{_labels(names, values, [('le', _number(float(bound)))])} {cumulative}")
+            lines.append(f'{name}_sum{_labels(names, values)} {_number(value[-2])}')
+            lines.append(f'{name}_count{_labels(names, values)} {value[-1]}')
+    return '\n'.join(lines) + '\n'
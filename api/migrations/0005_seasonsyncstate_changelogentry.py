@@ -0,0 +1,41 @@
+# Generated by Django 5.2.18 on 2026-10-19 07:34
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0004_team_players'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SeasonSyncState',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('version', models.BigIntegerField(default=0)),
+                ('min_version', models.BigIntegerField(default=0, help_text='Clients that last synced before this version need a full snapshot')),
+                ('season', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='sync_state', to='api.season')),
+            ],
+        ),
+        migrations.CreateModel(
+            name='ChangeLogEntry',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('version', models.BigIntegerField()),
+                ('model', models.CharField(max_length=20)),
+                ('object_id', models.BigIntegerField()),
+                ('operation', models.CharField(choices=[('insert', 'Insert'), ('update', 'Update'), ('delete', 'Delete')], max_length=6)),
+                ('data', models.JSONField(blank=True, null=True)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('season', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='changes', to='api.season')),
+            ],
+            options={
+                'ordering': ['season', 'version'],
+                'indexes': [models.Index(fields=['season', 'model', 'object_id'], name='changelog_object_idx')],
+                'unique_together': {('season', 'version')},
+            },
+        ),
+    ]
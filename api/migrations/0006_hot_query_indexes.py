@@ -0,0 +1,41 @@
+# Generated by Django 5.2.18 on 2026-10-19 07:37
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0005_seasonsyncstate_changelogentry'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='game',
+            index=models.Index(fields=['season', 'played_at'], name='game_season_played_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='game',
+            index=models.Index(fields=['season', 'home_score'], name='game_season_score_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='game',
+            index=models.Index(fields=['home_team', 'season'], name='game_home_season_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='game',
+            index=models.Index(fields=['away_team', 'season'], name='game_away_season_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='goal',
+            index=models.Index(fields=['scorer', 'game'], name='goal_scorer_game_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='goal',
+            index=models.Index(fields=['assistant', 'game'], name='goal_assistant_game_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='playercontract',
+            index=models.Index(fields=['team', 'start_date', 'end_date'], name='contract_team_dates_idx'),
+        ),
+    ]
@@ -0,0 +1,63 @@
+from django.db import migrations
+
+# Source table, kind code, kind, indexed name and detail expressions ({t} is
+# the row alias). Each search row's rowid is ``id * 4 + kind code`` (see api.search).
+SOURCES = [
+    ('api_player', 1, 'player', '{t}.name', '{t}.nationality'),
+    ('api_team', 2, 'team', '{t}.name', "coalesce({t}.short_name, '')"),
+    ('api_league', 3, 'league', '{t}.name', '{t}.country'),
+]
+
+CREATE_TABLE = """
+CREATE VIRTUAL TABLE api_search USING fts5(
+    name, detail, kind UNINDEXED,
+    tokenize = 'unicode61 remove_diacritics 2',
+    prefix = '2 3'
+)
+"""
+
+
+def _row(t, code, kind, name, detail):
+    return f"{t}.id * 4 + {code}, {name.format(t=t)}, {detail.format(t=t)}, '{kind}'"
+
+
+def _statements(table, code, kind, name, detail):
+    new_row = _row('new', code, kind, name, detail)
+    insert = f'INSERT INTO api_search (rowid, name, detail, kind) VALUES ({new_row});'
+    delete = f'DELETE FROM api_search WHERE rowid = old.id * 4 + {code};'
+    return [
+        f'CREATE TRIGGER {table}_search_insert AFTER INSERT ON {table} BEGIN {insert} END',
+        f'CREATE TRIGGER {table}_search_update AFTER UPDATE ON {table} BEGIN {delete} {insert} END',
+        f'CREATE TRIGGER {table}_search_delete AFTER DELETE ON {table} BEGIN {delete} END',
+        f"INSERT INTO api_search (rowid, name, detail, kind) "
+        f"SELECT {_row(table, code, kind, name, detail)} FROM {table}",
+    ]
+
+
+def create_search_index(apps, schema_editor):
+    if schema_editor.connection.vendor != 'sqlite':
+        return
+    schema_editor.execute(CREATE_TABLE)
+    for source in SOURCES:
+        for statement in _statements(*source):
+            schema_editor.execute(statement)
+
+
+def drop_search_index(apps, schema_editor):
+    if schema_editor.connection.vendor != 'sqlite':
+        return
+    for table, *_ in SOURCES:
+        for event in ('insert', 'update', 'delete'):
+            schema_editor.execute(f'DROP TRIGGER IF EXISTS {table}_search_{event}')
+    schema_editor.execute('DROP TABLE IF EXISTS api_search')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0006_hot_query_indexes'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_search_index, drop_search_index),
+    ]
@@ -0,0 +1,70 @@
+# Generated by Django 5.2.18 on 2026-10-19 07:45
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+BATCH_SIZE = 2000
+
+
+def copy_squads(apps, schema_editor):
+    """Turn the home/away squad M2M rows into appearances (legacy squads: started, 90 minutes)."""
+    Game = apps.get_model('api', 'Game')
+    Appearance = apps.get_model('api', 'Appearance')
+    for side in ('home', 'away'):
+        through = Game._meta.get_field(f'{side}_team_players').remote_field.through
+        rows = through.objects.order_by('id').values_list('game_id', 'player_id', f'game__{side}_team_id')
+        batch = []
+        for game_id, player_id, team_id in rows.iterator(chunk_size=BATCH_SIZE):
+            batch.append(Appearance(game_id=game_id, player_id=player_id, team_id=team_id, side=side))
+            if len(batch) >= BATCH_SIZE:
+                # A player listed on both sides keeps the home appearance
+                Appearance.objects.bulk_create(batch, ignore_conflicts=True)
+                batch = []
+        Appearance.objects.bulk_create(batch, ignore_conflicts=True)
+
+
+def restore_squads(apps, schema_editor):
+    Game = apps.get_model('api', 'Game')
+    Appearance = apps.get_model('api', 'Appearance')
+    for side in ('home', 'away'):
+        through = Game._meta.get_field(f'{side}_team_players').remote_field.through
+        rows = Appearance.objects.filter(side=side).values_list('game_id', 'player_id')
+        through.objects.bulk_create(
+            [through(game_id=game_id, player_id=player_id) for game_id, player_id in rows.iterator()],
+            batch_size=BATCH_SIZE, ignore_conflicts=True,
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0007_search_index'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Appearance',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('side', models.CharField(choices=[('home', 'Home'), ('away', 'Away')], max_length=4)),
+                ('started', models.BooleanField(default=True)),
+                ('minutes', models.PositiveSmallIntegerField(default=90)),
+                ('game', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='appearances', to='api.game')),
+                ('player', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='appearances', to='api.player')),
+                ('team', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='appearances', to='api.team')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['player', 'game'], name='appearance_player_game_idx'), models.Index(fields=['game', 'team'], name='appearance_game_team_idx')],
+                'unique_together': {('game', 'player')},
+            },
+        ),
+        migrations.RunPython(copy_squads, restore_squads),
+        migrations.RemoveField(
+            model_name='game',
+            name='away_team_players',
+        ),
+        migrations.RemoveField(
+            model_name='game',
+            name='home_team_players',
+        ),
+    ]
@@ -0,0 +1,118 @@
+# Generated by Django 5.2.18 on 2026-10-19 07:47
+
+from collections import defaultdict
+
+import django.db.models.deletion
+from django.db import migrations, models
+from django.db.models import Count, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+
+CHUNK_SIZE = 2000
+
+
+def _credited_team(game, scorer_id, is_own_goal, squads, contracts):
+    """Mirror of Goal.resolve_team_id() over preloaded squads and contracts."""
+    home_id, away_id, played_at = game
+    scorer_team = squads.get(scorer_id)
+    if scorer_team is None:
+        day = timezone.localdate(played_at) if played_at else timezone.localdate()
+        scorer_team = next(
+            (team_id for team_id, start, end in contracts[scorer_id]
+             if start <= day <= end and team_id in (home_id, away_id)),
+            None,
+        )
+    sides = {home_id: away_id, away_id: home_id}
+    if scorer_team not in sides:
+        return None
+    return sides[scorer_team] if is_own_goal else scorer_team
+
+
+def backfill_goal_teams(apps, schema_editor):
+    Game = apps.get_model('api', 'Game')
+    Goal = apps.get_model('api', 'Goal')
+    Appearance = apps.get_model('api', 'Appearance')
+    PlayerContract = apps.get_model('api', 'PlayerContract')
+
+    last_pk = 0
+    while True:
+        goals = list(
+            Goal.objects.filter(pk__gt=last_pk).order_by('pk')
+            .values_list('pk', 'game_id', 'scorer_id', 'is_own_goal')[:CHUNK_SIZE]
+        )
+        if not goals:
+            break
+        last_pk = goals[-1][0]
+        game_ids = {game_id for _, game_id, _, _ in goals}
+        scorer_ids = {scorer_id for _, _, scorer_id, _ in goals}
+
+        games = {
+            pk: (home_id, away_id, played_at)
+            for pk, home_id, away_id, played_at in Game.objects.filter(pk__in=game_ids)
+            .values_list('pk', 'home_team_id', 'away_team_id', 'played_at')
+        }
+        squads = defaultdict(dict)
+        for game_id, player_id, team_id in Appearance.objects.filter(
+            game_id__in=game_ids, player_id__in=scorer_ids
+        ).values_list('game_id', 'player_id', 'team_id'):
+            squads[game_id][player_id] = team_id
+        contracts = defaultdict(list)
+        for player_id, team_id, start, end in PlayerContract.objects.filter(
+            player_id__in=scorer_ids
+        ).values_list('player_id', 'team_id', 'start_date', 'end_date'):
+            contracts[player_id].append((team_id, start, end))
+
+        by_team = defaultdict(list)
+        for pk, game_id, scorer_id, is_own_goal in goals:
+            team_id = _credited_team(games[game_id], scorer_id, is_own_goal, squads[game_id], contracts)
+            if team_id is not None:
+                by_team[team_id].append(pk)
+        for team_id, pks in by_team.items():
+            Goal.objects.filter(pk__in=pks).update(team_id=team_id)
+
+    def side_count(side):
+        goals = (
+            Goal.objects.filter(game=OuterRef('pk'), team=OuterRef(f'{side}_team'))
+            .order_by().values('game').annotate(n=Count('id')).values('n')
+        )
+        return Coalesce(Subquery(goals), 0)
+
+    last_pk = 0
+    while True:
+        chunk = list(Game.objects.filter(pk__gt=last_pk).order_by('pk').values_list('pk', flat=True)[:CHUNK_SIZE])
+        if not chunk:
+            break
+        last_pk = chunk[-1]
+        Game.objects.filter(pk__in=chunk).update(
+            home_goal_count=side_count('home'), away_goal_count=side_count('away')
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0008_appearance'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='game',
+            name='away_goal_count',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='game',
+            name='home_goal_count',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='goal',
+            name='team',
+            field=models.ForeignKey(blank=True, editable=False, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='goals', to='api.team'),
+        ),
+        migrations.AddIndex(
+            model_name='goal',
+            index=models.Index(fields=['team', 'game'], name='goal_team_game_idx'),
+        ),
+        migrations.RunPython(backfill_goal_teams, migrations.RunPython.noop),
+    ]
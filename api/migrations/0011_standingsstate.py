@@ -0,0 +1,23 @@
+# Generated by Django 5.2.18 on 2026-10-19 08:22
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0010_ingestedevent'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='StandingsState',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('requested', models.BigIntegerField(default=0)),
+                ('computed', models.BigIntegerField(default=0)),
+                ('season', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='standings_state', to='api.season')),
+            ],
+        ),
+    ]
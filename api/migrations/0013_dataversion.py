@@ -0,0 +1,30 @@
+# Generated by Django 5.2.18 on 2026-10-19 08:40
+
+import time
+
+from django.db import migrations, models
+
+
+def create_row(apps, schema_editor):
+    # Start from a timestamp rather than 1 so versions never repeat after the
+    # database is recreated while a shared cache still holds older entries.
+    DataVersion = apps.get_model('api', 'DataVersion')
+    DataVersion.objects.using(schema_editor.connection.alias).create(pk=1, version=int(time.time() * 1000))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0012_job'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DataVersion',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('version', models.BigIntegerField(default=0)),
+            ],
+        ),
+        migrations.RunPython(create_row, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,20 @@
+# Generated by Django 5.2.18 on 2026-10-19 10:05
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0016_job_created_by'),
+    ]
+
+    operations = [
+        # The existing single row becomes the epoch, which is part of every version
+        migrations.AddField(
+            model_name='dataversion',
+            name='scope',
+            field=models.CharField(default='epoch', max_length=40, unique=True),
+            preserve_default=False,
+        ),
+    ]
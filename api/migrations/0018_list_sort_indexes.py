@@ -0,0 +1,49 @@
+# Generated by Django 5.2.18 on 2026-10-19 09:03
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0017_dataversion_scope'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='game',
+            index=models.Index(fields=['played_at', 'id'], name='game_played_id_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='league',
+            index=models.Index(fields=['name', 'id'], name='league_name_id_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='league',
+            index=models.Index(fields=['created_at', 'id'], name='league_created_id_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='player',
+            index=models.Index(fields=['name', 'id'], name='player_name_id_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='player',
+            index=models.Index(fields=['birth_date', 'id'], name='player_birth_id_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='season',
+            index=models.Index(fields=['name', 'id'], name='season_name_id_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='season',
+            index=models.Index(fields=['start_date', 'id'], name='season_start_id_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='team',
+            index=models.Index(fields=['name', 'id'], name='team_name_id_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='team',
+            index=models.Index(fields=['founded_year', 'id'], name='team_founded_id_idx'),
+        ),
+    ]
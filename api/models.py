@@ -1,14 +1,31 @@
-from django.db import models
-from django.db.models import Q, Sum, Count, F
+from django.db import models, router
+from django.db.models import Q, Sum, Count, F, OuterRef, Subquery
+from django.db.models.functions import Coalesce
 from django.core.validators import MinValueValidator
+from django.dispatch import Signal
 from django.utils import timezone
 
+from . import sharding
+from .metrics import STANDINGS_RECOMPUTE, STANDINGS_REQUESTS
+from .sqlite import write_transaction
+
+# Sent after LeagueStanding.update_standings() has rewritten a season's table,
+# with the new ``standings`` and the ``previous`` {team_id: position} mapping.
+standings_updated = Signal()
+
 
 class League(models.Model):
     name = models.CharField(max_length=200, unique=True)
     country = models.CharField(max_length=100)
     created_at = models.DateTimeField(auto_now_add=True)
 
+    class Meta:
+        # (sort column, id) indexes serve the keyset-paginated list pages (see ``api.listing``)
+        indexes = [
+            models.Index(fields=['name', 'id'], name='league_name_id_idx'),
+            models.Index(fields=['created_at', 'id'], name='league_created_id_idx'),
+        ]
+
     def __str__(self):
         return f"{self.name} ({self.country})"
 
@@ -24,6 +41,10 @@ class Season(models.Model):
     class Meta:
         ordering = ['-start_date']
         unique_together = ['league', 'name']
+        indexes = [
+            models.Index(fields=['name', 'id'], name='season_name_id_idx'),
+            models.Index(fields=['start_date', 'id'], name='season_start_id_idx'),
+        ]
 
     def __str__(self):
         return f"{self.league.name} - {self.name}"
@@ -51,16 +72,18 @@ class Team(models.Model):
 
     class Meta:
         unique_together = ['league', 'name']
+        indexes = [
+            models.Index(fields=['name', 'id'], name='team_name_id_idx'),
+            models.Index(fields=['founded_year', 'id'], name='team_founded_id_idx'),
+        ]
 
     def __str__(self):
         return f"{self.name} ({self.league.name})"
     
     def get_current_squad(self):
         """Get current squad sorted by position."""
-        return self.players.filter(
-            contracts__start_date__lte=timezone.now(),
-            contracts__end_date__gte=timezone.now()
-        ).order_by('position')
+        from .rosters import squad_at
+        return Player.objects.filter(pk__in=[c.player_id for c in squad_at(self.pk)]).order_by('position')
     
     def get_season_stats(self, season):
         """Get team's statistics for a specific season."""
@@ -125,23 +148,29 @@ class Player(models.Model):
     weight = models.IntegerField(help_text="Weight in kg", null=True, blank=True)
     created_at = models.DateTimeField(auto_now_add=True)
 
+    class Meta:
+        indexes = [
+            models.Index(fields=['name', 'id'], name='player_name_id_idx'),
+            models.Index(fields=['birth_date', 'id'], name='player_birth_id_idx'),
+        ]
+
     def __str__(self):
         return self.name
     
     def get_current_team(self):
         """Get the player's current team."""
-        current_contract = self.contracts.filter(
-            start_date__lte=timezone.now(),
-            end_date__gte=timezone.now()
-        ).first()
-        return current_contract.team if current_contract else None
+        from .rosters import teams_at
+        team_id = teams_at([self.pk]).get(self.pk)
+        return Team.objects.filter(pk=team_id).first() if team_id else None
 
     def get_season_stats(self, season):
         """Get player's statistics for a specific season."""
-        games_played = Game.objects.filter(
-            Q(home_team_players=self) | Q(away_team_players=self),
-            season=season
-        ).count()
+        appearances = Appearance.objects.filter(player=self, game__season=season).aggregate(
+            games_played=Count('id'),
+            starts=Count('id', filter=Q(started=True)),
+            minutes=Sum('minutes'),
+        )
+        minutes = appearances['minutes'] or 0
 
         goals = Goal.objects.filter(
             scorer=self,
@@ -154,9 +183,13 @@ class Player(models.Model):
         ).count()
 
         return {
-            'games_played': games_played,
+            'games_played': appearances['games_played'],
+            'starts': appearances['starts'],
+            'minutes': minutes,
             'goals': goals,
             'assists': assists,
+            'goals_per_90': round(goals * 90 / minutes, 2) if minutes else None,
+            'assists_per_90': round(assists * 90 / minutes, 2) if minutes else None,
         }
 
 
@@ -171,6 +204,9 @@ class PlayerContract(models.Model):
 
     class Meta:
         ordering = ['-start_date']
+        indexes = [
+            models.Index(fields=['team', 'start_date', 'end_date'], name='contract_team_dates_idx'),
+        ]
 
     def __str__(self):
         return f"{self.player.name} at {self.team.name} ({self.start_date} to {self.end_date})"
@@ -183,18 +219,37 @@ class Game(models.Model):
     home_score = models.IntegerField(null=True, blank=True, validators=[MinValueValidator(0)])
     away_score = models.IntegerField(null=True, blank=True, validators=[MinValueValidator(0)])
     played_at = models.DateTimeField(null=True, blank=True)
+    # Goal rows credited to each side, kept by Game.update_goal_counts()
+    home_goal_count = models.PositiveIntegerField(default=0)
+    away_goal_count = models.PositiveIntegerField(default=0)
     created_at = models.DateTimeField(auto_now_add=True)
-    # Match squads
-    home_team_players = models.ManyToManyField(Player, related_name='home_games_played')
-    away_team_players = models.ManyToManyField(Player, related_name='away_games_played')
+    # Match squads are recorded as Appearance rows
 
     class Meta:
         ordering = ['-played_at', '-created_at']
+        indexes = [
+            models.Index(fields=['season', 'played_at'], name='game_season_played_idx'),
+            models.Index(fields=['season', 'home_score'], name='game_season_score_idx'),
+            models.Index(fields=['home_team', 'season'], name='game_home_season_idx'),
+            models.Index(fields=['away_team', 'season'], name='game_away_season_idx'),
+            models.Index(fields=['played_at', 'id'], name='game_played_id_idx'),
+        ]
 
     def __str__(self):
         scores = f"{self.home_score}-{self.away_score}" if self.home_score is not None else "TBD"
         return f"{self.home_team} vs {self.away_team} ({scores})"
 
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # Remember the stored score so saves can tell whether it changed.
+        instance._loaded_score = (instance.__dict__.get('home_score'), instance.__dict__.get('away_score'))
+        return instance
+
+    def score_changed(self):
+        """True if the score differs from the one loaded from the database."""
+        return getattr(self, '_loaded_score', (None, None)) != (self.home_score, self.away_score)
+
     def save(self, *args, **kwargs):
         # Ensure teams are from the same league
         if self.home_team.league != self.away_team.league:
@@ -218,11 +273,33 @@ class Game(models.Model):
         """Get all goals for this game in chronological order."""
         return self.goals.all().order_by('minute')
 
+    def goal_counts_match_score(self):
+        """True if the recorded goals add up to the score (or the game is unplayed)."""
+        if self.home_score is None or self.away_score is None:
+            return True
+        return (self.home_goal_count, self.away_goal_count) == (self.home_score, self.away_score)
+
+    @classmethod
+    def update_goal_counts(cls, games):
+        """Recount the cached per-side goal counts of ``games`` in a single UPDATE."""
+        def side_count(side):
+            goals = (
+                Goal.objects.filter(game=OuterRef('pk'), team=OuterRef(f'{side}_team'))
+                .order_by().values('game').annotate(n=Count('id')).values('n')
+            )
+            return Coalesce(Subquery(goals), 0)
+        return cls.objects.filter(pk__in=games).update(
+            home_goal_count=side_count('home'),
+            away_goal_count=side_count('away'),
+        )
+
 
 class Goal(models.Model):
     game = models.ForeignKey(Game, related_name='goals', on_delete=models.CASCADE)
     scorer = models.ForeignKey(Player, related_name='goals', on_delete=models.CASCADE)
     assistant = models.ForeignKey(Player, related_name='assists', on_delete=models.CASCADE, null=True, blank=True)
+    # Team credited with the goal (the opponent for own goals), set on save
+    team = models.ForeignKey(Team, related_name='goals', on_delete=models.CASCADE, null=True, blank=True, editable=False)
     minute = models.IntegerField(validators=[MinValueValidator(0)])
     is_penalty = models.BooleanField(default=False)
     is_own_goal = models.BooleanField(default=False)
@@ -230,6 +307,30 @@ class Goal(models.Model):
 
     class Meta:
         ordering = ['game', 'minute']
+        indexes = [
+            models.Index(fields=['scorer', 'game'], name='goal_scorer_game_idx'),
+            models.Index(fields=['assistant', 'game'], name='goal_assistant_game_idx'),
+            models.Index(fields=['team', 'game'], name='goal_team_game_idx'),
+        ]
+
+    def resolve_team_id(self):
+        """The side credited with this goal, from the scorer's squad or contract at match time.
+
+        Returns None if the scorer played for neither team.
+        """
+        from .rosters import team_among
+        game = self.game
+        sides = {game.home_team_id: game.away_team_id, game.away_team_id: game.home_team_id}
+        scorer_team = Appearance.objects.filter(game=game, player=self.scorer_id).values_list('team_id', flat=True).first()
+        if scorer_team is None:
+            scorer_team = team_among(self.scorer_id, sides, game.played_at)
+        if scorer_team not in sides:
+            return None
+        return sides[scorer_team] if self.is_own_goal else scorer_team
+
+    def save(self, *args, **kwargs):
+        self.team_id = self.resolve_team_id()
+        super().save(*args, **kwargs)
 
     def __str__(self):
         goal_type = ""
@@ -242,6 +343,31 @@ class Goal(models.Model):
         return f"{self.scorer.name}{goal_type} {self.minute}'{assist_text}"
 
 
+class Appearance(models.Model):
+    """A player named in a game's squad, for one side."""
+    SIDE_CHOICES = [
+        ('home', 'Home'),
+        ('away', 'Away'),
+    ]
+
+    game = models.ForeignKey(Game, related_name='appearances', on_delete=models.CASCADE)
+    player = models.ForeignKey(Player, related_name='appearances', on_delete=models.CASCADE)
+    team = models.ForeignKey(Team, related_name='appearances', on_delete=models.CASCADE)
+    side = models.CharField(max_length=4, choices=SIDE_CHOICES)
+    started = models.BooleanField(default=True)
+    minutes = models.PositiveSmallIntegerField(default=90)
+
+    class Meta:
+        unique_together = ['game', 'player']
+        indexes = [
+            models.Index(fields=['player', 'game'], name='appearance_player_game_idx'),
+            models.Index(fields=['game', 'team'], name='appearance_game_team_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.player.name} for {self.team.name} ({self.minutes}')"
+
+
 class LeagueStanding(models.Model):
     """Cached standings for quick access to league tables."""
     season = models.ForeignKey(Season, related_name='standings', on_delete=models.CASCADE)
@@ -273,11 +399,47 @@ class LeagueStanding(models.Model):
         return f"{self.team.name} - {self.season.name} ({self.points} pts)"
 
     @classmethod
+    @STANDINGS_RECOMPUTE.timed()
     def update_standings(cls, season):
-        """Update standings for all teams in a season."""
-        # Clear existing standings
+        """Update standings for all teams in a season; returns False when a newer recompute covered it.
+
+        Call it after committing (or inside the transaction of) the change
+        it reflects. Recomputes of a season are serialized on its
+        ``StandingsState`` row, and a call whose change was already read by
+        a recompute that started after it skips the work. See
+        ``StandingsState``.
+        """
+        using = router.db_for_write(cls, instance=season)
+        with sharding.use_instance(season):
+            ticket = write_transaction(StandingsState.request, season, using=using)
+            recomputed = write_transaction(cls._recompute_for, season, ticket, using=using)
+        STANDINGS_REQUESTS.inc(result='recomputed' if recomputed else 'skipped')
+        return recomputed
+
+    @classmethod
+    def _recompute_for(cls, season, ticket):
+        state = StandingsState.objects.select_for_update().get(season=season)
+        if state.computed >= ticket:
+            return False
+        cls._rebuild_standings(season)
+        # Everything requested up to now was committed before this transaction read the results
+        StandingsState.objects.filter(pk=state.pk).update(computed=state.requested)
+        return True
+
+    @classmethod
+    def _rebuild_standings(cls, season):
+        previous = dict(cls.objects.filter(season=season).values_list('team_id', 'position'))
+        standings = cls.compute_standings(season)
+
+        # Replace existing standings
         cls.objects.filter(season=season).delete()
-        
+        cls.objects.bulk_create(standings)
+
+        standings_updated.send(sender=cls, season=season, standings=standings, previous=previous)
+
+    @classmethod
+    def compute_standings(cls, season):
+        """The season's table as unsaved rows, in position order; reads only."""
         # Get all teams in the league
         teams = Team.objects.filter(league=season.league)
         
@@ -393,7 +555,170 @@ class LeagueStanding(models.Model):
         # Sort by points, goal difference, goals scored
         standings.sort(key=lambda s: (-s.points, -s.goal_difference, -s.goals_for))
         
-        # Update positions and save
+        # Update positions
         for position, standing in enumerate(standings, 1):
             standing.position = position
-            standing.save()
+        return standings
+
+
+class StandingsState(models.Model):
+    """Per-season lock row and counters of ``LeagueStanding.update_standings()``.
+
+    Each update first takes a ticket by incrementing ``requested``, then
+    locks the row (``select_for_update()``; SQLite's ``BEGIN IMMEDIATE``
+    already serializes writers) and recomputes only if ``computed`` is
+    behind its ticket. A recompute sets ``computed`` to the ``requested`` it
+    read, since every ticket up to it was committed with its change before
+    the recompute read the results.
+    """
+    season = models.OneToOneField(Season, related_name='standings_state', on_delete=models.CASCADE)
+    requested = models.BigIntegerField(default=0)
+    computed = models.BigIntegerField(default=0)
+
+    def __str__(self):
+        return f"{self.season} (computed {self.computed}/{self.requested})"
+
+    @classmethod
+    def request(cls, season):
+        """Take the next ticket of ``season``, in the caller's transaction."""
+        state, _ = cls.objects.select_for_update().get_or_create(season=season)
+        cls.objects.filter(pk=state.pk).update(requested=F('requested') + 1)
+        return state.requested + 1
+
+
+class SeasonSyncState(models.Model):
+    """Per-season change log version used by the delta-sync API."""
+    season = models.OneToOneField(Season, related_name='sync_state', on_delete=models.CASCADE)
+    version = models.BigIntegerField(default=0)
+    min_version = models.BigIntegerField(
+        default=0,
+        help_text="Clients that last synced before this version need a full snapshot"
+    )
+
+    def __str__(self):
+        return f"{self.season} (v{self.version})"
+
+
+class ChangeLogEntry(models.Model):
+    """One inserted, updated or deleted Game, Goal or LeagueStanding row of a season."""
+    OPERATION_CHOICES = [
+        ('insert', 'Insert'),
+        ('update', 'Update'),
+        ('delete', 'Delete'),
+    ]
+
+    season = models.ForeignKey(Season, related_name='changes', on_delete=models.CASCADE)
+    version = models.BigIntegerField()
+    model = models.CharField(max_length=20)  # 'game', 'goal' or 'standing'
+    object_id = models.BigIntegerField()  # team id for standings, which are rebuilt with new ids
+    operation = models.CharField(max_length=6, choices=OPERATION_CHOICES)
+    data = models.JSONField(null=True, blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        ordering = ['season', 'version']
+        unique_together = ['season', 'version']
+        indexes = [
+            models.Index(fields=['season', 'model', 'object_id'], name='changelog_object_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.season_id} v{self.version}: {self.operation} {self.model} {self.object_id}"
+
+
+class IngestedEvent(models.Model):
+    """A live feed event already handled by ``manage.py ingest_events``, keyed by its feed id."""
+    event_id = models.CharField(max_length=100, unique=True)
+    event_type = models.CharField(max_length=20)
+    game = models.ForeignKey(Game, related_name='+', on_delete=models.SET_NULL, null=True, blank=True)
+    # Goal created by a 'goal' event, so later 'assist' events can find it
+    goal = models.ForeignKey(Goal, related_name='+', on_delete=models.SET_NULL, null=True, blank=True)
+    error = models.CharField(max_length=200, blank=True)  # empty when the event was applied
+    processed_at = models.DateTimeField(auto_now_add=True)
+
+    def __str__(self):
+        outcome = f"rejected: {self.error}" if self.error else "applied"
+        return f"{self.event_id} ({self.event_type}, {outcome})"
+
+
+class Job(models.Model):
+    """A unit of background work, queued in the database and run by ``manage.py run_jobs`` (see ``api.jobs``)."""
+    QUEUED = 'queued'
+    RUNNING = 'running'
+    SUCCEEDED = 'succeeded'
+    FAILED = 'failed'
+    STATUS_CHOICES = [
+        (QUEUED, 'Queued'),
+        (RUNNING, 'Running'),
+        (SUCCEEDED, 'Succeeded'),
+        (FAILED, 'Failed'),
+    ]
+    ACTIVE = (QUEUED, RUNNING)
+
+    kind = models.CharField(max_length=50)
+    args = models.JSONField(default=dict, blank=True)
+    priority = models.SmallIntegerField(default=0, help_text="Higher runs first")
+    # At most one queued or running job per key
+    dedup_key = models.CharField(max_length=200, null=True, blank=True)
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default=QUEUED)
+    attempts = models.PositiveSmallIntegerField(default=0)
+    max_attempts = models.PositiveSmallIntegerField(default=3)
+    run_after = models.DateTimeField(default=timezone.now)
+    progress = models.FloatField(default=0)  # 0 to 1
+    progress_message = models.CharField(max_length=200, blank=True)
+    result = models.JSONField(null=True, blank=True)
+    error = models.CharField(max_length=500, blank=True)  # last failure
+    worker = models.CharField(max_length=100, blank=True)
+    heartbeat_at = models.DateTimeField(null=True, blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    started_at = models.DateTimeField(null=True, blank=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+    # Who queued it through the API (None for jobs queued by code)
+    created_by = models.ForeignKey('auth.User', null=True, blank=True, related_name='+', on_delete=models.SET_NULL)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['status', '-priority', 'run_after'], name='job_claim_idx'),
+        ]
+        constraints = [
+            models.UniqueConstraint(
+                fields=['dedup_key'], condition=Q(status__in=['queued', 'running']), name='job_active_dedup_key',
+            ),
+        ]
+
+    def __str__(self):
+        return f"{self.kind} #{self.pk} ({self.status})"
+
+
+class DataVersion(models.Model):
+    """The data version of one scope of cached results (see ``api.versioning``)."""
+    # 'epoch', 'all', 'league:<id>' or 'season:<id>'
+    scope = models.CharField(max_length=40, unique=True)
+    version = models.BigIntegerField(default=0)
+
+    def __str__(self):
+        return f"{self.scope} version {self.version}"
+
+
+class TokenRevocation(models.Model):
+    """A revoked JWT, or every token issued to a user up to a time (see ``api.authentication``)."""
+    # 'jti:<token id>' or 'user:<user id>'
+    key = models.CharField(max_length=100, unique=True)
+    # Unix time; tokens of the user issued at or before it are rejected
+    issued_before = models.BigIntegerField(null=True, blank=True)
+    # When every token it covers has expired anyway
+    expires_at = models.DateTimeField(db_index=True)
+
+    def __str__(self):
+        return f"{self.key} (until {self.expires_at})"
+
+
+class ReplicaPin(models.Model):
+    """A token client kept on the primary after a write (see ``api.replica``)."""
+    # Hash of the client's Authorization header
+    key = models.CharField(max_length=64, unique=True)
+    # Unix time of the client's last write
+    wrote_at = models.FloatField(db_index=True)
+
+    def __str__(self):
+        return f"{self.key} (wrote at {self.wrote_at})"
@@ -0,0 +1,180 @@
+"""Match and season predictions, with their responses cached per data version.
+
+Responses are kept in an in-process LRU (``PREDICTION_CACHE['max_entries']``)
+keyed by the team pair and the ``ALL`` data version, or by the season and
+its data version (see ``api.versioning``), so a result write invalidates
+the match predictions and that season's prediction only. Set
+``PREDICTION_CACHE['cache']`` to a cache alias to also share them between
+processes through that backend.
+
+A miss is built once per process however many requests ask for the same key
+at the same time: the first computes, the others wait for its result
+(single flight).
+"""
+import threading
+from collections import OrderedDict
+
+from django.conf import settings
+from django.core.cache import caches
+from django.db.models import Q
+
+from . import metrics
+from .models import Game, LeagueStanding, Team
+from .versioning import ALL, get_data_version, season_scope
+
+DEFAULTS = {
+    'max_entries': 1024,
+    'cache': None,
+    'timeout': 60 * 60,
+}
+# How long a waiting request trusts the request computing its key
+BUILD_WAIT = 30
+
+
+def _config():
+    return {**DEFAULTS, **getattr(settings, 'PREDICTION_CACHE', {})}
+
+
+class ResponseCache:
+    """LRU of built responses for the current data versions, filled single-flight."""
+
+    def __init__(self, name):
+        self.name = name
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()
+        self._versions = {}
+        self._building = {}
+
+    def _local_get(self, key):
+        with self._lock:
+            if key in self._entries:
+                self._entries.move_to_end(key)
+                return True, self._entries[key]
+        return False, None
+
+    def _local_set(self, key, value, max_entries):
+        with self._lock:
+            self._entries[key] = value
+            self._entries.move_to_end(key)
+            while len(self._entries) > max_entries:
+                self._entries.popitem(last=False)
+
+    def get_or_build(self, parts, build, scope=ALL):
+        """The cached response for ``parts`` under ``scope``'s data version, calling ``build()`` on a miss.
+
+        Exceptions raised by ``build()`` are not cached; every request waiting
+        on that build computes again itself.
+        """
+        config = _config()
+        version = get_data_version(scope)
+        prefix = f'api:{scope}:'
+        with self._lock:
+            if self._versions.get(scope) != version:
+                # Entries of the scope's older versions can never be hit again
+                for stale in [key for key in self._entries if key.startswith(prefix)]:
+                    del self._entries[stale]
+                self._versions[scope] = version
+        key = ':'.join([prefix + version, self.name, *map(str, parts)])
+
+        found, value = self._local_get(key)
+        if found:
+            metrics.CACHE_REQUESTS.inc(cache=self.name, result='hit')
+            return value
+        shared = caches[config['cache']] if config['cache'] else None
+
+        with self._lock:
+            building = self._building.get(key)
+            if building is None:
+                building = self._building[key] = threading.Event()
+                leader = True
+            else:
+                leader = False
+        if not leader:
+            building.wait(BUILD_WAIT)
+            found, value = self._local_get(key)
+            if found:
+                metrics.CACHE_REQUESTS.inc(cache=self.name, result='hit')
+                return value
+            return build()
+
+        try:
+            value = shared.get(key) if shared is not None else None
+            if value is not None:
+                metrics.CACHE_REQUESTS.inc(cache=self.name, result='hit')
+            else:
+                metrics.CACHE_REQUESTS.inc(cache=self.name, result='miss')
+                value = build()
+                if shared is not None:
+                    shared.set(key, value, config['timeout'])
+            self._local_set(key, value, config['max_entries'])
+            return value
+        finally:
+            with self._lock:
+                del self._building[key]
+            building.set()
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._versions.clear()
+
+
+_responses = ResponseCache('predictions')
+
+
+def _win_rate(team_id):
+    """Laplace-smoothed rate of wins over the games involving ``team_id`` with a score."""
+    played = Game.objects.filter(
+        Q(home_team_id=team_id) | Q(away_team_id=team_id)
+    ).exclude(home_score__isnull=True, away_score__isnull=True)
+    wins = total = 0
+    for home_id, home_score, away_score in played.values_list('home_team_id', 'home_score', 'away_score'):
+        total += 1
+        if home_score is None or away_score is None or home_score == away_score:
+            continue
+        wins += (home_score > away_score) == (home_id == team_id)
+    return (wins + 1) / (total + 2)
+
+
+@metrics.PREDICTION_LATENCY.timed(kind='match')
+def build_match(team1_id, team2_id):
+    """Raises ``Team.DoesNotExist`` when either team is missing."""
+    team1 = Team.objects.only('pk').get(pk=team1_id)
+    team2 = Team.objects.only('pk').get(pk=team2_id)
+    rate1, rate2 = _win_rate(team1.pk), _win_rate(team2.pk)
+
+    # normalize to probability
+    s = rate1 + rate2
+    prob1 = rate1 / s if s > 0 else 0.5
+    prob2 = rate2 / s if s > 0 else 0.5
+
+    return {
+        'team1': team1.pk,
+        'team2': team2.pk,
+        'team1_win_rate': round(rate1, 3),
+        'team2_win_rate': round(rate2, 3),
+        'predicted_winner': team1.pk if prob1 >= prob2 else team2.pk,
+        'probability': round(max(prob1, prob2), 3),
+    }
+
+
+@metrics.PREDICTION_LATENCY.timed(kind='season')
+def build_season(season_id):
+    """Raises ``LeagueStanding.DoesNotExist`` when the season has no standings."""
+    standing = (
+        LeagueStanding.objects.filter(season_id=season_id).select_related('team')
+        .order_by('-points', '-goal_difference').first()
+    )
+    if standing is None:
+        raise LeagueStanding.DoesNotExist
+    return {'predicted_winner': standing.team.id, 'team': standing.team.name, 'points': standing.points}
+
+
+def predict_match(team1_id, team2_id):
+    return _responses.get_or_build(('match', team1_id, team2_id), lambda: build_match(team1_id, team2_id))
+
+
+def predict_season(season_id):
+    return _responses.get_or_build(
+        ('season', season_id), lambda: build_season(season_id), scope=season_scope(season_id),
+    )
@@ -0,0 +1,146 @@
+"""Read queries behind the dashboard and league pages.
+
+Each builder returns a callable that runs one independent query and returns
+fully evaluated results (related rows preloaded for the templates), so the
+sync views can simply call them in turn while the async views in
+``api.async_views`` run them concurrently.
+"""
+from collections import defaultdict
+
+from django.db.models import Count, Subquery, Sum
+from django.db.models.functions import TruncDate
+
+from . import leaderboards
+from .models import Game, LeagueStanding, Player
+
+FORM_LENGTH = 5
+
+
+def standings(season):
+    return lambda: list(LeagueStanding.objects.filter(season=season).select_related('team'))
+
+
+def recent_games(season, now, limit=5):
+    return lambda: list(
+        Game.objects.filter(season=season, played_at__lt=now, home_score__isnull=False)
+        .select_related('home_team', 'away_team', 'season__league')
+        .order_by('-played_at')[:limit]
+    )
+
+
+def upcoming_games(season, now, limit=5):
+    return lambda: list(
+        Game.objects.filter(season=season, played_at__gt=now)
+        .select_related('home_team', 'away_team', 'season__league')
+        .order_by('played_at')[:limit]
+    )
+
+
+def next_matchday_games(season, now):
+    """All games played on the day of the next upcoming game."""
+    next_day = (
+        Game.objects.filter(season=season, played_at__gt=now)
+        .order_by('played_at')
+        .annotate(day=TruncDate('played_at'))
+        .values('day')[:1]
+    )
+    return lambda: list(
+        Game.objects.filter(season=season)
+        .annotate(day=TruncDate('played_at'))
+        .filter(day=Subquery(next_day))
+        .select_related('home_team', 'away_team')
+        .order_by('played_at')
+    )
+
+
+def form_table(season, now, length=FORM_LENGTH):
+    """Last ``length`` results per team, oldest first, from a single query."""
+    def run():
+        form = defaultdict(list)
+        rows = (
+            Game.objects.filter(season=season, played_at__lt=now, home_score__isnull=False)
+            .order_by('-played_at')
+            .values_list('home_team_id', 'away_team_id', 'home_score', 'away_score')
+        )
+        for home_team_id, away_team_id, home_score, away_score in rows:
+            if home_score > away_score:
+                home, away = 'W', 'L'
+            elif home_score < away_score:
+                home, away = 'L', 'W'
+            else:
+                home = away = 'D'
+            if len(form[home_team_id]) < length:
+                form[home_team_id].append(home)
+            if len(form[away_team_id]) < length:
+                form[away_team_id].append(away)
+        return {team_id: results[::-1] for team_id, results in form.items()}
+    return run
+
+
+def league_totals(season):
+    def run():
+        agg = Game.objects.filter(
+            season=season, home_score__isnull=False, away_score__isnull=False
+        ).aggregate(total_games=Count('id'), total_home=Sum('home_score'), total_away=Sum('away_score'))
+        total_goals = (agg['total_home'] or 0) + (agg['total_away'] or 0)
+        return {
+            'total_games': agg['total_games'],
+            'total_goals': total_goals,
+            'avg_goals_per_game': (total_goals / agg['total_games']) if agg['total_games'] else 0,
+        }
+    return run
+
+
+def top_players(season, board, limit=5):
+    """``[(player, value)]`` for one of the ``api.leaderboards`` player boards."""
+    def run():
+        ranked = leaderboards.top_k(leaderboards.get_tallies(season=season)[board], limit)
+        players = Player.objects.in_bulk([pk for pk, _ in ranked])
+        return [(players[pk], value) for pk, value in ranked if pk in players]
+    return run
+
+
+def dashboard_queries(season, now):
+    """Independent queries behind the dashboard, keyed by context name."""
+    return {
+        'standings': standings(season),
+        'recent_games': recent_games(season, now),
+        'upcoming_games': upcoming_games(season, now),
+        'next_matchday_games': next_matchday_games(season, now),
+        'form': form_table(season, now),
+        'top_scorers': top_players(season, 'goals'),
+        'top_assisters': top_players(season, 'assists'),
+        'league_totals': league_totals(season),
+    }
+
+
+def dashboard_context(league, season, results):
+    """Assemble the dashboard template context from ``dashboard_queries`` results."""
+    standings = results['standings']
+    next_matchday_games = results['next_matchday_games']
+    form = results['form']
+    return {
+        'league': league,
+        'season': season,
+        'standings': standings,
+        'recent_games': results['recent_games'],
+        'upcoming_games': results['upcoming_games'],
+        'next_matchday_games': next_matchday_games,
+        'next_matchday_date': next_matchday_games[0].played_at.date() if next_matchday_games else None,
+        'form_data': [{'team': s.team, 'form': form.get(s.team_id, [])} for s in standings],
+        'top_scorers': [{'player': p, 'goals': n} for p, n in results['top_scorers']],
+        'top_assisters': [{'player': p, 'assists': n} for p, n in results['top_assisters']],
+        'league_stats': dict(
+            results['league_totals'],
+            total_clean_sheets=sum(s.clean_sheets for s in standings),
+        ),
+    }
+
+
+def league_detail_queries(season, now):
+    """Independent queries behind the league page for its active season."""
+    return {
+        'standings': standings(season),
+        'recent_games': recent_games(season, now),
+        'upcoming_games': upcoming_games(season, now),
+    }
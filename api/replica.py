@@ -0,0 +1,259 @@
+"""Read replica: a copy of the SQLite database serving read-only requests.
+
+When ``DATABASES`` has a ``'replica'`` alias, ``replica_middleware`` marks
+GET, HEAD and OPTIONS requests as read-only and ``api.routers.ReplicaRouter``
+sends their reads of this app's models to the replica. Every other request,
+and anything outside a request (commands, workers), uses the primary.
+
+``refresh()`` (run by ``manage.py refresh_replica``) copies the primary into
+the replica with SQLite's online backup API and records when the copy
+started in a ``<replica>.synced`` file next to it; ``lag()`` is the age of
+that copy. Requests use the primary while the replica is older than
+``REPLICA_MAX_LAG`` seconds or has never been refreshed.
+
+Reads are sticky after writes: a request that writes this app's models pins
+its client (by a ``db_pin`` cookie, and for token clients by their
+``Authorization`` header in the ``ReplicaPin`` table, which every worker
+reads on the primary) to the primary until a refresh has started after the
+write, so clients always see their own changes. The pin is taken when the
+response is ready, after the request's writes committed, so a refresh that
+started before the commit can never count as newer than the write.
+
+Token pins are not queried per request: each process keeps a snapshot of
+the pins taken since the current copy started, reloaded after a refresh, at
+most every ``REPLICA_PIN_TTL`` seconds, and when a pin bumps a counter in the
+default cache. Processes sharing that cache see a pin at once; others within
+``REPLICA_PIN_TTL`` seconds.
+"""
+import hashlib
+import os
+import sqlite3
+import tempfile
+import threading
+import time
+from contextvars import ContextVar
+
+from asgiref.sync import iscoroutinefunction, sync_to_async
+from django.conf import settings
+from django.core.cache import cache
+from django.db import DEFAULT_DB_ALIAS, connections
+from django.utils.decorators import sync_and_async_middleware
+
+from . import metrics
+from .models import ReplicaPin
+
+REPLICA = 'replica'
+PIN_COOKIE = 'db_pin'
+SAFE_METHODS = ('GET', 'HEAD', 'OPTIONS')
+# How long a worker trusts its last read of the sync marker
+SYNCED_AT_TTL = 1.0
+DEFAULT_PIN_TTL = 1.0
+PINS_CHANGED_KEY = 'replica:pins'
+
+
+def enabled():
+    return REPLICA in settings.DATABASES
+
+
+def _max_lag():
+    return getattr(settings, 'REPLICA_MAX_LAG', 30)
+
+
+def _marker():
+    return f"{settings.DATABASES[REPLICA]['NAME']}.synced"
+
+
+def refresh():
+    """Copy the primary into the replica; returns the seconds the copy took."""
+    primary = connections['default']
+    primary.ensure_connection()
+    started = time.time()
+    target = sqlite3.connect(settings.DATABASES[REPLICA]['NAME'])
+    try:
+        primary.connection.backup(target)
+    finally:
+        target.close()
+
+    directory = os.path.dirname(os.path.abspath(_marker()))
+    handle, temporary = tempfile.mkstemp(dir=directory, suffix='.tmp')
+    with os.fdopen(handle, 'w') as f:
+        f.write(repr(started))
+    os.replace(temporary, _marker())
+    _synced_at_cache.clear()
+    return time.time() - started
+
+
+_synced_at_cache = {}
+
+
+def synced_at():
+    """When the replica's current copy was started, or None if it was never refreshed."""
+    now = time.monotonic()
+    cached = _synced_at_cache.get('value')
+    if cached is not None and now - cached[0] < SYNCED_AT_TTL:
+        return cached[1]
+    try:
+        with open(_marker()) as f:
+            value = float(f.read())
+    except (OSError, ValueError):
+        value = None
+    _synced_at_cache['value'] = (now, value)
+    return value
+
+
+def lag():
+    """Seconds since the replica's copy was started, or None if it was never refreshed."""
+    started = synced_at()
+    return None if started is None else max(0.0, time.time() - started)
+
+
+class _RequestState:
+    __slots__ = ('use_replica', 'wrote')
+
+    def __init__(self, use_replica):
+        self.use_replica = use_replica
+        self.wrote = False
+
+
+_state = ContextVar('replica_request_state', default=None)
+
+
+def reads_from_replica():
+    state = _state.get()
+    return state is not None and state.use_replica
+
+
+def record_write():
+    """Called by the router for writes: later reads of the request go to the primary."""
+    state = _state.get()
+    if state is not None:
+        state.use_replica = False
+        state.wrote = True
+
+
+def _token_pin_key(request):
+    authorization = request.headers.get('Authorization')
+    if not authorization:
+        return None
+    return hashlib.sha256(authorization.encode()).hexdigest()[:32]
+
+
+def _pins():
+    # Never the replica: a pin must apply to the client's next request on any worker
+    return ReplicaPin.objects.using(DEFAULT_DB_ALIAS)
+
+
+class _PinSnapshot:
+    """``{pin key: wrote_at}`` of the pins taken since a copy started, kept ``REPLICA_PIN_TTL`` seconds."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._snapshot = None  # (expires, cache counter it was read at, copy start, entries)
+
+    def get(self, started):
+        ttl = getattr(settings, 'REPLICA_PIN_TTL', DEFAULT_PIN_TTL)
+        # Read before the rows: a pin taken after the query changes it
+        changed = cache.get(PINS_CHANGED_KEY)
+        now = time.monotonic()
+        snapshot = self._snapshot
+        if snapshot is not None and snapshot[0] > now and snapshot[1] == changed and snapshot[2] == started:
+            return snapshot[3]
+        # Older pins no longer keep anyone off this copy
+        entries = dict(_pins().filter(wrote_at__gte=started).values_list('key', 'wrote_at'))
+        if ttl > 0:
+            with self._lock:
+                self._snapshot = (now + ttl, changed, started, entries)
+        return entries
+
+    def discard(self):
+        with self._lock:
+            self._snapshot = None
+        cache.add(PINS_CHANGED_KEY, 0, timeout=None)
+        try:
+            cache.incr(PINS_CHANGED_KEY)
+        except ValueError:
+            pass  # evicted in between; the snapshots reload anyway
+
+
+_pinned = _PinSnapshot()
+
+
+def forget_pins():
+    """Drop the pin snapshots of this process (and of those sharing its cache)."""
+    _pinned.discard()
+
+
+def _use_replica(request):
+    if request.method not in SAFE_METHODS or not enabled():
+        return False
+    started = synced_at()
+    if started is None or time.time() - started > _max_lag():
+        return False
+    try:
+        pinned = float(request.COOKIES.get(PIN_COOKIE, 0))
+    except ValueError:
+        pinned = 0.0
+    key = _token_pin_key(request)
+    if key is not None:
+        pinned = max(pinned, _pinned.get(started).get(key, 0.0))
+    return started > pinned
+
+
+def _pin(request, response):
+    """Pin the client to the primary; called once the request's writes have committed."""
+    wrote_at = time.time()
+    max_age = int(_max_lag()) + 1
+    response.set_cookie(PIN_COOKIE, repr(wrote_at), max_age=max_age, httponly=True, samesite='Lax')
+    key = _token_pin_key(request)
+    if key is not None:
+        # Older pins no longer matter: the primary is used anyway once the replica lags that much
+        _pins().filter(wrote_at__lt=wrote_at - max_age).delete()
+        _pins().update_or_create(key=key, defaults={'wrote_at': wrote_at})
+        _pinned.discard()
+
+
+def _replica_lag():
+    value = lag() if enabled() else None
+    return {} if value is None else {(): value}
+
+
+REPLICA_LAG = metrics.Gauge('db_replica_lag_seconds', 'Age of the read replica copy', collect=_replica_lag)
+
+
+@sync_and_async_middleware
+def replica_middleware(get_response):
+    """Route the reads of read-only requests to the replica, pinning clients after writes."""
+
+    def begin(request, use_replica):
+        return _state.set(_RequestState(use_replica))
+
+    def finish(token):
+        """Reset the request state; returns whether the client must be pinned."""
+        state = _state.get()
+        _state.reset(token)
+        return state.wrote and enabled()
+
+    if iscoroutinefunction(get_response):
+        async def middleware(request):
+            # Pins may be read from and are written to the database, off the event loop
+            token = begin(request, enabled() and await sync_to_async(_use_replica)(request))
+            try:
+                response = await get_response(request)
+            except BaseException:
+                _state.reset(token)
+                raise
+            if finish(token):
+                await sync_to_async(_pin)(request, response)
+            return response
+    else:
+        def middleware(request):
+            token = begin(request, _use_replica(request))
+            try:
+                response = get_response(request)
+            except BaseException:
+                _state.reset(token)
+                raise
+            if finish(token):
+                _pin(request, response)
+            return response
+    return middleware
@@ -0,0 +1,134 @@
+"""Roster timelines: who was under contract with which team on a given day.
+
+Each team's and each player's contracts are kept as a ``Timeline``: the
+contract intervals sorted by start date with a running maximum of end dates.
+"Contracts active on day D" is a binary search plus a short walk back over
+the intervals that can still cover D, and a player's team on D is found in
+O(log n) since a player's contracts don't overlap.
+
+Timelines are cached per ``CONTRACTS`` data version (see ``api.versioning``),
+which only contract writes bump, so results and squad changes leave them
+cached. The batch helpers load every missing timeline with a single query,
+so squads for a whole list of games cost one query at most.
+Contract dates are inclusive on both ends. Timelines serve reads only;
+validating a contract write queries the contracts table directly.
+"""
+import bisect
+from collections import namedtuple
+
+from django.core.cache import cache
+from django.utils import timezone
+
+from . import metrics
+from .models import PlayerContract
+from .versioning import CONTRACTS, versioned_key
+
+Contract = namedtuple('Contract', 'pk player_id team_id number start_date end_date')
+
+CACHE_TIMEOUT = 60 * 60
+
+
+class Timeline:
+    """Contract intervals sorted by start date."""
+
+    def __init__(self, contracts):
+        self.contracts = sorted(contracts, key=lambda c: (c.start_date, c.end_date, c.pk))
+        self.starts = [c.start_date for c in self.contracts]
+        self.max_ends = []
+        for contract in self.contracts:
+            previous = self.max_ends[-1] if self.max_ends else contract.end_date
+            self.max_ends.append(max(previous, contract.end_date))
+
+    def overlapping(self, start, end, exclude=None):
+        """Contracts overlapping ``[start, end]``, latest start first."""
+        i = bisect.bisect_right(self.starts, end) - 1
+        # Intervals further back can only reach ``start`` if the running max does.
+        while i >= 0 and self.max_ends[i] >= start:
+            contract = self.contracts[i]
+            if contract.end_date >= start and contract.pk != exclude:
+                yield contract
+            i -= 1
+
+    def active_at(self, day):
+        return list(self.overlapping(day, day))
+
+
+def _load(field, ids):
+    """``{id: Timeline}`` for teams or players, from the cache or one query for the rest."""
+    ids = set(ids)
+    prefix = versioned_key(CONTRACTS, 'roster', field)
+    keys = {f'{prefix}:{pk}': pk for pk in ids}
+    found = {keys[key]: timeline for key, timeline in cache.get_many(keys).items()}
+    missing = ids - set(found)
+    metrics.CACHE_REQUESTS.inc(len(found), cache='rosters', result='hit')
+    metrics.CACHE_REQUESTS.inc(len(missing), cache='rosters', result='miss')
+    if missing:
+        contracts = {pk: [] for pk in missing}
+        rows = PlayerContract.objects.filter(**{f'{field}__in': missing}).order_by().values_list(
+            'pk', 'player_id', 'team_id', 'number', 'start_date', 'end_date'
+        )
+        for row in rows:
+            contract = Contract(*row)
+            contracts[getattr(contract, field)].append(contract)
+        built = {pk: Timeline(items) for pk, items in contracts.items()}
+        cache.set_many({f'{prefix}:{pk}': timeline for pk, timeline in built.items()}, CACHE_TIMEOUT)
+        found.update(built)
+    return found
+
+
+def team_timelines(team_ids):
+    return _load('team_id', team_ids)
+
+
+def player_timelines(player_ids):
+    return _load('player_id', player_ids)
+
+
+def _day(value):
+    if value is None:
+        return timezone.localdate()
+    return timezone.localdate(value) if hasattr(value, 'hour') else value
+
+
+def squad_at(team_id, day=None):
+    """Contracts of ``team_id`` active on ``day`` (default today)."""
+    return team_timelines([team_id])[team_id].active_at(_day(day))
+
+
+def squads_for_games(games):
+    """``{game_id: (home contracts, away contracts)}`` on each game's date, in one batch."""
+    games = list(games)
+    timelines = team_timelines({g.home_team_id for g in games} | {g.away_team_id for g in games})
+    squads = {}
+    for game in games:
+        day = _day(game.played_at)
+        squads[game.pk] = (
+            timelines[game.home_team_id].active_at(day),
+            timelines[game.away_team_id].active_at(day),
+        )
+    return squads
+
+
+def teams_at(player_ids, day=None):
+    """``{player_id: team_id}`` for players under contract on ``day`` (default today)."""
+    day = _day(day)
+    teams = {}
+    for player_id, timeline in player_timelines(player_ids).items():
+        active = next(timeline.overlapping(day, day), None)
+        if active is not None:
+            teams[player_id] = active.team_id
+    return teams
+
+
+def team_among(player_id, team_ids, day=None):
+    """The first of ``team_ids`` that ``player_id`` is under contract with on ``day``, or None."""
+    contracts = player_timelines([player_id])[player_id].active_at(_day(day))
+    return next((c.team_id for c in contracts if c.team_id in team_ids), None)
+
+
+def contracts_with_players(contracts):
+    """Load ``Contract`` entries as ``PlayerContract`` rows with players, ordered by position."""
+    return list(
+        PlayerContract.objects.filter(pk__in=[c.pk for c in contracts])
+        .select_related('player').order_by('player__position', 'number')
+    )
@@ -0,0 +1,70 @@
+"""Database routers (``DATABASE_ROUTERS``)."""
+from . import replica, sharding
+
+APP_LABEL = 'api'
+
+
+class LeagueShardRouter:
+    """League data goes to its league's shard. See ``api.sharding``.
+
+    Returns None for ``'default'`` so the routers after it (the replica)
+    still apply to unsharded data.
+    """
+
+    def _db(self, model, hints):
+        if not sharding.enabled() or not sharding.is_sharded(model):
+            return None
+        instance = hints.get('instance')
+        alias = sharding.instance_db(instance) if instance is not None else None
+        alias = alias or sharding.current()
+        return None if alias in (None, sharding.DEFAULT, replica.REPLICA) else alias
+
+    def db_for_read(self, model, **hints):
+        return self._db(model, hints)
+
+    def db_for_write(self, model, **hints):
+        return self._db(model, hints)
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # Players are copied into every shard; other relations must stay within one database
+        if sharding.enabled() and sharding.REPLICATED_MODELS.intersection(
+            [obj1._meta.model_name, obj2._meta.model_name]
+        ):
+            return True
+        return None
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        # Shards only hold this app's tables
+        if db in sharding.aliases()[1:]:
+            return app_label == APP_LABEL
+        return None
+
+
+class ReplicaRouter:
+    """Reads of read-only requests go to the replica, everything else to the primary.
+
+    Only this app's models are routed; sessions, users and other contrib
+    tables stay on the primary. See ``api.replica``.
+    """
+
+    def db_for_read(self, model, **hints):
+        if model._meta.app_label == APP_LABEL and replica.reads_from_replica():
+            return replica.REPLICA
+        return None
+
+    def db_for_write(self, model, **hints):
+        if model._meta.app_label == APP_LABEL:
+            replica.record_write()
+        return 'default'
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # Both aliases hold the same data
+        if {obj1._state.db, obj2._state.db} <= {'default', replica.REPLICA}:
+            return True
+        return None
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        # The replica gets its schema with the data from refresh()
+        if db == replica.REPLICA:
+            return False
+        return None
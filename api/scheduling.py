@@ -1,8 +1,11 @@
 from datetime import datetime, timedelta
 from itertools import combinations
 import random
+from django.db import router
 from django.utils import timezone
 from .models import Game, Team, Season
+from . import sync
+from .versioning import bump_season
 
 def generate_fixtures(season, start_date=None, matchdays_interval=7):
     """
@@ -68,6 +71,11 @@ def generate_fixtures(season, start_date=None, matchdays_interval=7):
             matchday += 1
 
     # Bulk create all fixtures
-    Game.objects.bulk_create([
+    games = Game.objects.bulk_create([
         Game(**fixture) for fixture in fixtures
-    ])
\ No newline at end of file
+    ])
+
+    # bulk_create() sends no signals, so log the new fixtures for delta sync here
+    sync.record_many(season.pk, 'game', [(game.pk, 'insert', sync.game_data(game)) for game in games])
+    bump_season(season.pk, using=router.db_for_write(Game, instance=season))
+    return games
\ No newline at end of file
@@ -0,0 +1,120 @@
+"""Full-text search over players, teams and leagues.
+
+On SQLite the ``api_search`` FTS5 table indexes ``Player.name``/``nationality``,
+``Team.name``/``short_name`` and ``League.name``/``country``. Triggers on the
+source tables (migration 0007) keep it in sync, including bulk inserts and
+queryset updates that bypass model signals. A row's rowid encodes the object
+as ``id * 4 + kind code``, so hits are returned straight from the index
+without touching the source tables.
+
+Every query term is matched as a prefix (for autocomplete) and hits are
+ranked by BM25 with names weighted above details. To keep lookups in the low
+milliseconds on large tables, only the first ``CANDIDATES`` matches are
+ranked; very common prefixes narrow down as more letters are typed. With
+league shards (``api.sharding``) every shard's index is searched and the hits
+merged. Other databases fall back to ``icontains`` lookups.
+"""
+import functools
+import re
+
+from django.db import DEFAULT_DB_ALIAS as DEFAULT_DB, connection, connections
+from django.db.models import Q
+from django.db.models.expressions import RawSQL
+from django.urls import reverse
+
+from . import sharding
+from .models import League, Player, Team
+
+KINDS = {'player': 1, 'team': 2, 'league': 3}
+DEFAULT_LIMIT = 20
+MAX_LIMIT = 100
+MAX_TERMS = 8
+CANDIDATES = 1000
+# Shorter terms match too many prefixes to rank quickly; they must match whole words.
+MIN_PREFIX = 2
+NAME_WEIGHT = 10.0
+DETAIL_WEIGHT = 1.0
+
+
+def is_available():
+    return connection.vendor == 'sqlite'
+
+
+def match_expression(text):
+    """Turn free text into an FTS5 query: every term must match, as a prefix."""
+    terms = re.findall(r'\w+', text or '')[:MAX_TERMS]
+    return ' '.join(f'"{term}"*' if len(term) >= MIN_PREFIX else f'"{term}"' for term in terms)
+
+
+@functools.lru_cache
+def _url_template(kind):
+    # One reverse() per kind instead of one per hit.
+    return reverse(f'{kind}_detail', args=[987654321]).replace('987654321', '{}')
+
+
+def _hit(kind, pk, name, detail):
+    return {
+        'type': kind,
+        'id': pk,
+        'name': name,
+        'detail': detail,
+        'url': _url_template(kind).format(pk),
+    }
+
+
+def search(text, kinds=None, limit=DEFAULT_LIMIT):
+    """Best matches for ``text`` as ``[{type, id, name, detail, url}]``."""
+    kinds = [kind for kind in (kinds or KINDS) if kind in KINDS]
+    expression = match_expression(text)
+    if not expression or not kinds:
+        return []
+    if not is_available():
+        return _fallback_search(text, kinds, limit)
+
+    rows = _ranked(DEFAULT_DB, expression, kinds, limit)
+    # Players are copied into every league shard; their hits come from 'default' only
+    shard_kinds = [kind for kind in kinds if kind != 'player']
+    if sharding.enabled() and shard_kinds:
+        for alias in sharding.aliases()[1:]:
+            rows += _ranked(alias, expression, shard_kinds, limit)
+        # BM25 statistics are per database, so merged scores are approximate
+        rows.sort(key=lambda row: (row[4], len(row[2])))
+    return [_hit(kind, rowid // 4, name, detail) for rowid, kind, name, detail, _ in rows[:limit]]
+
+
+def _ranked(alias, expression, kinds, limit):
+    sql = (
+        'SELECT rowid, kind, name, detail, score FROM ('
+        ' SELECT rowid, kind, name, detail, bm25(api_search, %s, %s) AS score'
+        ' FROM api_search WHERE api_search MATCH %s'
+        f" AND kind IN ({', '.join(['%s'] * len(kinds))}) LIMIT %s"
+        ') ORDER BY score, length(name) LIMIT %s'
+    )
+    with connections[alias].cursor() as cursor:
+        cursor.execute(sql, [NAME_WEIGHT, DETAIL_WEIGHT, expression, *kinds, CANDIDATES, limit])
+        return cursor.fetchall()
+
+
+def matching_ids(text, kind):
+    """Subquery of the ids of ``kind`` objects matching ``text``, for ``pk__in`` filters."""
+    return RawSQL(
+        'SELECT rowid / 4 FROM api_search WHERE api_search MATCH %s AND kind = %s',
+        (match_expression(text), kind),
+    )
+
+
+def _fallback_search(text, kinds, limit):
+    terms = re.findall(r'\w+', text)[:MAX_TERMS]
+    sources = {
+        'player': (Player.objects.all(), 'name', 'nationality'),
+        'team': (Team.objects.all(), 'name', 'short_name'),
+        'league': (League.objects.all(), 'name', 'country'),
+    }
+    hits = []
+    for kind in kinds:
+        queryset, name, detail = sources[kind]
+        for term in terms:
+            queryset = queryset.filter(Q(**{f'{name}__icontains': term}) | Q(**{f'{detail}__icontains': term}))
+        for pk, name_value, detail_value in queryset.values_list('pk', name, detail)[:limit]:
+            hits.append(_hit(kind, pk, name_value, detail_value or ''))
+    return hits[:limit]
@@ -1,8 +1,25 @@
 from rest_framework import serializers
-from .models import League, Season, Team, Game, LeagueStanding, Player, Goal
+from . import sharding
+from .models import League, Season, Team, Game, LeagueStanding, Player, Goal, Job
 from django.contrib.auth.models import User
 
 
+class ShardedPrimaryKeyRelatedField(serializers.PrimaryKeyRelatedField):
+    """Looks the object up in the league shard holding it (see ``api.sharding``)."""
+
+    def to_internal_value(self, data):
+        try:
+            alias = sharding.locate(self.get_queryset().model, data) if sharding.enabled() else None
+        except (TypeError, ValueError):
+            alias = None
+        if alias is None:
+            return super().to_internal_value(data)
+        # The object being written goes to the same shard
+        sharding.follow(alias)
+        with sharding.use_db(alias):
+            return super().to_internal_value(data)
+
+
 class UserSerializer(serializers.ModelSerializer):
     class Meta:
         model = User
@@ -18,10 +35,11 @@ class PlayerSerializer(serializers.ModelSerializer):
 class GoalSerializer(serializers.ModelSerializer):
     scorer = serializers.PrimaryKeyRelatedField(queryset=Player.objects.all())
     assistant = serializers.PrimaryKeyRelatedField(queryset=Player.objects.all(), allow_null=True, required=False)
+    serializer_related_field = ShardedPrimaryKeyRelatedField
 
     class Meta:
         model = Goal
-        fields = ['id', 'game', 'scorer', 'assistant', 'minute', 'is_penalty', 'is_own_goal', 'created_at']
+        fields = ['id', 'game', 'scorer', 'assistant', 'team', 'minute', 'is_penalty', 'is_own_goal', 'created_at']
 
 
 class LeagueSerializer(serializers.ModelSerializer):
@@ -32,7 +50,7 @@ class LeagueSerializer(serializers.ModelSerializer):
 
 class SeasonSerializer(serializers.ModelSerializer):
     league = LeagueSerializer(read_only=True)
-    league_id = serializers.PrimaryKeyRelatedField(
+    league_id = ShardedPrimaryKeyRelatedField(
         queryset=League.objects.all(),
         source='league',
         write_only=True
@@ -45,7 +63,7 @@ class SeasonSerializer(serializers.ModelSerializer):
 
 class TeamSerializer(serializers.ModelSerializer):
     league = LeagueSerializer(read_only=True)
-    league_id = serializers.PrimaryKeyRelatedField(
+    league_id = ShardedPrimaryKeyRelatedField(
         queryset=League.objects.all(),
         source='league',
         write_only=True
@@ -60,17 +78,17 @@ class GameSerializer(serializers.ModelSerializer):
     season = SeasonSerializer(read_only=True)
     home_team = TeamSerializer(read_only=True)
     away_team = TeamSerializer(read_only=True)
-    season_id = serializers.PrimaryKeyRelatedField(
+    season_id = ShardedPrimaryKeyRelatedField(
         queryset=Season.objects.all(),
         source='season',
         write_only=True
     )
-    home_team_id = serializers.PrimaryKeyRelatedField(
+    home_team_id = ShardedPrimaryKeyRelatedField(
         queryset=Team.objects.all(),
         source='home_team',
         write_only=True
     )
-    away_team_id = serializers.PrimaryKeyRelatedField(
+    away_team_id = ShardedPrimaryKeyRelatedField(
         queryset=Team.objects.all(),
         source='away_team',
         write_only=True
@@ -103,3 +121,37 @@ class LeagueStandingSerializer(serializers.ModelSerializer):
             'goals_for', 'goals_against', 'goal_difference',
             'points', 'last_updated'
         ]
+
+
+class JobSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = Job
+        fields = [
+            'id', 'kind', 'args', 'priority', 'dedup_key', 'status',
+            'attempts', 'max_attempts', 'run_after',
+            'progress', 'progress_message', 'result', 'error',
+            'created_at', 'started_at', 'finished_at'
+        ]
+        read_only_fields = fields
+
+
+class JobCreateSerializer(serializers.Serializer):
+    kind = serializers.CharField(max_length=50)
+    args = serializers.DictField(required=False, default=dict)
+    priority = serializers.IntegerField(required=False, default=0, min_value=-100, max_value=100)
+    dedup_key = serializers.CharField(required=False, allow_null=True, default=None, max_length=200)
+    max_attempts = serializers.IntegerField(required=False, default=3, min_value=1, max_value=10)
+
+    def validate_kind(self, value):
+        from . import jobs
+        if value not in jobs.TASKS:
+            raise serializers.ValidationError(f'Unknown job kind. Choose from: {", ".join(sorted(jobs.TASKS))}')
+        return value
+
+    def validate(self, attrs):
+        from . import jobs
+        try:
+            jobs.check_args(attrs['kind'], attrs['args'])
+        except ValueError as exc:
+            raise serializers.ValidationError({'args': str(exc)})
+        return attrs
@@ -0,0 +1,425 @@
+"""Per-league database shards.
+
+``LEAGUE_SHARDS`` maps league ids to database aliases. A league and
+everything that belongs to it (seasons, teams, games, goals, squads,
+standings, contracts and its change log) live in that database; leagues not
+listed stay in ``'default'``. Players are shared by every league: they are
+written to ``'default'`` and copied into each shard so the foreign keys of
+goals, appearances and contracts hold there.
+
+``api.routers.LeagueShardRouter`` picks the database of a query from, in
+order: the instance it concerns (or the instances it was built from), the
+league of the current request (set by ``shard_middleware`` from the URL and
+the ``league``/``season``/``team``/``game`` query parameters), and
+``'default'``. Code outside a request selects a league with
+``use_league()``.
+
+``manage.py split_shards`` moves existing leagues into their shards. Each
+shard numbers new rows from its own ``ID_STRIDE`` range so ids stay unique
+across databases; ``locate()`` finds the database of older rows by looking,
+and remembers where it found them (and, for ``LOCATE_MISS_TTL`` seconds,
+that it found nothing).
+
+Global views read every database and merge the results: the keyset list
+pages (``listing.keyset_paginate(..., databases=sharding.databases())``),
+``gather_list()`` for small lists and ``first()`` for "the latest" lookups;
+``api.search`` queries every shard's index. API writes follow the shard of
+the objects they reference (``serializers.ShardedPrimaryKeyRelatedField``).
+HTML forms and the ingest worker still only see ``'default'``.
+"""
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from asgiref.sync import iscoroutinefunction, sync_to_async
+from django.apps import apps
+from django.conf import settings
+from django.core.exceptions import FieldDoesNotExist
+from django.db import connections, transaction
+from django.urls import Resolver404, resolve
+from django.utils.decorators import sync_and_async_middleware
+
+DEFAULT = 'default'
+ID_STRIDE = 10 ** 12
+
+# Models stored with their league, in the order their rows can be copied,
+# with the lookup from each to its league
+LEAGUE_PATHS = {
+    'league': 'pk',
+    'season': 'league_id',
+    'team': 'league_id',
+    'game': 'season__league_id',
+    'goal': 'game__season__league_id',
+    'appearance': 'game__season__league_id',
+    'playercontract': 'team__league_id',
+    'leaguestanding': 'season__league_id',
+    'standingsstate': 'season__league_id',
+    'seasonsyncstate': 'season__league_id',
+    'changelogentry': 'season__league_id',
+    'ingestedevent': 'game__season__league_id',
+}
+SHARDED_MODELS = tuple(LEAGUE_PATHS)
+REPLICATED_MODELS = frozenset({'player'})
+COPY_BATCH_SIZE = 500
+LOCATE_CACHE_SIZE = 65536
+# Seconds a row found in no database is reported missing without looking again
+LOCATE_MISS_TTL = 1.0
+
+
+def shard_map():
+    return getattr(settings, 'LEAGUE_SHARDS', {})
+
+
+def enabled():
+    return bool(shard_map())
+
+
+def aliases():
+    """``'default'`` followed by the shard aliases, in a stable order."""
+    return [DEFAULT, *sorted(set(shard_map().values()) - {DEFAULT})]
+
+
+def databases():
+    """The aliases global views read from, or None when nothing is sharded."""
+    return aliases() if enabled() else None
+
+
+def league_db(league_id):
+    return shard_map().get(int(league_id), DEFAULT)
+
+
+def id_offset(alias):
+    """First id of rows created in ``alias``."""
+    return aliases().index(alias) * ID_STRIDE
+
+
+def is_sharded(model):
+    owner = model._meta.auto_created or model  # M2M tables go with their model
+    return owner._meta.app_label == 'api' and owner._meta.model_name in SHARDED_MODELS
+
+
+_current = ContextVar('league_shard', default=None)
+
+
+@contextmanager
+def use_db(alias):
+    """Route queries without an instance to ``alias`` inside the block."""
+    token = _current.set(alias)
+    try:
+        yield
+    finally:
+        _current.reset(token)
+
+
+def follow(alias):
+    """Route the rest of the current request to ``alias`` unless it already has a shard.
+
+    For requests whose league is only known from their body; ``shard_middleware``
+    undoes it when the request ends.
+    """
+    if _current.get() is None:
+        _current.set(alias)
+
+
+def use_league(league_id):
+    return use_db(league_db(league_id))
+
+
+def current():
+    return _current.get()
+
+
+def instance_db(instance):
+    """The database ``instance`` lives in, judging by it and the objects it was built from."""
+    if instance._state.db:
+        return instance._state.db
+    for field in instance._meta.concrete_fields:
+        if field.is_relation and field.is_cached(instance):
+            related = field.get_cached_value(instance)
+            if related is not None and related._state.db and related._meta.model_name not in REPLICATED_MODELS:
+                return related._state.db
+    if instance._meta.model_name == 'league' and instance.pk is not None:
+        return league_db(instance.pk)
+    league_id = getattr(instance, 'league_id', None)
+    return league_db(league_id) if league_id is not None else None
+
+
+def _find(model, pk):
+    candidates = aliases()
+    guess = candidates[min(pk // ID_STRIDE, len(candidates) - 1)]
+    for alias in [guess, *(alias for alias in candidates if alias != guess)]:
+        if model._base_manager.using(alias).filter(pk=pk).exists():
+            return alias
+    return None
+
+
+class _Locations:
+    """``{(model label, pk): (expires, alias)}`` found by ``locate()``; misses expire after ``LOCATE_MISS_TTL``."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._entries = {}
+
+    def get(self, model, pk):
+        key = (model._meta.label, pk)
+        now = time.monotonic()
+        entry = self._entries.get(key)
+        if entry is not None and (entry[0] is None or entry[0] > now):
+            return entry[1]
+        alias = _find(model, pk)
+        # Rows don't move on their own, but a missing one may be created later
+        expires = None if alias is not None else now + LOCATE_MISS_TTL
+        with self._lock:
+            if len(self._entries) >= LOCATE_CACHE_SIZE:
+                self._entries.clear()
+            self._entries[key] = (expires, alias)
+        return alias
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
+_locations = _Locations()
+
+
+def locate(model, pk):
+    """The database holding ``model`` row ``pk``, or None if there is none."""
+    if not enabled() or not is_sharded(model):
+        return DEFAULT
+    return _locations.get(model, int(pk))
+
+
+def on(queryset, alias):
+    """``queryset`` read from ``alias``; default reads are left to the routers (replica)."""
+    return queryset if alias == DEFAULT else queryset.using(alias)
+
+
+def _expand_ordering(model, ordering, prefix='', descending=False):
+    """``ordering`` with relations replaced by their model's ordering, as the ORM sorts them."""
+    for name in ordering:
+        if not isinstance(name, str) or name == '?':
+            continue
+        flip = name.startswith('-') != descending
+        path = name.lstrip('-')
+        target = model
+        try:
+            for part in path.split('__'):
+                field = target._meta.pk if part == 'pk' else target._meta.get_field(part)
+                target = field.related_model if field.is_relation else None
+        except (AttributeError, FieldDoesNotExist):
+            target = None
+        if target is not None and target._meta.ordering:
+            yield from _expand_ordering(target, target._meta.ordering, f'{prefix}{path}__', flip)
+        else:
+            yield f"{'-' if flip else ''}{prefix}{path}"
+
+
+def _sort_value(row, path):
+    value = row
+    for name in path:
+        value = getattr(value, name, None)
+        if value is None:
+            break
+    if hasattr(value, '_meta'):
+        value = value.pk
+    # NULLs first, as SQLite sorts them ascending
+    return (value is not None, value if value is not None else 0)
+
+
+def _sort(rows, model, ordering):
+    # Ties keep insertion order, as in a single database
+    rows.sort(key=lambda row: row.pk)
+    for name in reversed(list(_expand_ordering(model, ordering))):
+        path = name.lstrip('-').split('__')
+        rows.sort(key=lambda row: _sort_value(row, path), reverse=name.startswith('-'))
+    return rows
+
+
+def gather_list(queryset):
+    """``list(queryset)`` over every database; model instances are merged in the queryset's order."""
+    if not enabled():
+        return list(queryset)
+    rows = []
+    for alias in aliases():
+        with use_db(alias):
+            rows.extend(on(queryset, alias))
+    if not queryset.ordered or not rows or not isinstance(rows[0], queryset.model):
+        return rows
+    ordering = queryset.query.order_by or (queryset.model._meta.ordering if queryset.query.default_ordering else ())
+    return _sort(rows, queryset.model, ordering)
+
+
+def first(queryset, key):
+    """The row of ``queryset.first()`` over every database, choosing by ``key(row)`` (smallest)."""
+    if not enabled():
+        return queryset.first()
+    found = []
+    for alias in aliases():
+        with use_db(alias):
+            row = on(queryset, alias).first()
+        if row is not None:
+            found.append(row)
+    return min(found, key=key, default=None)
+
+
+def replicate(instance, deleted=False):
+    """Copy a player row written to ``'default'`` into every shard."""
+    model = type(instance)
+    for alias in aliases()[1:]:
+        rows = model._base_manager.using(alias).filter(pk=instance.pk)
+        if deleted:
+            # Cascades to the shard's goals and squads, whose signals need the shard
+            with use_db(alias):
+                rows.delete()
+            continue
+        values = {field.attname: getattr(instance, field.attname) for field in model._meta.concrete_fields}
+        if not rows.update(**values):
+            model._base_manager.using(alias).bulk_create([model(**values)])
+
+
+@contextmanager
+def use_instance(instance):
+    """Route queries of the block to the database ``instance`` was read from."""
+    alias = instance._state.db if instance is not None else None
+    if alias is None or not enabled():
+        yield
+    else:
+        with use_db(alias):
+            yield
+
+
+@contextmanager
+def _keeping_timestamps(model):
+    """Keep the copied ``auto_now``/``auto_now_add`` values instead of stamping the copy time."""
+    fields = [
+        (field, field.auto_now, field.auto_now_add) for field in model._meta.concrete_fields
+        if getattr(field, 'auto_now', False) or getattr(field, 'auto_now_add', False)
+    ]
+    for field, _, _ in fields:
+        field.auto_now = field.auto_now_add = False
+    try:
+        yield
+    finally:
+        for field, auto_now, auto_now_add in fields:
+            field.auto_now, field.auto_now_add = auto_now, auto_now_add
+
+
+def _copy(queryset, alias):
+    model = queryset.model
+    batch, copied = [], 0
+    with _keeping_timestamps(model):
+        for row in queryset.order_by('pk').iterator(chunk_size=COPY_BATCH_SIZE):
+            batch.append(row)
+            if len(batch) == COPY_BATCH_SIZE:
+                copied += len(model._base_manager.using(alias).bulk_create(batch))
+                batch = []
+        if batch:
+            copied += len(model._base_manager.using(alias).bulk_create(batch))
+    return copied
+
+
+def copy_players(alias):
+    """Copy the default database's players missing from ``alias``."""
+    model = apps.get_model('api', 'Player')
+    present = set(model._base_manager.using(alias).values_list('pk', flat=True))
+    return _copy(model._base_manager.using(DEFAULT).exclude(pk__in=present), alias)
+
+
+def move_league(league_id, alias):
+    """Move a league's rows from the default database into ``alias``; returns ``{model: rows}``.
+
+    Rows are copied as they are (bulk, without signals) and then deleted
+    from the default database. A league already in ``alias`` (from an
+    interrupted move) is not copied again.
+    """
+    models = [apps.get_model('api', name) for name in SHARDED_MODELS]
+    moved = {}
+    if not models[0]._base_manager.using(alias).filter(pk=league_id).exists():
+        with transaction.atomic(using=alias):
+            for model in models:
+                rows = model._base_manager.using(DEFAULT).filter(**{LEAGUE_PATHS[model._meta.model_name]: league_id})
+                moved[model._meta.model_name] = _copy(rows, alias)
+    with transaction.atomic(using=DEFAULT):
+        for model in reversed(models):
+            rows = model._base_manager.using(DEFAULT).filter(**{LEAGUE_PATHS[model._meta.model_name]: league_id})
+            # Plain DELETEs: a move is not a deletion for the change log, live events or caches
+            rows._raw_delete(DEFAULT)
+    _locations.clear()
+    return moved
+
+
+def reserve_ids(alias):
+    """Number ``alias``'s new rows from ``id_offset(alias)`` (SQLite AUTOINCREMENT sequences)."""
+    offset = id_offset(alias)
+    with connections[alias].cursor() as cursor:
+        for name in SHARDED_MODELS:
+            table = apps.get_model('api', name)._meta.db_table
+            cursor.execute('UPDATE sqlite_sequence SET seq = MAX(seq, %s) WHERE name = %s', [offset, table])
+            if not cursor.rowcount:
+                cursor.execute('INSERT INTO sqlite_sequence (name, seq) VALUES (%s, %s)', [table, offset])
+
+
+# URL names whose ``pk`` (or ``game_id``) identifies the object a request is about
+URL_MODELS = {
+    'league': 'League', 'season': 'Season', 'team': 'Team', 'game': 'Game', 'goal': 'Goal',
+    'standing': 'LeagueStanding', 'contract': 'PlayerContract',
+}
+PARAM_MODELS = (
+    ('league', 'League'), ('season', 'Season'), ('team', 'Team'), ('team1', 'Team'), ('game', 'Game'),
+)
+
+
+def _url_model(url_name):
+    # 'season_detail', 'edit_season', 'season-detail', 'team-fixtures', 'league_standings', ...
+    for part in url_name.replace('-', '_').split('_'):
+        if part in URL_MODELS:
+            return URL_MODELS[part]
+    return None
+
+
+def _alias_of(model_name, pk):
+    if model_name == 'League':
+        return league_db(pk)
+    return locate(apps.get_model('api', model_name), pk)
+
+
+def alias_for_request(request):
+    """The shard a request is about, from its URL and query parameters, or None."""
+    try:
+        match = resolve(request.path_info)
+    except Resolver404:
+        match = None
+    if match is not None and match.url_name:
+        pk = match.kwargs.get('pk', match.kwargs.get('game_id'))
+        model_name = _url_model(match.url_name)
+        if pk is not None and model_name is not None:
+            return _alias_of(model_name, pk)
+    for param, model_name in PARAM_MODELS:
+        value = request.GET.get(param)
+        if value and value.isdigit():
+            return _alias_of(model_name, value)
+    return None
+
+
+@sync_and_async_middleware
+def shard_middleware(get_response):
+    """Route the queries of requests about one league to its shard."""
+
+    if iscoroutinefunction(get_response):
+        async def middleware(request):
+            # Finding the shard may query every database, off the event loop
+            token = _current.set(await sync_to_async(alias_for_request)(request) if enabled() else None)
+            try:
+                return await get_response(request)
+            finally:
+                _current.reset(token)
+    else:
+        def middleware(request):
+            token = _current.set(alias_for_request(request) if enabled() else None)
+            try:
+                return get_response(request)
+            finally:
+                _current.reset(token)
+    return middleware
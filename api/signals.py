@@ -0,0 +1,237 @@
+"""Signal receivers keeping derived data in sync with result writes."""
+import threading
+from collections import defaultdict
+from contextlib import contextmanager
+
+from django.contrib.auth.models import User
+from django.db import router, transaction
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
+
+from . import authentication, events, sharding, sync
+from .models import (
+    League, Season, Team, Player, Game, Goal, PlayerContract, Appearance, LeagueStanding, standings_updated,
+)
+from .versioning import CONTRACTS, bump_data_version, bump_season
+
+
+class DeferredWrites:
+    """Goal recounts and change log entries collected by ``deferred_writes()``."""
+
+    def __init__(self):
+        self.recounts = set()
+        self.changes = []  # (season_id, model, object_id, operation, data)
+
+    @contextmanager
+    def savepoint(self):
+        """A savepoint whose rollback also drops the changes logged inside it."""
+        logged = len(self.changes)
+        try:
+            with transaction.atomic():
+                yield
+        except Exception:
+            del self.changes[logged:]
+            raise
+
+    def recount(self):
+        """Run the pending goal recounts, once per game."""
+        if self.recounts:
+            Game.update_goal_counts(self.recounts)
+            self.recounts.clear()
+
+    def flush(self):
+        self.recount()
+        by_season = defaultdict(list)
+        for season_id, *change in self.changes:
+            by_season[season_id].append(change)
+        for season_id, changes in by_season.items():
+            sync.append(season_id, changes)
+        self.changes.clear()
+
+
+_deferred = threading.local()
+
+
+@contextmanager
+def deferred_writes():
+    """Coalesce the goal recounts and change log appends of many writes.
+
+    Inside the block, goal saves only note their game and change log entries
+    are buffered; both are written when the block exits without an error,
+    recounts once per game and the log with one append per season. Use it
+    inside the caller's transaction, and ``savepoint()`` for writes that may
+    be rolled back on their own.
+    """
+    writes = DeferredWrites()
+    _deferred.writes = writes
+    try:
+        yield writes
+        writes.flush()
+    finally:
+        _deferred.writes = None
+
+
+def _record(season_id, model, object_id, operation, data=None):
+    writes = getattr(_deferred, 'writes', None)
+    if writes is None:
+        sync.record(season_id, model, object_id, operation, data)
+    else:
+        writes.changes.append((season_id, model, object_id, operation, data))
+
+
+@receiver(post_save, sender=Game)
+@receiver(post_delete, sender=Game)
+def game_changed(sender, instance, using, **kwargs):
+    bump_season(instance.season_id, using=using)
+
+
+@receiver(post_save, sender=Goal)
+@receiver(post_delete, sender=Goal)
+def goal_changed(sender, instance, using, **kwargs):
+    bump_season(instance.game.season_id, using=using)
+
+
+@receiver(standings_updated)
+def standings_changed(sender, season, **kwargs):
+    bump_season(season.pk, using=router.db_for_write(LeagueStanding, instance=season))
+
+
+@receiver(post_delete, sender=Team)
+def team_deleted(sender, using, **kwargs):
+    # Its games went with it, in any season
+    bump_data_version(using=using)
+
+
+@receiver(post_save, sender=Goal)
+@receiver(post_delete, sender=Goal)
+def recount_goals(sender, instance, origin=None, **kwargs):
+    # Nothing to recount when the game itself is being deleted
+    if getattr(origin, 'model', type(origin)) not in (Game, Season, League):
+        writes = getattr(_deferred, 'writes', None)
+        if writes is None:
+            Game.update_goal_counts([instance.game_id])
+        else:
+            writes.recounts.add(instance.game_id)
+
+
+@receiver(post_save, sender=PlayerContract)
+@receiver(post_delete, sender=PlayerContract)
+def roster_changed(sender, using, **kwargs):
+    bump_data_version(CONTRACTS, using=using)
+
+
+@receiver(post_save, sender=Appearance)
+@receiver(post_delete, sender=Appearance)
+def squad_changed(sender, instance, using, **kwargs):
+    bump_season(instance.game.season_id, using=using)
+
+
+def _publish_on_commit(channels, event, data):
+    def publish():
+        for channel in channels:
+            events.publish(channel, event, data)
+    transaction.on_commit(publish)
+
+
+@receiver(post_save, sender=Game)
+def publish_score(sender, instance, created, **kwargs):
+    if not instance.score_changed():
+        return
+    instance._loaded_score = (instance.home_score, instance.away_score)
+    data = {
+        'game': instance.pk,
+        'season': instance.season_id,
+        'home_team': instance.home_team_id,
+        'away_team': instance.away_team_id,
+        'home_score': instance.home_score,
+        'away_score': instance.away_score,
+        'played_at': instance.played_at,
+    }
+    _publish_on_commit(
+        [events.game_channel(instance.pk), events.season_channel(instance.season_id)], 'score', data
+    )
+
+
+@receiver(post_save, sender=Goal)
+@receiver(post_delete, sender=Goal)
+def publish_goal(sender, instance, **kwargs):
+    if 'created' not in kwargs:
+        action = 'deleted'
+    else:
+        action = 'created' if kwargs['created'] else 'updated'
+    data = {
+        'action': action,
+        'goal': instance.pk,
+        'game': instance.game_id,
+        'scorer': instance.scorer_id,
+        'assistant': instance.assistant_id,
+        'minute': instance.minute,
+        'is_penalty': instance.is_penalty,
+        'is_own_goal': instance.is_own_goal,
+    }
+    season_id = instance.game.season_id
+    _publish_on_commit([events.game_channel(instance.game_id), events.season_channel(season_id)], 'goal', data)
+
+
+@receiver(standings_updated)
+def publish_standings(sender, season, standings, previous, **kwargs):
+    changes = [
+        {'team': s.team_id, 'position': s.position, 'previous': previous.get(s.team_id)}
+        for s in standings if previous.get(s.team_id) != s.position
+    ]
+    if not changes:
+        return
+    data = {
+        'season': season.pk,
+        'changes': changes,
+        'table': [
+            {'team': s.team_id, 'position': s.position, 'played': s.played, 'points': s.points,
+             'goal_difference': s.goal_difference}
+            for s in standings
+        ],
+    }
+    _publish_on_commit([events.season_channel(season.pk)], 'standings', data)
+
+
+@receiver(post_save, sender=Game)
+def log_game_saved(sender, instance, created, **kwargs):
+    _record(instance.season_id, 'game', instance.pk, 'insert' if created else 'update', sync.game_data(instance))
+
+
+@receiver(post_delete, sender=Game)
+def log_game_deleted(sender, instance, origin=None, **kwargs):
+    if not sync.is_cascade_from_season(origin):
+        _record(instance.season_id, 'game', instance.pk, 'delete')
+
+
+@receiver(post_save, sender=Goal)
+def log_goal_saved(sender, instance, created, **kwargs):
+    _record(instance.game.season_id, 'goal', instance.pk, 'insert' if created else 'update', sync.goal_data(instance))
+
+
+@receiver(post_delete, sender=Goal)
+def log_goal_deleted(sender, instance, origin=None, **kwargs):
+    if not sync.is_cascade_from_season(origin):
+        _record(instance.game.season_id, 'goal', instance.pk, 'delete')
+
+
+@receiver(standings_updated)
+def log_standings(sender, season, standings, **kwargs):
+    sync.record_standings(season, standings)
+
+
+@receiver(post_save, sender=User)
+@receiver(post_delete, sender=User)
+def revoke_user_tokens(sender, instance, created=False, update_fields=None, **kwargs):
+    """Tokens carry a copy of the user's flags, so changing the user revokes them."""
+    if created or (update_fields is not None and set(update_fields) <= {'last_login'}):
+        return
+    authentication.revoke_user_tokens(instance.pk)
+
+
+@receiver(post_save, sender=Player)
+@receiver(post_delete, sender=Player)
+def replicate_player(sender, instance, using, signal, **kwargs):
+    # Players are written to the default database and copied into each shard
+    if sharding.enabled() and using == sharding.DEFAULT:
+        sharding.replicate(instance, deleted=signal is post_delete)
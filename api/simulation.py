@@ -0,0 +1,86 @@
+"""Monte Carlo projection of a season's final table.
+
+Each remaining game (no score yet) is played ``iterations`` times. A team's
+strength is its Laplace-smoothed win rate in the season's played games,
+draws happen at the season's smoothed draw rate, and the rest is split
+between the two sides in proportion to their strengths. Ties on points are
+broken at random.
+"""
+import random
+from collections import Counter
+
+from .models import Game, Team
+
+
+def _team_records(season):
+    teams = list(Team.objects.filter(league=season.league_id).values_list('pk', 'name'))
+    points = {team_id: 0 for team_id, _ in teams}
+    wins = {team_id: 0 for team_id, _ in teams}
+    played = {team_id: 0 for team_id, _ in teams}
+    draws = games_played = 0
+    remaining = []
+    rows = Game.objects.filter(season=season).values_list('home_team_id', 'away_team_id', 'home_score', 'away_score')
+    for home_id, away_id, home_score, away_score in rows:
+        for team_id in (home_id, away_id):
+            points.setdefault(team_id, 0)
+        if home_score is None or away_score is None:
+            remaining.append((home_id, away_id))
+            continue
+        games_played += 1
+        for team_id in (home_id, away_id):
+            played[team_id] = played.get(team_id, 0) + 1
+        if home_score == away_score:
+            draws += 1
+            points[home_id] += 1
+            points[away_id] += 1
+        else:
+            winner = home_id if home_score > away_score else away_id
+            points[winner] += 3
+            wins[winner] = wins.get(winner, 0) + 1
+    strength = {team_id: (wins.get(team_id, 0) + 1) / (played.get(team_id, 0) + 2) for team_id in points}
+    draw_rate = (draws + 1) / (games_played + 3)
+    return dict(teams), points, strength, draw_rate, remaining
+
+
+def simulate_season(season, iterations=1000, seed=None, progress=None):
+    """``{'remaining_games', 'iterations', 'table': [{team, name, points, expected_points, ...}]}``.
+
+    ``progress(done, total)`` is called every few iterations.
+    """
+    names, points, strength, draw_rate, remaining = _team_records(season)
+    iterations = max(1, int(iterations))
+    rng = random.Random(seed)
+    total_points = Counter()
+    positions = {team_id: Counter() for team_id in points}
+    step = max(1, iterations // 100)
+    for iteration in range(iterations):
+        final = dict(points)
+        for home_id, away_id in remaining:
+            roll = rng.random()
+            if roll < draw_rate:
+                final[home_id] += 1
+                final[away_id] += 1
+                continue
+            home_share = strength[home_id] / (strength[home_id] + strength[away_id])
+            winner = home_id if (roll - draw_rate) / (1 - draw_rate) < home_share else away_id
+            final[winner] += 3
+        order = sorted(final, key=lambda team_id: (-final[team_id], rng.random()))
+        for position, team_id in enumerate(order, 1):
+            positions[team_id][position] += 1
+            total_points[team_id] += final[team_id]
+        if progress is not None and (iteration + 1) % step == 0:
+            progress(iteration + 1, iterations)
+
+    table = [
+        {
+            'team': team_id,
+            'name': names.get(team_id, ''),
+            'points': points[team_id],
+            'expected_points': round(total_points[team_id] / iterations, 2),
+            'expected_position': round(sum(p * n for p, n in positions[team_id].items()) / iterations, 2),
+            'title_probability': round(positions[team_id][1] / iterations, 4),
+        }
+        for team_id in points
+    ]
+    table.sort(key=lambda row: (row['expected_position'], -row['expected_points']))
+    return {'remaining_games': len(remaining), 'iterations': iterations, 'table': table}
@@ -0,0 +1,104 @@
+"""SQLite write-throughput profile.
+
+``configure_connection()`` runs for every new SQLite connection and applies ``SQLITE_PROFILE`` merged over ``DEFAULTS``:
+
+- ``journal_mode``: ``wal`` lets readers keep reading while a writer commits;
+- ``synchronous``: ``normal`` only syncs at WAL checkpoints, which in WAL
+  mode cannot corrupt the database (a power cut may lose the last commits);
+- ``mmap_size``, ``cache_size`` (negative: KiB) and ``temp_store``: keep
+  pages and sort space in memory;
+- ``busy_timeout``: how long a writer waits for the lock, in milliseconds.
+
+A pragma set to None is left at SQLite's default.
+
+Write transactions should start with ``BEGIN IMMEDIATE``
+(``'transaction_mode': 'IMMEDIATE'`` in the alias' ``OPTIONS``). A deferred
+transaction that reads and then writes cannot wait for the lock when another
+writer holds it: SQLite fails it at once with "database is locked", whatever
+the busy timeout. ``write_transaction()`` runs a function in a transaction
+and retries it a bounded number of times (``retries``) with jittered
+exponential backoff from ``retry_backoff`` seconds when it still fails on
+the lock.
+"""
+import random
+import re
+import time
+
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, OperationalError, connections, transaction
+from django.db.backends.signals import connection_created
+from django.dispatch import receiver
+
+from . import metrics
+
+DEFAULTS = {
+    'journal_mode': 'wal',
+    'synchronous': 'normal',
+    'mmap_size': 256 * 1024 * 1024,
+    'cache_size': -64 * 1024,
+    'temp_store': 'memory',
+    'busy_timeout': 5000,
+    'retries': 5,
+    'retry_backoff': 0.05,
+}
+PRAGMAS = ('journal_mode', 'synchronous', 'mmap_size', 'cache_size', 'temp_store', 'busy_timeout')
+# Pragma values are interpolated (pragmas take no parameters)
+_VALUE = re.compile(r'^-?\w+$')
+
+LOCK_RETRIES = metrics.Counter(
+    'db_lock_retries_total', 'Write transactions retried after SQLite reported the database locked', ('outcome',)
+)
+
+
+def profile():
+    return {**DEFAULTS, **getattr(settings, 'SQLITE_PROFILE', {})}
+
+
+@receiver(connection_created)
+def configure_connection(sender, connection, **kwargs):
+    """Apply the profile's pragmas to a new connection (no-op for other databases)."""
+    if connection.vendor != 'sqlite':
+        return
+    config = profile()
+    with connection.cursor() as cursor:
+        for pragma in PRAGMAS:
+            value = config[pragma]
+            if value is None:
+                continue
+            if not _VALUE.match(str(value)):
+                raise ValueError(f'SQLITE_PROFILE[{pragma!r}] is not a valid pragma value: {value!r}')
+            cursor.execute(f'PRAGMA {pragma} = {value}')
+
+
+def is_lock_error(exc):
+    message = str(exc).lower()
+    return isinstance(exc, OperationalError) and ('locked' in message or 'busy' in message)
+
+
+def write_transaction(func, *args, using=DEFAULT_DB_ALIAS, **kwargs):
+    """``func(*args, **kwargs)`` in ``transaction.atomic(using)``, retried while the database is locked.
+
+    Inside an outer transaction it only adds a savepoint: a lock error must
+    roll back the outer transaction, which is the one to retry.
+    """
+    connection = connections[using]
+    if connection.in_atomic_block or connection.vendor != 'sqlite':
+        with transaction.atomic(using=using):
+            return func(*args, **kwargs)
+    config = profile()
+    attempt = 0
+    while True:
+        try:
+            with transaction.atomic(using=using):
+                result = func(*args, **kwargs)
+        except OperationalError as exc:
+            if not is_lock_error(exc) or attempt >= config['retries']:
+                if attempt:
+                    LOCK_RETRIES.inc(outcome='failed')
+                raise
+            attempt += 1
+            time.sleep(config['retry_backoff'] * 2 ** (attempt - 1) * random.uniform(0.5, 1.5))
+        else:
+            if attempt:
+                LOCK_RETRIES.inc(outcome='succeeded')
+            return result
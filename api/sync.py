@@ -0,0 +1,206 @@
+"""Per-season change log behind the delta-sync API (``GET /api/sync/``).
+
+Every insert, update or delete of a season's games, goals and standings rows
+is appended to ``ChangeLogEntry`` under the next season version. Clients ask
+for the entries after the last version they saw, so the work and payload are
+proportional to what changed.
+
+``compact`` keeps the log small: entries up to a horizon are collapsed to the
+latest entry per object (so every client still converges), and tombstones of
+deleted rows before the horizon are dropped. Clients that last synced before
+the oldest dropped tombstone get a full snapshot instead.
+"""
+from django.db import transaction
+from django.db.models import F, Max
+
+from .models import (
+    League, Season, Game, Goal, LeagueStanding, SeasonSyncState, ChangeLogEntry,
+)
+
+DEFAULT_LIMIT = 1000
+MAX_LIMIT = 5000
+
+STANDING_FIELDS = (
+    'team_id', 'position', 'played', 'won', 'drawn', 'lost', 'goals_for', 'goals_against',
+    'goal_difference', 'points', 'home_wins', 'home_draws', 'home_losses',
+    'away_wins', 'away_draws', 'away_losses', 'clean_sheets', 'failed_to_score',
+)
+
+
+def game_data(game):
+    return {
+        'id': game.pk,
+        'season': game.season_id,
+        'home_team': game.home_team_id,
+        'away_team': game.away_team_id,
+        'home_score': game.home_score,
+        'away_score': game.away_score,
+        'played_at': game.played_at.isoformat() if game.played_at else None,
+    }
+
+
+def goal_data(goal):
+    return {
+        'id': goal.pk,
+        'game': goal.game_id,
+        'scorer': goal.scorer_id,
+        'assistant': goal.assistant_id,
+        'team': goal.team_id,
+        'minute': goal.minute,
+        'is_penalty': goal.is_penalty,
+        'is_own_goal': goal.is_own_goal,
+    }
+
+
+def standing_data(standing):
+    data = {field: getattr(standing, field) for field in STANDING_FIELDS}
+    data['team'] = data.pop('team_id')
+    return data
+
+
+def is_cascade_from_season(origin):
+    """True when a delete was started on a Season or League (the log goes with it)."""
+    model = getattr(origin, 'model', type(origin))
+    return model in (Season, League)
+
+
+def _reserve_versions(season_id, count):
+    """Atomically claim ``count`` versions for a season; return the first one."""
+    SeasonSyncState.objects.get_or_create(season_id=season_id)
+    SeasonSyncState.objects.filter(season_id=season_id).update(version=F('version') + count)
+    version = SeasonSyncState.objects.filter(season_id=season_id).values_list('version', flat=True).get()
+    return version - count + 1
+
+
+def record(season_id, model, object_id, operation, data=None):
+    """Append one change to the season's log."""
+    record_many(season_id, model, [(object_id, operation, data)])
+
+
+def record_many(season_id, model, changes):
+    """Append ``(object_id, operation, data)`` changes under consecutive versions."""
+    append(season_id, [(model, object_id, operation, data) for object_id, operation, data in changes])
+
+
+def append(season_id, changes):
+    """Append ``(model, object_id, operation, data)`` changes of any models under consecutive versions."""
+    changes = list(changes)
+    if not changes:
+        return
+    with transaction.atomic():
+        first = _reserve_versions(season_id, len(changes))
+        ChangeLogEntry.objects.bulk_create([
+            ChangeLogEntry(
+                season_id=season_id, version=first + i, model=model,
+                object_id=object_id, operation=operation, data=data,
+            )
+            for i, (model, object_id, operation, data) in enumerate(changes)
+        ])
+
+
+def record_standings(season, standings):
+    """Log the rows of a rebuilt table that differ from their last logged state."""
+    latest = {}
+    entries = ChangeLogEntry.objects.filter(season=season, model='standing').order_by('version')
+    for team_id, operation, data in entries.values_list('object_id', 'operation', 'data'):
+        latest[team_id] = data if operation != 'delete' else None
+
+    changes = []
+    for standing in standings:
+        data = standing_data(standing)
+        if latest.get(standing.team_id) != data:
+            operation = 'update' if latest.get(standing.team_id) is not None else 'insert'
+            changes.append((standing.team_id, operation, data))
+    current = {standing.team_id for standing in standings}
+    changes.extend(
+        (team_id, 'delete', None) for team_id, data in latest.items() if data is not None and team_id not in current
+    )
+    record_many(season.pk, 'standing', changes)
+
+
+def snapshot(season):
+    """Current games, goals and standings of a season, in change-log data format."""
+    games = Game.objects.filter(season=season).order_by('id').values_list(
+        'id', 'home_team_id', 'away_team_id', 'home_score', 'away_score', 'played_at'
+    )
+    goals = Goal.objects.filter(game__season=season).order_by('id').values_list(
+        'id', 'game_id', 'scorer_id', 'assistant_id', 'team_id', 'minute', 'is_penalty', 'is_own_goal'
+    )
+    goal_keys = ('id', 'game', 'scorer', 'assistant', 'team', 'minute', 'is_penalty', 'is_own_goal')
+    return {
+        'games': [
+            {
+                'id': pk,
+                'season': season.pk,
+                'home_team': home_team_id,
+                'away_team': away_team_id,
+                'home_score': home_score,
+                'away_score': away_score,
+                'played_at': played_at.isoformat() if played_at else None,
+            }
+            for pk, home_team_id, away_team_id, home_score, away_score, played_at in games
+        ],
+        'goals': [dict(zip(goal_keys, row)) for row in goals],
+        'standings': [standing_data(s) for s in LeagueStanding.objects.filter(season=season)],
+    }
+
+
+def changes_since(season, since, limit=DEFAULT_LIMIT):
+    """Build the sync response for a client that last saw version ``since``."""
+    with transaction.atomic():
+        state = SeasonSyncState.objects.filter(season=season).first()
+        version = state.version if state else 0
+        min_version = state.min_version if state else 0
+
+        if since is None or since < min_version or since > version:
+            return {
+                'season': season.pk,
+                'version': version,
+                'reset': True,
+                'snapshot': snapshot(season),
+                'changes': [],
+                'has_more': False,
+            }
+
+        entries = list(
+            ChangeLogEntry.objects.filter(season=season, version__gt=since)
+            .order_by('version')
+            .values_list('version', 'model', 'object_id', 'operation', 'data')[:limit + 1]
+        )
+    has_more = len(entries) > limit
+    entries = entries[:limit]
+    return {
+        'season': season.pk,
+        'version': entries[-1][0] if has_more else version,
+        'reset': False,
+        'changes': [
+            {'version': v, 'type': model, 'id': object_id, 'op': operation, 'data': data}
+            for v, model, object_id, operation, data in entries
+        ],
+        'has_more': has_more,
+    }
+
+
+def compact(season, horizon):
+    """Collapse log entries up to ``horizon`` to the latest one per object.
+
+    Returns the number of entries removed.
+    """
+    with transaction.atomic():
+        entries = ChangeLogEntry.objects.filter(season=season, version__lte=horizon)
+        keep = (
+            entries.order_by().values('model', 'object_id')
+            .annotate(latest=Max('version'))
+            .values_list('latest', flat=True)
+        )
+        removed, _ = entries.exclude(version__in=list(keep)).delete()
+
+        tombstones = entries.filter(operation='delete')
+        newest_tombstone = tombstones.aggregate(v=Max('version'))['v']
+        if newest_tombstone is not None:
+            removed += tombstones.delete()[0]
+            # Clients older than a dropped tombstone would never learn of the delete.
+            SeasonSyncState.objects.filter(season=season, min_version__lt=newest_tombstone).update(
+                min_version=newest_tombstone
+            )
+    return removed
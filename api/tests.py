@@ -0,0 +1,1201 @@
+import asyncio
+import json
+import os
+import shutil
+import tempfile
+import threading
+import time
+from datetime import date, datetime, timedelta
+from concurrent.futures import Executor, Future
+from io import StringIO
+from unittest import mock
+
+from asgiref.sync import async_to_sync
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.core.management import CommandError, call_command
+from django.db import OperationalError, connection
+from django.http import HttpResponse
+from django.test import RequestFactory, SimpleTestCase, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework.renderers import JSONRenderer
+from rest_framework_simplejwt.tokens import AccessToken
+
+from . import (
+    analytics, authentication, derived, events, jobs, leaderboards, metrics, predictions, replica, rosters, search,
+    sharding, sqlite, sync, throttling, versioning,
+)
+from .fastpath import (
+    GameValuesSerializer, GoalValuesSerializer, LeagueStandingValuesSerializer, PlayerValuesSerializer,
+    render_json,
+)
+from .forms import GoalForm, PlayerContractForm
+from .models import (
+    Appearance, ChangeLogEntry, Game, Goal, IngestedEvent, Job, League, LeagueStanding, Player, PlayerContract, Season,
+    SeasonSyncState, StandingsState, Team, TokenRevocation,
+)
+from .serializers import GameSerializer, GoalSerializer, LeagueStandingSerializer, PlayerSerializer
+
+
+class ListViewQueryCountTests(TestCase):
+    """The HTML list pages run the same number of queries whatever the page size."""
+
+    @classmethod
+    def setUpTestData(cls):
+        kickoff = timezone.make_aware(datetime(2024, 8, 3, 15))
+        for league_number in range(4):
+            league = League.objects.create(name=f'League {league_number}', country='England')
+            teams = [
+                Team.objects.create(name=f'Team {league_number}-{number}', league=league, short_name=f'T{number}')
+                for number in range(4)
+            ]
+            for year in (2023, 2024):
+                season = Season.objects.create(
+                    league=league, name=f'{year}-{year + 1}',
+                    start_date=date(year, 8, 1), end_date=date(year + 1, 5, 31),
+                )
+                for number, (home, away) in enumerate(zip(teams, teams[1:] + teams[:1])):
+                    Game.objects.create(
+                        season=season, home_team=home, away_team=away,
+                        played_at=kickoff + timedelta(days=7 * number), home_score=1, away_score=0,
+                    )
+            for team in teams:
+                for number in range(2):
+                    player = Player.objects.create(
+                        name=f'Player {team.name} {number}', position='MF',
+                        nationality='England', birth_date=date(1998, 1, 1),
+                    )
+                    PlayerContract.objects.create(
+                        player=player, team=team, number=number + 1,
+                        start_date=date(2020, 1, 1), end_date=date(2099, 1, 1),
+                    )
+
+    def assertConstantQueries(self, url_name, queries, rows):
+        for page_size in (3, 20):
+            with self.subTest(page_size=page_size), self.assertNumQueries(queries):
+                response = self.client.get(reverse(url_name), {'page_size': page_size})
+                self.assertEqual(response.status_code, 200)
+                self.assertEqual(len(response.context['page']), min(page_size, rows))
+
+    def test_leagues(self):
+        self.assertConstantQueries('list_leagues', 1, rows=4)
+
+    def test_seasons(self):
+        self.assertConstantQueries('list_seasons', 2, rows=8)
+
+    def test_teams(self):
+        self.assertConstantQueries('list_teams', 2, rows=16)
+
+    def test_games(self):
+        self.assertConstantQueries('list_games', 4, rows=32)
+
+    def test_players(self):
+        self.assertConstantQueries('list_players', 3, rows=32)
+
+    def test_hot_queries_use_an_index(self):
+        out = StringIO()
+        call_command('check_query_plans', stdout=out)
+        self.assertIn('ok   game list by -played_at', out.getvalue())
+        self.assertIn('All hot queries use an index.', out.getvalue())
+
+    def test_pages_are_read_in_index_order(self):
+        sorts = {
+            'list_leagues': ['name', 'created'],
+            'list_seasons': ['name', 'start'],
+            'list_teams': ['name', 'founded'],
+            'list_games': ['date', 'id'],
+            'list_players': ['name', 'birth_date'],
+        }
+        season = Season.objects.first()
+        for url_name, names in sorts.items():
+            for sort in names + [f'-{name}' for name in names]:
+                for params in ({}, {'season': season.pk}) if url_name == 'list_games' else ({},):
+                    with self.subTest(url_name, sort=sort, **params):
+                        with CaptureQueriesContext(connection) as queries:
+                            self.client.get(reverse(url_name), {'sort': sort, **params})
+                        # The page itself is the only query with a LIMIT
+                        [sql] = [query['sql'] for query in queries if ' LIMIT ' in query['sql']]
+                        with connection.cursor() as cursor:
+                            cursor.execute(f'EXPLAIN QUERY PLAN {sql}')
+                            plan = [row[-1] for row in cursor.fetchall()]
+                        # Without a sort step, reading stops after the page's rows
+                        self.assertNotIn('USE TEMP B-TREE FOR ORDER BY', plan)
+
+
+class PlayerContractFormTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        league = League.objects.create(name='League', country='England')
+        cls.team = Team.objects.create(name='Team', league=league, short_name='TEA')
+        cls.player = Player.objects.create(
+            name='Player', position='MF', nationality='England', birth_date=date(1998, 1, 1),
+        )
+        cls.contract = PlayerContract.objects.create(
+            player=cls.player, team=cls.team, number=8, start_date=date(2024, 1, 1), end_date=date(2024, 12, 31),
+        )
+
+    def form(self, start, end, instance=None):
+        return PlayerContractForm({
+            'player': self.player.pk, 'team': self.team.pk, 'number': 8, 'start_date': start, 'end_date': end,
+        }, instance=instance)
+
+    def test_rejects_overlapping_contract(self):
+        self.assertFalse(self.form('2024-12-31', '2025-06-30').is_valid())
+
+    def test_accepts_adjacent_contract_and_editing_itself(self):
+        self.assertTrue(self.form('2025-01-01', '2025-06-30').is_valid())
+        self.assertTrue(self.form('2024-02-01', '2024-11-30', instance=self.contract).is_valid())
+
+
+class TokenRevocationTests(TestCase):
+    def setUp(self):
+        authentication.forget_revocations()
+        self.addCleanup(authentication.forget_revocations)
+        self.user = User.objects.create_user('coach', password='secret')
+        response = self.client.post(
+            reverse('token_obtain_pair'), {'username': 'coach', 'password': 'secret'}, content_type='application/json',
+        )
+        self.access = response.json()['access']
+        self.auth = {'HTTP_AUTHORIZATION': f'Bearer {self.access}'}
+
+    def test_deactivating_revokes_tokens_durably(self):
+        self.assertEqual(self.client.get(reverse('user_me'), **self.auth).status_code, 200)
+        self.user.is_active = False
+        with self.captureOnCommitCallbacks(execute=True):
+            self.user.save()
+        # Revocations must not depend on what the cache still holds
+        cache.clear()
+        self.assertEqual(self.client.get(reverse('user_me'), **self.auth).status_code, 401)
+
+    def test_checks_read_the_snapshot_until_a_revocation_commits(self):
+        token = AccessToken(self.access)
+        self.assertFalse(authentication.is_revoked(token))
+        with self.assertNumQueries(0):
+            self.assertFalse(authentication.is_revoked(token))
+
+        with self.captureOnCommitCallbacks() as callbacks:
+            authentication.revoke_token(token)
+            self.assertFalse(authentication.is_revoked(token))
+        for callback in callbacks:
+            callback()
+        self.assertTrue(authentication.is_revoked(token))
+
+    def test_revocations_of_other_processes_are_seen_through_the_cache(self):
+        token = AccessToken(self.access)
+        self.assertFalse(authentication.is_revoked(token))
+        # Another worker revokes the token; its commit bumps the shared counter
+        TokenRevocation.objects.create(
+            key=f'jti:{token["jti"]}', expires_at=timezone.now() + timedelta(minutes=5),
+        )
+        self.assertFalse(authentication.is_revoked(token))
+        cache.incr(authentication.REVOCATIONS_CHANGED_KEY)
+        self.assertTrue(authentication.is_revoked(token))
+
+    def test_database_user_rejects_inactive_users(self):
+        self.user.is_active = False
+        self.assertIsNone(authentication.database_user(self.user))
+
+
+class JobEndpointTests(TestCase):
+    def setUp(self):
+        self.staff = User.objects.create_user('staff', password='secret', is_staff=True)
+        self.other = User.objects.create_user('other', password='secret')
+
+    def test_export_directory_is_not_a_job_argument(self):
+        self.client.force_login(self.staff)
+        response = self.client.post(
+            reverse('job-list'), {'kind': 'export_static', 'args': {'output': '/tmp'}}, content_type='application/json',
+        )
+        self.assertEqual(response.status_code, 400)
+
+    def test_jobs_are_visible_to_staff_and_their_creator_only(self):
+        job, _ = jobs.enqueue('rebuild_standings', created_by=self.staff.pk)
+        self.client.force_login(self.other)
+        self.assertEqual(self.client.get(reverse('job-detail', args=[job.pk])).status_code, 404)
+        self.client.force_login(self.staff)
+        self.assertEqual(self.client.get(reverse('job-detail', args=[job.pk])).status_code, 200)
+
+
+class FastPathTests(TestCase):
+    """The values() serializers render exactly the bytes of their DRF serializers."""
+
+    @classmethod
+    def setUpTestData(cls):
+        league = League.objects.create(name='Liga \u2028 Ñ', country='España')
+        season = Season.objects.create(
+            league=league, name='2024-2025', start_date=date(2024, 8, 1), end_date=date(2025, 5, 31),
+        )
+        home = Team.objects.create(name='Home', league=league, short_name='HOM', founded_year=1900)
+        away = Team.objects.create(name='Away', league=league)
+        scorer = Player.objects.create(name='Scorer', position='FW', nationality='Spain', birth_date=date(1999, 2, 3))
+        Player.objects.create(name='Keeper', position='GK', nationality='Spain', birth_date=date(1990, 1, 1), height=190)
+        game = Game.objects.create(
+            season=season, home_team=home, away_team=away, home_score=2, away_score=1,
+            played_at=timezone.make_aware(datetime(2024, 8, 10, 15, 30, 0, 123456)),
+        )
+        Game.objects.create(season=season, home_team=away, away_team=home)
+        Goal.objects.create(game=game, scorer=scorer, minute=12, is_penalty=True)
+        LeagueStanding.update_standings(season)
+
+    def assertSameBytes(self, fast_serializer, serializer, queryset):
+        expected = JSONRenderer().render(serializer(queryset, many=True).data)
+        self.assertEqual(render_json(fast_serializer().serialize(queryset)), expected)
+
+    def test_serializers_match(self):
+        self.assertSameBytes(GameValuesSerializer, GameSerializer, Game.objects.all())
+        self.assertSameBytes(LeagueStandingValuesSerializer, LeagueStandingSerializer, LeagueStanding.objects.all())
+        self.assertSameBytes(PlayerValuesSerializer, PlayerSerializer, Player.objects.order_by('name'))
+        self.assertSameBytes(GoalValuesSerializer, GoalSerializer, Goal.objects.all())
+
+    def test_list_action_matches_serializer(self):
+        response = self.client.get(reverse('game-list'), HTTP_ACCEPT='application/json')
+        self.assertEqual(response.content, JSONRenderer().render(GameSerializer(Game.objects.all(), many=True).data))
+
+
+class DataVersionTests(TestCase):
+    """A result write invalidates the caches of its season, its league and all leagues only."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.seasons, cls.games, cls.players = [], [], []
+        for number in range(2):
+            league = League.objects.create(name=f'League {number}', country='England')
+            season = Season.objects.create(
+                league=league, name='2024-2025', start_date=date(2024, 8, 1), end_date=date(2025, 5, 31),
+            )
+            home = Team.objects.create(name='Home', league=league, short_name='HOM')
+            away = Team.objects.create(name='Away', league=league, short_name='AWA')
+            player = Player.objects.create(
+                name=f'Player {number}', position='FW', nationality='England', birth_date=date(1998, 1, 1),
+            )
+            PlayerContract.objects.create(
+                player=player, team=home, number=9, start_date=date(2024, 1, 1), end_date=date(2025, 12, 31),
+            )
+            cls.seasons.append(season)
+            cls.games.append(Game.objects.create(
+                season=season, home_team=home, away_team=away, home_score=1, away_score=0,
+                played_at=timezone.make_aware(datetime(2024, 9, 1, 15)),
+            ))
+            cls.players.append(player)
+
+    def setUp(self):
+        cache.clear()
+        versioning.forget_versions()
+
+    def test_goal_invalidates_only_its_season_and_league(self):
+        changed, other = self.seasons
+        for season in self.seasons:
+            leaderboards.get_tallies(season=season)
+            leaderboards.get_tallies(league=season.league)
+        with self.captureOnCommitCallbacks(execute=True):
+            Goal.objects.create(game=self.games[0], scorer=self.players[0], minute=10)
+
+        with self.assertNumQueries(0):
+            leaderboards.get_tallies(season=other)
+            leaderboards.get_tallies(league=other.league)
+        self.assertEqual(leaderboards.get_tallies(season=changed)['goals'], {self.players[0].pk: 1})
+        self.assertEqual(leaderboards.get_tallies(league=changed.league)['goals'], {self.players[0].pk: 1})
+
+    def test_global_bump_invalidates_every_scope(self):
+        scope = versioning.season_scope(self.seasons[1].pk)
+        version = versioning.get_data_version(scope)
+        with self.captureOnCommitCallbacks(execute=True):
+            versioning.bump_data_version()
+        self.assertNotEqual(versioning.get_data_version(scope), version)
+
+    def test_bump_waits_for_commit(self):
+        scope = versioning.season_scope(self.seasons[0].pk)
+        version = versioning.get_data_version(scope)
+        with self.captureOnCommitCallbacks() as callbacks:
+            self.games[0].home_score = 2
+            self.games[0].save()
+            self.assertEqual(versioning.get_data_version(scope), version)
+        for callback in callbacks:
+            callback()
+        self.assertNotEqual(versioning.get_data_version(scope), version)
+
+
+class LiveEventTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        league = League.objects.create(name='League', country='England')
+        cls.season = Season.objects.create(
+            league=league, name='2024-2025', start_date=date(2024, 8, 1), end_date=date(2025, 5, 31),
+        )
+        home = Team.objects.create(name='Home', league=league, short_name='HOM')
+        away = Team.objects.create(name='Away', league=league, short_name='AWA')
+        cls.game = Game.objects.create(season=cls.season, home_team=home, away_team=away)
+
+    def setUp(self):
+        # Subscriptions belong to an event loop; it only runs while the tests wait for events
+        self.loop = asyncio.new_event_loop()
+        self.addCleanup(self.loop.close)
+
+    def subscribe(self, channel, last_event_id=None):
+        async def subscribe():
+            return events.broker.subscribe(channel, last_event_id=last_event_id)
+        subscription = self.loop.run_until_complete(subscribe())
+        self.addCleanup(subscription.close)
+        return subscription
+
+    def next_event(self, subscription):
+        return self.loop.run_until_complete(asyncio.wait_for(subscription.queue.get(), 1)).decode()
+
+    def test_score_change_is_published_on_commit(self):
+        subscription = self.subscribe(events.season_channel(self.season.pk))
+        with self.captureOnCommitCallbacks(execute=True):
+            self.game.home_score, self.game.away_score = 1, 0
+            self.game.save()
+            self.assertTrue(subscription.queue.empty())
+        event = self.next_event(subscription)
+        self.assertIn('event: score', event)
+        self.assertIn('"home_score":1,"away_score":0', event)
+
+    def test_reconnecting_client_gets_missed_events(self):
+        channel = 'season:replay-test'
+        first = events.publish(channel, 'score', {'n': 1})
+        events.publish(channel, 'score', {'n': 2})
+        subscription = self.subscribe(channel, last_event_id=first)
+        self.assertIn('data: {"n":2}', self.next_event(subscription))
+        self.assertTrue(subscription.queue.empty())
+
+
+class DeltaSyncTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        league = League.objects.create(name='League', country='England')
+        cls.season = Season.objects.create(
+            league=league, name='2024-2025', start_date=date(2024, 8, 1), end_date=date(2025, 5, 31),
+        )
+        cls.home = Team.objects.create(name='Home', league=league, short_name='HOM')
+        cls.away = Team.objects.create(name='Away', league=league, short_name='AWA')
+        cls.scorer = Player.objects.create(
+            name='Scorer', position='FW', nationality='England', birth_date=date(1998, 1, 1),
+        )
+        cls.game = Game.objects.create(season=cls.season, home_team=cls.home, away_team=cls.away)
+
+    def sync(self, since=None):
+        params = {'season': self.season.pk}
+        if since is not None:
+            params['since'] = since
+        response = self.client.get(reverse('sync_changes'), params)
+        self.assertEqual(response.status_code, 200)
+        return response.json()
+
+    def test_client_gets_only_changes_after_its_version(self):
+        first = self.sync()
+        self.assertTrue(first['reset'])
+        self.assertEqual([game['id'] for game in first['snapshot']['games']], [self.game.pk])
+
+        self.game.home_score, self.game.away_score = 2, 1
+        self.game.save()
+        delta = self.sync(first['version'])
+        self.assertFalse(delta['reset'])
+        games = [change for change in delta['changes'] if change['type'] == 'game']
+        self.assertEqual([(change['id'], change['op']) for change in games], [(self.game.pk, 'update')])
+        self.assertEqual(games[0]['data']['home_score'], 2)
+        self.assertGreater(delta['version'], first['version'])
+
+        self.assertEqual(self.sync(delta['version'])['changes'], [])
+
+    def test_compaction_keeps_latest_state_and_resets_clients_behind_a_dropped_delete(self):
+        for score in range(3):
+            self.game.home_score, self.game.away_score = score, 0
+            self.game.save()
+        goal = Goal.objects.create(game=self.game, scorer=self.scorer, team=self.home, minute=10)
+        goal.delete()
+        state = SeasonSyncState.objects.get(season=self.season)
+
+        self.assertGreater(sync.compact(self.season, state.version), 0)
+        entries = ChangeLogEntry.objects.filter(season=self.season)
+        self.assertEqual(entries.filter(model='game').count(), 1)
+        self.assertFalse(entries.filter(model='goal').exists())
+        self.assertEqual(entries.get(model='game').data['home_score'], 2)
+
+        # A client that may have seen the goal would never learn of its delete
+        self.assertTrue(self.sync(0)['reset'])
+        self.assertFalse(self.sync(state.version)['reset'])
+
+
+class SearchTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.league = League.objects.create(name='Premier League', country='England')
+        cls.team = Team.objects.create(name='Arsenal', league=cls.league, short_name='ARS')
+        cls.player = Player.objects.create(
+            name='Bukayo Saka', position='FW', nationality='England', birth_date=date(2001, 9, 5),
+        )
+
+    def hits(self, text, kinds=None):
+        return [(hit['type'], hit['id']) for hit in search.search(text, kinds)]
+
+    def test_every_term_matches_as_a_prefix(self):
+        self.assertEqual(self.hits('buk sak'), [('player', self.player.pk)])
+        self.assertEqual(self.hits('buk arsen'), [])
+        self.assertEqual(self.hits('arsen'), [('team', self.team.pk)])
+        self.assertEqual(len(self.hits('engl')), 2)
+        self.assertEqual(self.hits('engl', ['player']), [('player', self.player.pk)])
+
+        response = self.client.get(reverse('search_api'), {'q': 'saka'})
+        self.assertEqual(response.json()['results'][0]['url'], reverse('player_detail', args=[self.player.pk]))
+
+    def test_index_follows_updates_and_deletes(self):
+        self.player.name = 'Gabriel Martinelli'
+        self.player.save()
+        self.assertEqual(self.hits('saka'), [])
+        self.assertEqual(self.hits('martin'), [('player', self.player.pk)])
+
+        # Queryset updates bypass signals; the triggers still see them
+        Team.objects.filter(pk=self.team.pk).update(name='Gunners')
+        self.assertEqual(self.hits('arsenal'), [])
+        self.assertEqual(self.hits('gunn'), [('team', self.team.pk)])
+
+        self.player.delete()
+        self.assertEqual(self.hits('martin'), [])
+
+
+class LookupTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        league = League.objects.create(name='League', country='England')
+        season = Season.objects.create(
+            league=league, name='2024-2025', start_date=date(2024, 8, 1), end_date=date(2025, 5, 31),
+        )
+        home = Team.objects.create(name='Home', league=league, short_name='HOM')
+        away = Team.objects.create(name='Away', league=league, short_name='AWA')
+        other = Team.objects.create(name='Other', league=league, short_name='OTH')
+        cls.game = Game.objects.create(
+            season=season, home_team=home, away_team=away, played_at=timezone.make_aware(datetime(2024, 9, 1, 15)),
+        )
+        cls.players = {}
+        for name, team in (('Home Striker', home), ('Away Keeper', away), ('Other Striker', other)):
+            cls.players[name] = Player.objects.create(
+                name=name, position='FW', nationality='England', birth_date=date(1998, 1, 1),
+            )
+            PlayerContract.objects.create(
+                player=cls.players[name], team=team, number=9, start_date=date(2024, 7, 1), end_date=date(2025, 6, 30),
+            )
+
+    def setUp(self):
+        # Roster timelines cached by earlier tests may belong to reused team ids
+        cache.clear()
+        versioning.forget_versions()
+
+    def lookup(self, kind, **params):
+        response = self.client.get(reverse('lookup', args=[kind]), params)
+        self.assertEqual(response.status_code, 200)
+        return [choice['text'] for choice in response.json()['results']]
+
+    def test_players_are_scoped_to_the_game(self):
+        self.assertEqual(self.lookup('player', game=self.game.pk), ['Away Keeper', 'Home Striker'])
+        self.assertEqual(self.lookup('player', game=self.game.pk, q='strik'), ['Home Striker'])
+        self.assertEqual(self.lookup('player', q='strik'), ['Home Striker', 'Other Striker'])
+        self.assertEqual(self.client.get(reverse('lookup', args=['nope'])).status_code, 404)
+
+    def test_goal_form_checks_scorer_against_the_game(self):
+        def form(scorer):
+            return GoalForm({'game': self.game.pk, 'scorer': self.players[scorer].pk, 'minute': 10})
+
+        self.assertTrue(form('Home Striker').is_valid())
+        self.assertFalse(form('Other Striker').is_valid())
+
+    def test_form_renders_only_the_selected_choice(self):
+        html = self.client.get(reverse('add_goal'), {'game': self.game.pk}).content.decode()
+        self.assertIn(f'<option value="{self.game.pk}" selected>', html)
+        self.assertNotIn('Striker</option>', html)
+
+
+class RosterCacheTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        league = League.objects.create(name='League', country='England')
+        season = Season.objects.create(
+            league=league, name='2024-2025', start_date=date(2024, 8, 1), end_date=date(2025, 5, 31),
+        )
+        cls.home = Team.objects.create(name='Home', league=league, short_name='HOM')
+        away = Team.objects.create(name='Away', league=league, short_name='AWA')
+        cls.game = Game.objects.create(season=season, home_team=cls.home, away_team=away)
+        cls.player = Player.objects.create(
+            name='Player', position='FW', nationality='England', birth_date=date(1998, 1, 1),
+        )
+
+    def setUp(self):
+        cache.clear()
+        versioning.forget_versions()
+
+    def squad(self):
+        return [contract.player_id for contract in rosters.squad_at(self.home.pk, date(2024, 9, 1))]
+
+    def test_only_contract_writes_invalidate_timelines(self):
+        self.assertEqual(self.squad(), [])
+        with self.captureOnCommitCallbacks(execute=True):
+            self.game.home_score, self.game.away_score = 1, 0
+            self.game.save()
+            Goal.objects.create(game=self.game, scorer=self.player, minute=5)
+        with self.assertNumQueries(0):
+            self.assertEqual(self.squad(), [])
+
+        with self.captureOnCommitCallbacks(execute=True):
+            PlayerContract.objects.create(
+                player=self.player, team=self.home, number=9, start_date=date(2024, 7, 1), end_date=date(2025, 6, 30),
+            )
+        self.assertEqual(self.squad(), [self.player.pk])
+
+
+class AppearanceTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        league = League.objects.create(name='League', country='England')
+        cls.season = Season.objects.create(
+            league=league, name='2024-2025', start_date=date(2024, 8, 1), end_date=date(2025, 5, 31),
+        )
+        home = Team.objects.create(name='Home', league=league, short_name='HOM')
+        away = Team.objects.create(name='Away', league=league, short_name='AWA')
+        cls.player = Player.objects.create(
+            name='Player', position='FW', nationality='England', birth_date=date(1998, 1, 1),
+        )
+        for number, (started, minutes) in enumerate([(True, 90), (False, 30), (True, 60)]):
+            game = Game.objects.create(
+                season=cls.season, home_team=home, away_team=away, home_score=1, away_score=0,
+                played_at=timezone.make_aware(datetime(2024, 9, 1 + number, 15)),
+            )
+            Appearance.objects.create(
+                game=game, player=cls.player, team=home, side='home', started=started, minutes=minutes,
+            )
+        Goal.objects.create(game=game, scorer=cls.player, minute=10)
+        Goal.objects.create(game=game, scorer=cls.player, minute=50)
+
+    def setUp(self):
+        cache.clear()
+        versioning.forget_versions()
+
+    def test_season_stats_come_from_the_ledger(self):
+        with self.assertNumQueries(3):
+            stats = self.player.get_season_stats(self.season)
+        self.assertEqual(stats, {
+            'games_played': 3, 'starts': 2, 'minutes': 180, 'goals': 2, 'assists': 0,
+            'goals_per_90': 1.0, 'assists_per_90': 0.0,
+        })
+
+    def test_minutes_boards(self):
+        tallies = leaderboards.get_tallies(season=self.season)
+        self.assertEqual(tallies['appearances'], {self.player.pk: 3})
+        self.assertEqual(tallies['minutes'], {self.player.pk: 180})
+        boards = leaderboards.leaderboards(tallies, ['minutes', 'goals_per_90'])
+        self.assertEqual(boards['goals_per_90'][0]['value'], 1.0)
+
+
+class GoalTeamTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        league = League.objects.create(name='League', country='England')
+        season = Season.objects.create(
+            league=league, name='2024-2025', start_date=date(2024, 8, 1), end_date=date(2025, 5, 31),
+        )
+        cls.home = Team.objects.create(name='Home', league=league, short_name='HOM')
+        cls.away = Team.objects.create(name='Away', league=league, short_name='AWA')
+        cls.game = Game.objects.create(
+            season=season, home_team=cls.home, away_team=cls.away, home_score=2, away_score=1,
+            played_at=timezone.make_aware(datetime(2024, 9, 1, 15)),
+        )
+        cls.players = {
+            name: Player.objects.create(name=name, position='FW', nationality='England', birth_date=date(1998, 1, 1))
+            for name in ('named', 'contracted', 'stranger')
+        }
+        Appearance.objects.create(game=cls.game, player=cls.players['named'], team=cls.home, side='home')
+        PlayerContract.objects.create(
+            player=cls.players['contracted'], team=cls.away, number=9,
+            start_date=date(2024, 7, 1), end_date=date(2025, 6, 30),
+        )
+
+    def goal(self, scorer, **fields):
+        return Goal.objects.create(game=self.game, scorer=self.players[scorer], minute=10, **fields)
+
+    def test_team_comes_from_squad_or_contract(self):
+        self.assertEqual(self.goal('named').team, self.home)
+        self.assertEqual(self.goal('contracted').team, self.away)
+        self.assertEqual(self.goal('contracted', is_own_goal=True).team, self.home)
+        self.assertIsNone(self.goal('stranger').team)
+
+    def test_counts_follow_goal_writes(self):
+        goals = [self.goal('named'), self.goal('named'), self.goal('contracted')]
+        self.game.refresh_from_db()
+        self.assertEqual((self.game.home_goal_count, self.game.away_goal_count), (2, 1))
+        self.assertTrue(self.game.goal_counts_match_score())
+
+        goals[0].delete()
+        self.game.refresh_from_db()
+        self.assertEqual((self.game.home_goal_count, self.game.away_goal_count), (1, 1))
+
+    def test_reconcile_reports_and_fixes_stale_counts(self):
+        self.goal('named')
+        self.goal('stranger')
+        Game.objects.filter(pk=self.game.pk).update(home_goal_count=5)
+
+        out = StringIO()
+        call_command('reconcile_goal_counts', stdout=out)
+        self.assertIn('1 games have stale goal counts', out.getvalue())
+        self.assertIn('1 goals could not be credited', out.getvalue())
+        self.game.refresh_from_db()
+        self.assertEqual(self.game.home_goal_count, 5)
+
+        call_command('reconcile_goal_counts', '--fix', stdout=StringIO())
+        self.game.refresh_from_db()
+        self.assertEqual((self.game.home_goal_count, self.game.away_goal_count), (1, 0))
+
+
+class IngestTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        league = League.objects.create(name='League', country='England')
+        season = Season.objects.create(
+            league=league, name='2024-2025', start_date=date(2024, 8, 1), end_date=date(2025, 5, 31),
+        )
+        home = Team.objects.create(name='Home', league=league, short_name='HOM')
+        away = Team.objects.create(name='Away', league=league, short_name='AWA')
+        cls.game = Game.objects.create(
+            season=season, home_team=home, away_team=away, played_at=timezone.make_aware(datetime(2024, 9, 1, 15)),
+        )
+        cls.scorer = Player.objects.create(
+            name='Scorer', position='FW', nationality='England', birth_date=date(1998, 1, 1),
+        )
+        Appearance.objects.create(game=cls.game, player=cls.scorer, team=home, side='home')
+
+    def ingest(self, events):
+        with tempfile.NamedTemporaryFile('w', suffix='.jsonl') as feed:
+            feed.writelines(json.dumps(event) + '\n' for event in events)
+            feed.flush()
+            out, err = StringIO(), StringIO()
+            call_command('ingest_events', file=feed.name, flush_interval=0.05, stdout=out, stderr=err)
+        return out.getvalue(), err.getvalue()
+
+    def test_replayed_and_duplicated_events_are_skipped(self):
+        events = [
+            {'id': 'k1', 'type': 'kickoff', 'game': self.game.pk},
+            {'id': 'g1', 'type': 'goal', 'game': self.game.pk, 'scorer': self.scorer.pk, 'minute': 12},
+            {'id': 'g1', 'type': 'goal', 'game': self.game.pk, 'scorer': self.scorer.pk, 'minute': 12},
+            {'id': 'bad', 'type': 'goal', 'game': self.game.pk, 'scorer': 999999, 'minute': 20},
+        ]
+        out, err = self.ingest(events)
+        self.assertIn('2 applied, 1 duplicate, 1 rejected', out)
+        self.assertIn('rejected event bad: unknown player 999999', err)
+        self.game.refresh_from_db()
+        self.assertEqual((self.game.home_score, self.game.away_score), (1, 0))
+
+        # A restarted worker replaying the feed applies nothing twice
+        out, _ = self.ingest(events)
+        self.assertIn('0 applied, 4 duplicate, 0 rejected', out)
+        self.assertEqual(Goal.objects.filter(game=self.game).count(), 1)
+        self.assertEqual(IngestedEvent.objects.filter(error='').count(), 2)
+
+
+class GoalTimingTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        league = League.objects.create(name='League', country='England')
+        cls.season = Season.objects.create(
+            league=league, name='2024-2025', start_date=date(2024, 8, 1), end_date=date(2025, 5, 31),
+        )
+        cls.home = Team.objects.create(name='Home', league=league, short_name='HOM')
+        cls.away = Team.objects.create(name='Away', league=league, short_name='AWA')
+        home_player, away_player = (
+            Player.objects.create(name=name, position='FW', nationality='England', birth_date=date(1998, 1, 1))
+            for name in ('Home Player', 'Away Player')
+        )
+        # A comeback win for Home, then an Away win from an own goal
+        for number, (score, goals) in enumerate([
+            ((2, 1), [(away_player, 10, {}), (home_player, 50, {'is_penalty': True}), (home_player, 95, {})]),
+            ((0, 1), [(home_player, 30, {'is_own_goal': True})]),
+        ]):
+            game = Game.objects.create(
+                season=cls.season, home_team=cls.home, away_team=cls.away, home_score=score[0], away_score=score[1],
+                played_at=timezone.make_aware(datetime(2024, 9, 1 + number, 15)),
+            )
+            Appearance.objects.create(game=game, player=home_player, team=cls.home, side='home')
+            Appearance.objects.create(game=game, player=away_player, team=cls.away, side='away')
+            for scorer, minute, flags in goals:
+                Goal.objects.create(game=game, scorer=scorer, minute=minute, **flags)
+
+    def test_buckets_first_goals_and_comebacks(self):
+        data = analytics.build_goal_timing(self.season)
+        home, away = data['teams']
+        self.assertEqual(home['scored'], [0, 0, 0, 1, 0, 1])
+        self.assertEqual(home['conceded'], [1, 1, 0, 0, 0, 0])
+        self.assertEqual(home['conceded_first'], {'games': 2, 'won': 1, 'drawn': 0, 'lost': 1, 'win_rate': 0.5})
+        self.assertEqual(home['scored_first']['games'], 0)
+        self.assertEqual((home['comebacks'], home['leads_lost']), (1, 0))
+        self.assertEqual((away['comebacks'], away['leads_lost']), (0, 1))
+        self.assertEqual(home['penalty_share'], 0.5)
+        self.assertEqual(away['own_goal_share'], 0.5)
+        self.assertEqual((data['totals']['games'], data['totals']['goals']), (2, 4))
+
+    def test_endpoint_filters_by_team(self):
+        response = self.client.get(
+            reverse('stats-goal-timing'), {'season': self.season.pk, 'team': self.away.pk},
+        )
+        self.assertEqual([row['team'] for row in response.json()['teams']], [self.away.pk])
+
+
+class MetricsTests(TestCase):
+    def sample(self, text, prefix):
+        return next((float(line.rsplit(' ', 1)[1]) for line in text.splitlines() if line.startswith(prefix)), 0)
+
+    def test_requests_are_counted_and_rendered(self):
+        requests = 'http_requests_total{view="sync_changes",method="GET",status="400"}'
+        queries = 'db_queries_per_request_count{view="sync_changes"}'
+        before = self.client.get(reverse('metrics')).content.decode()
+        self.client.get(reverse('sync_changes'))
+        response = self.client.get(reverse('metrics'))
+        self.assertEqual(response['Content-Type'], metrics.CONTENT_TYPE)
+        after = response.content.decode()
+        self.assertEqual(self.sample(after, requests), self.sample(before, requests) + 1)
+        self.assertEqual(self.sample(after, queries), self.sample(before, queries) + 1)
+        self.assertIn('http_request_duration_seconds_bucket{view="sync_changes",method="GET",le="+Inf"}', after)
+
+    def test_processes_are_summed_and_stale_gauges_dropped(self):
+        def values(merged, name):
+            return {tuple(labels): value for labels, value in merged[name]['samples']}
+
+        labels = ('sync_changes', 'GET', '200')
+        with tempfile.TemporaryDirectory() as directory, override_settings(METRICS_DIR=directory):
+            own = metrics.collect()
+            path = os.path.join(directory, 'other.json')
+            with open(path, 'w') as f:
+                json.dump({
+                    'http_requests_total': {**metrics.REQUESTS.describe(), 'samples': [[list(labels), 5]]},
+                    'sse_subscribers': {**metrics.SSE_SUBSCRIBERS.describe(), 'samples': [[[], 7]]},
+                }, f)
+
+            merged = metrics.collect()
+            self.assertEqual(
+                values(merged, 'http_requests_total')[labels], values(own, 'http_requests_total').get(labels, 0) + 5,
+            )
+            self.assertEqual(values(merged, 'sse_subscribers')[()], values(own, 'sse_subscribers').get((), 0) + 7)
+
+            # A process that stopped writing: its counters still count, its gauges don't
+            os.utime(path, (0, 0))
+            merged = metrics.collect()
+            self.assertEqual(values(merged, 'sse_subscribers').get((), 0), values(own, 'sse_subscribers').get((), 0))
+            self.assertEqual(
+                values(merged, 'http_requests_total')[labels], values(own, 'http_requests_total').get(labels, 0) + 5,
+            )
+
+
+@override_settings(API_THROTTLE={'anon': (5, 0.1), 'costs': {'predict_season': 2}})
+class ThrottleTests(TestCase):
+    def setUp(self):
+        throttling._local.clear()
+        cache.clear()
+
+    def assertThrottledOnThirdRequest(self):
+        for _ in range(2):
+            self.assertNotEqual(self.client.get(reverse('predict_season')).status_code, 429)
+        response = self.client.get(reverse('predict_season'))
+        self.assertEqual(response.status_code, 429)
+        # One token missing, refilled at 0.1 per second
+        self.assertIn(int(response['Retry-After']), (9, 10))
+
+    def test_bucket_refuses_with_retry_after(self):
+        self.assertThrottledOnThirdRequest()
+
+    def test_shared_buckets(self):
+        with override_settings(API_THROTTLE={'anon': (5, 0.1), 'costs': {'predict_season': 2}, 'cache': 'default'}):
+            self.assertThrottledOnThirdRequest()
+            self.assertEqual(throttling._local._buckets, {})
+
+
+class SingleFlightTests(TestCase):
+    def setUp(self):
+        versioning.forget_versions()
+        # Read the version here, so the threads below find it in this process's copy
+        versioning.get_data_version()
+        self.responses = predictions.ResponseCache('single-flight-test')
+
+    def test_concurrent_misses_build_once(self):
+        started, release = threading.Event(), threading.Event()
+        calls, results = [], []
+
+        def build():
+            calls.append(1)
+            started.set()
+            release.wait(5)
+            return {'winner': 1}
+
+        def request():
+            results.append(self.responses.get_or_build(['match', 1, 2], build))
+
+        threads = [threading.Thread(target=request) for _ in range(5)]
+        threads[0].start()
+        started.wait(5)
+        for thread in threads[1:]:
+            thread.start()
+        release.set()
+        for thread in threads:
+            thread.join(5)
+        self.assertEqual(len(calls), 1)
+        self.assertEqual(results, [{'winner': 1}] * 5)
+
+    def test_failed_builds_are_not_cached(self):
+        def fail():
+            raise ValueError('no data')
+
+        with self.assertRaises(ValueError):
+            self.responses.get_or_build(['season', 1], fail)
+        self.assertEqual(self.responses.get_or_build(['season', 1], lambda: {'team': 3}), {'team': 3})
+
+    def test_a_data_version_bump_rebuilds(self):
+        builds = iter([{'winner': 1}, {'winner': 2}])
+        self.assertEqual(self.responses.get_or_build(['match', 1, 2], lambda: next(builds)), {'winner': 1})
+        self.assertEqual(self.responses.get_or_build(['match', 1, 2], lambda: next(builds)), {'winner': 1})
+        with self.captureOnCommitCallbacks(execute=True):
+            versioning.bump_data_version()
+        self.assertEqual(self.responses.get_or_build(['match', 1, 2], lambda: next(builds)), {'winner': 2})
+
+
+class ExportTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        league = League.objects.create(name='League', country='England')
+        season = Season.objects.create(
+            league=league, name='2023-2024', start_date=date(2023, 8, 1), end_date=date(2024, 5, 31), is_active=False,
+        )
+        home = Team.objects.create(name='Home', league=league, short_name='HOM')
+        away = Team.objects.create(name='Away', league=league, short_name='AWA')
+        Game.objects.create(
+            season=season, home_team=home, away_team=away, home_score=1, away_score=0,
+            played_at=timezone.make_aware(datetime(2023, 9, 1, 15)),
+        )
+        LeagueStanding.update_standings(season)
+
+    def setUp(self):
+        self.output = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.output)
+
+    def export(self, **options):
+        out = StringIO()
+        call_command('export_static', output=self.output, stdout=out, **options)
+        return out.getvalue()
+
+    def snapshot(self):
+        files = {}
+        for root, _, names in os.walk(self.output):
+            for name in names:
+                stat = os.stat(os.path.join(root, name))
+                files[os.path.join(root, name)] = (stat.st_ino, stat.st_mtime_ns)
+        return files
+
+    def test_unchanged_reexport_writes_nothing(self):
+        self.assertIn('files written, 0 unchanged', self.export())
+        before = self.snapshot()
+        self.assertIn('manifest.json', {os.path.basename(path) for path in before})
+
+        out = self.export()
+        self.assertNotIn('rendered', out)
+        self.assertIn('0 files written, 0 unchanged, 0 removed', out)
+        self.assertEqual(self.snapshot(), before)
+
+        # --full renders every page again but still finds nothing to write
+        out = self.export(full=True)
+        self.assertIn('rendered season:', out)
+        self.assertIn('0 files written', out)
+        self.assertEqual(self.snapshot(), before)
+
+
+class ReplicaPinTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        replica.forget_pins()
+        self.started = time.time() - 1
+        for name, value in (('enabled', lambda: True), ('synced_at', lambda: self.started)):
+            patcher = mock.patch.object(replica, name, value)
+            patcher.start()
+            self.addCleanup(patcher.stop)
+        self.request = RequestFactory().get('/api/games/', HTTP_AUTHORIZATION='Bearer token')
+
+    def test_pins_are_read_once_per_copy(self):
+        with self.assertNumQueries(1):
+            self.assertTrue(replica._use_replica(self.request))
+        with self.assertNumQueries(0):
+            self.assertTrue(replica._use_replica(self.request))
+            self.assertTrue(replica._use_replica(RequestFactory().get('/api/games/')))
+
+    def test_a_write_pins_the_token_until_the_next_copy(self):
+        replica._pin(self.request, HttpResponse())
+        self.assertFalse(replica._use_replica(self.request))
+        self.assertTrue(replica._use_replica(RequestFactory().get('/api/games/', HTTP_AUTHORIZATION='Bearer other')))
+
+        self.started = time.time() + 1
+        self.assertTrue(replica._use_replica(self.request))
+
+
+@override_settings(LEAGUE_SHARDS={1: 'default'})
+class ShardRoutingTests(TestCase):
+    """With shards configured (here all mapped to ``default``), requests and ids are located by looking."""
+
+    @classmethod
+    def setUpTestData(cls):
+        league = League.objects.create(name='League', country='England')
+        cls.season = Season.objects.create(
+            league=league, name='2024-2025', start_date=date(2024, 8, 1), end_date=date(2025, 5, 31),
+        )
+
+    def setUp(self):
+        sharding._locations.clear()
+        self.addCleanup(sharding._locations.clear)
+
+    def test_found_rows_are_remembered(self):
+        with self.assertNumQueries(1):
+            self.assertEqual(sharding.locate(Season, self.season.pk), 'default')
+        with self.assertNumQueries(0):
+            self.assertEqual(sharding.locate(Season, self.season.pk), 'default')
+
+    def test_misses_expire_without_dropping_other_rows(self):
+        sharding.locate(Season, self.season.pk)
+        missing = self.season.pk + 1
+        with self.assertNumQueries(1):
+            self.assertIsNone(sharding.locate(Season, missing))
+        with self.assertNumQueries(0):
+            self.assertIsNone(sharding.locate(Season, missing))
+            self.assertEqual(sharding.locate(Season, self.season.pk), 'default')
+
+        Season.objects.create(
+            pk=missing, league=self.season.league, name='2025-2026',
+            start_date=date(2025, 8, 1), end_date=date(2026, 5, 31),
+        )
+        self.assertIsNone(sharding.locate(Season, missing))
+        later = time.monotonic() + sharding.LOCATE_MISS_TTL + 1
+        with mock.patch.object(sharding.time, 'monotonic', return_value=later):
+            self.assertEqual(sharding.locate(Season, missing), 'default')
+
+    def test_async_requests_find_their_shard_off_the_event_loop(self):
+        seen = []
+
+        async def view(request):
+            seen.append(sharding.current())
+            return HttpResponse()
+
+        middleware = sharding.shard_middleware(view)
+        request = RequestFactory().get(reverse('season_detail', args=[self.season.pk]))
+        # Looking the season up on the event loop would raise SynchronousOnlyOperation
+        self.assertEqual(async_to_sync(middleware)(request).status_code, 200)
+        self.assertEqual(seen, ['default'])
+        self.assertIsNone(sharding.current())
+
+
+class SQLiteProfileTests(SimpleTestCase):
+    databases = {'default'}
+
+    def pragma(self, name):
+        with connection.cursor() as cursor:
+            cursor.execute(f'PRAGMA {name}')
+            return cursor.fetchone()[0]
+
+    def test_connections_get_the_profile(self):
+        connection.ensure_connection()
+        self.assertEqual(self.pragma('synchronous'), 1)  # normal
+        self.assertEqual(self.pragma('temp_store'), 2)  # memory
+        self.assertEqual(self.pragma('cache_size'), -64 * 1024)
+        self.assertEqual(self.pragma('busy_timeout'), 5000)
+        self.assertEqual(connection.settings_dict['OPTIONS'].get('transaction_mode'), 'IMMEDIATE')
+
+    @override_settings(SQLITE_PROFILE={'busy_timeout': 250, 'cache_size': None})
+    def test_settings_override_the_defaults(self):
+        before = self.pragma('cache_size')
+        sqlite.configure_connection(None, connection)
+        self.assertEqual(self.pragma('busy_timeout'), 250)
+        self.assertEqual(self.pragma('cache_size'), before)
+        self.addCleanup(sqlite.configure_connection, None, connection)
+
+    @override_settings(SQLITE_PROFILE={'journal_mode': 'wal; DROP TABLE api_league'})
+    def test_invalid_values_are_refused(self):
+        with self.assertRaises(ValueError):
+            sqlite.configure_connection(None, connection)
+
+    @override_settings(SQLITE_PROFILE={'retries': 2, 'retry_backoff': 0})
+    def test_locked_writes_are_retried(self):
+        attempts = []
+
+        def write():
+            attempts.append(1)
+            if len(attempts) < 3:
+                raise OperationalError('database is locked')
+            return 'done'
+
+        self.assertEqual(sqlite.write_transaction(write), 'done')
+        self.assertEqual(len(attempts), 3)
+
+    @override_settings(SQLITE_PROFILE={'retries': 2, 'retry_backoff': 0})
+    def test_retries_are_bounded(self):
+        attempts = []
+
+        def write():
+            attempts.append(1)
+            raise OperationalError('database is locked')
+
+        with self.assertRaises(OperationalError):
+            sqlite.write_transaction(write)
+        self.assertEqual(len(attempts), 3)
+
+
+class StandingsStateTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        league = League.objects.create(name='League', country='England')
+        cls.season = Season.objects.create(
+            league=league, name='2024-2025', start_date=date(2024, 8, 1), end_date=date(2025, 5, 31),
+        )
+        home = Team.objects.create(name='Home', league=league)
+        away = Team.objects.create(name='Away', league=league)
+        Game.objects.create(season=cls.season, home_team=home, away_team=away, home_score=2, away_score=0)
+
+    def test_superseded_rebuilds_are_skipped(self):
+        # Two changes took their tickets; the recompute of the later one also covers the earlier
+        first, second = StandingsState.request(self.season), StandingsState.request(self.season)
+        patcher = mock.patch.object(LeagueStanding, '_rebuild_standings', wraps=LeagueStanding._rebuild_standings)
+        with patcher as rebuild:
+            self.assertTrue(LeagueStanding._recompute_for(self.season, second))
+            self.assertFalse(LeagueStanding._recompute_for(self.season, first))
+        self.assertEqual(rebuild.call_count, 1)
+        state = StandingsState.objects.get(season=self.season)
+        self.assertEqual((state.requested, state.computed), (2, 2))
+        points = LeagueStanding.objects.filter(season=self.season).values_list('points', flat=True)
+        self.assertEqual(list(points), [3, 0])
+
+        # A later change is recomputed again
+        self.assertTrue(LeagueStanding.update_standings(self.season))
+        state.refresh_from_db()
+        self.assertEqual((state.requested, state.computed), (3, 3))
+
+
+class QueuedStandingsTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        league = League.objects.create(name='League', country='England')
+        cls.season = Season.objects.create(
+            league=league, name='2024-2025', start_date=date(2024, 8, 1), end_date=date(2025, 5, 31),
+        )
+        home = Team.objects.create(name='Home', league=league)
+        away = Team.objects.create(name='Away', league=league)
+        cls.game = Game.objects.create(season=cls.season, home_team=home, away_team=away, home_score=1, away_score=0)
+        scorer = Player.objects.create(name='Scorer', position='FW', nationality='England', birth_date=date(1998, 1, 1))
+        cls.goal = Goal.objects.create(game=cls.game, scorer=scorer, minute=10)
+
+    def state(self):
+        state = StandingsState.objects.get(season=self.season)
+        return state.requested, state.computed
+
+    def test_result_edits_queue_one_job_per_season(self):
+        self.client.get(reverse('delete_goal', args=[self.goal.pk]))
+        self.client.get(reverse('delete_game', args=[self.game.pk]))
+        job = Job.objects.get()
+        self.assertEqual(job.kind, 'rebuild_standings')
+        self.assertEqual(job.args, {'season_ids': [self.season.pk]})
+        self.assertEqual(job.dedup_key, f'standings:{self.season.pk}')
+        self.assertFalse(LeagueStanding.objects.filter(season=self.season).exists())
+        self.assertEqual(self.state(), (2, 0))
+
+        jobs.TASKS['rebuild_standings'](lambda *args: None, **job.args)
+        self.assertEqual(LeagueStanding.objects.filter(season=self.season).count(), 2)
+        self.assertEqual(self.state(), (3, 3))
+
+    def test_running_jobs_cover_changes_that_joined_them(self):
+        real = LeagueStanding.update_standings
+        calls = []
+
+        def update_standings(season):
+            calls.append(season.pk)
+            result = real(season)
+            if len(calls) == 1:
+                # A change commits after the recompute read the results and joins this running job
+                jobs.queue_standings(season)
+            return result
+
+        with mock.patch.object(LeagueStanding, 'update_standings', side_effect=update_standings):
+            jobs.TASKS['rebuild_standings'](lambda *args: None, season_ids=[self.season.pk])
+        self.assertEqual(calls, [self.season.pk, self.season.pk])
+        requested, computed = self.state()
+        self.assertEqual(requested, computed)
+
+    def test_api_action_returns_the_job(self):
+        response = self.client.post(reverse('season-update-standings', args=[self.season.pk]))
+        self.assertEqual(response.status_code, 202)
+        self.assertEqual(response.json()['id'], Job.objects.get(dedup_key=f'standings:{self.season.pk}').pk)
+
+
+class InlineExecutor(Executor):
+    """Runs submitted calls at once, in the test's thread and database connection."""
+
+    def __init__(self, *args, **kwargs):
+        pass
+
+    def submit(self, fn, *args, **kwargs):
+        future = Future()
+        try:
+            future.set_result(fn(*args, **kwargs))
+        except Exception as exc:
+            future.set_exception(exc)
+        return future
+
+
+@mock.patch('api.management.commands.rebuild_derived.ProcessPoolExecutor', InlineExecutor)
+class RebuildDerivedTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        league = League.objects.create(name='League', country='England')
+        cls.home = Team.objects.create(name='Home', league=league)
+        cls.away = Team.objects.create(name='Away', league=league)
+        scorer = Player.objects.create(name='Scorer', position='FW', nationality='England', birth_date=date(1998, 1, 1))
+        cls.seasons, cls.goals = [], []
+        for year in (2023, 2024):
+            season = Season.objects.create(
+                league=league, name=f'{year}-{year + 1}', start_date=date(year, 8, 1), end_date=date(year + 1, 5, 31),
+            )
+            game = Game.objects.create(season=season, home_team=cls.home, away_team=cls.away)
+            Appearance.objects.create(game=game, player=scorer, team=cls.home, side='home')
+            goal = Goal.objects.create(game=game, scorer=scorer, minute=10)
+            # Credited to the wrong side, with counts that agree with it
+            Goal.objects.filter(pk=goal.pk).update(team=cls.away)
+            Game.objects.filter(pk=game.pk).update(home_goal_count=0, away_goal_count=1)
+            cls.seasons.append(season)
+            cls.goals.append(goal)
+
+    def setUp(self):
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory)
+        self.checkpoint = os.path.join(directory, 'checkpoint.json')
+
+    def rebuild(self, *args):
+        out = StringIO()
+        call_command(
+            'rebuild_derived', '--steps', 'goal_teams,goal_counts', '--checkpoint', self.checkpoint, *args, stdout=out,
+        )
+        return out.getvalue()
+
+    def test_dry_run_reports_the_counts_the_goal_team_fix_changes(self):
+        report = derived.rebuild_season(self.seasons[0], ('goal_teams', 'goal_counts'), dry_run=True)
+        self.assertEqual(len(report['goal_teams']), 1)
+        self.assertEqual(report['goal_counts'], [f'game {self.goals[0].game_id}: goals 0-1 -> 1-0'])
+        self.assertEqual(Goal.objects.get(pk=self.goals[0].pk).team, self.away)
+
+        out = self.rebuild('--dry-run')
+        self.assertIn('Mismatches (nothing written): goal_teams 2, goal_counts 2', out)
+        self.assertFalse(os.path.exists(self.checkpoint))
+
+    def test_resume_skips_finished_seasons(self):
+        with open(self.checkpoint, 'w') as f:
+            json.dump({'steps': ['goal_teams', 'goal_counts'], 'done': [self.seasons[0].pk]}, f)
+        out = self.rebuild('--resume')
+        self.assertIn('for 1 seasons (1 already done)', out)
+        self.assertIn('Rebuilt 1 seasons; rows changed: goal_teams 1, goal_counts 1', out)
+        self.assertFalse(os.path.exists(self.checkpoint))
+        teams = dict(Goal.objects.values_list('pk', 'team_id'))
+        self.assertEqual(teams, {self.goals[0].pk: self.away.pk, self.goals[1].pk: self.home.pk})
+        self.assertEqual(Game.objects.get(season=self.seasons[1]).home_goal_count, 1)
+
+    def test_resume_refuses_a_checkpoint_of_other_steps(self):
+        with open(self.checkpoint, 'w') as f:
+            json.dump({'steps': ['standings'], 'done': []}, f)
+        with self.assertRaisesMessage(CommandError, 'The checkpoint was written for steps standings.'):
+            self.rebuild('--resume')
@@ -0,0 +1,131 @@
+"""Token-bucket throttling for the expensive prediction and stats endpoints.
+
+Every client (the authenticated user, or an anonymous client's address) has
+one bucket holding up to ``capacity`` tokens and refilling at ``rate`` tokens
+per second. A request takes its endpoint's cost (``API_THROTTLE['costs']``,
+keyed by throttle scope) from the bucket, and is refused with 429 and a
+``Retry-After`` header when the bucket holds less than that.
+
+Buckets are kept in a dict per worker process, so a check is a lock and a
+little arithmetic. Set ``API_THROTTLE['cache']`` to a cache alias to keep
+them in that backend instead, shared by the processes using it, at the cost
+of a cache read and write per check; updates are not atomic, so concurrent
+requests of one client may both pass.
+"""
+import math
+import threading
+import time
+
+from django.conf import settings
+from django.core.cache import caches
+from rest_framework.throttling import BaseThrottle
+
+from . import metrics
+
+DEFAULTS = {
+    'user': (60, 1.0),  # capacity, tokens per second
+    'anon': (20, 0.2),
+    'costs': {'predict_match': 5, 'predict_season': 1, 'stats': 2},
+    'cache': None,
+}
+MAX_BUCKETS = 10000
+
+THROTTLED = metrics.Counter('throttled_requests_total', 'Requests refused by the token-bucket throttle', ('scope',))
+
+
+def _config():
+    return {**DEFAULTS, **getattr(settings, 'API_THROTTLE', {})}
+
+
+def _refill(bucket, now, capacity, rate):
+    if bucket is None:
+        return capacity
+    tokens, last = bucket
+    return min(capacity, tokens + (now - last) * rate)
+
+
+class _LocalBuckets:
+    """``{key: (tokens, updated, full_at)}`` for this process."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._buckets = {}
+
+    def take(self, key, cost, capacity, rate):
+        now = time.monotonic()
+        with self._lock:
+            bucket = self._buckets.get(key)
+            tokens = _refill(bucket and bucket[:2], now, capacity, rate)
+            allowed = tokens >= cost
+            if allowed:
+                tokens -= cost
+            if bucket is None and len(self._buckets) >= MAX_BUCKETS:
+                self._prune(now)
+            self._buckets[key] = (tokens, now, now + (capacity - tokens) / rate)
+        return allowed, tokens
+
+    def _prune(self, now):
+        # A bucket that has refilled is the same as no bucket
+        self._buckets = {key: bucket for key, bucket in self._buckets.items() if bucket[2] > now}
+
+    def clear(self):
+        with self._lock:
+            self._buckets.clear()
+
+
+_local = _LocalBuckets()
+
+
+def _take_shared(cache, key, cost, capacity, rate):
+    now = time.time()
+    key = f'api:throttle:{key}'
+    tokens = _refill(cache.get(key), now, capacity, rate)
+    allowed = tokens >= cost
+    if allowed:
+        tokens -= cost
+    cache.set(key, (tokens, now), math.ceil((capacity - tokens) / rate) + 1)
+    return allowed, tokens
+
+
+class TokenBucketThrottle(BaseThrottle):
+    """Charge ``API_THROTTLE['costs'][scope]`` tokens per request to the client's bucket."""
+    scope = None
+
+    def allow_request(self, request, view):
+        config = _config()
+        cost = config['costs'].get(self.scope, 1)
+        if cost <= 0:
+            return True
+        user = request.user
+        if user and user.is_authenticated:
+            kind, ident = 'user', user.pk
+        else:
+            kind, ident = 'anon', self.get_ident(request)
+        capacity, rate = config[kind]
+        # A cost above the capacity could never be paid
+        cost = min(cost, capacity)
+
+        key = f'{kind}:{ident}'
+        if config['cache']:
+            allowed, tokens = _take_shared(caches[config['cache']], key, cost, capacity, rate)
+        else:
+            allowed, tokens = _local.take(key, cost, capacity, rate)
+        self._wait = None if allowed else (cost - tokens) / rate
+        if not allowed:
+            THROTTLED.inc(scope=self.scope)
+        return allowed
+
+    def wait(self):
+        return self._wait
+
+
+class MatchPredictionThrottle(TokenBucketThrottle):
+    scope = 'predict_match'
+
+
+class SeasonPredictionThrottle(TokenBucketThrottle):
+    scope = 'predict_season'
+
+
+class StatsThrottle(TokenBucketThrottle):
+    scope = 'stats'
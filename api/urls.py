@@ -7,9 +7,10 @@ from .views import (
     # viewsets
     LeagueViewSet, SeasonViewSet, TeamViewSet,
     GameViewSet, LeagueStandingViewSet, PlayerViewSet,
-    GoalViewSet, UserViewSet, StatsViewSet,
+    GoalViewSet, UserViewSet, StatsViewSet, JobViewSet,
     # function-based API endpoints / pages
-    predict_winner, predict_season,
+    predict_winner, predict_season, sync_changes, search_api, search_page, lookup_choices,
+    metrics_endpoint,
     index, dashboard,
     add_league, add_season, add_team, add_game,
     edit_league, edit_season, edit_team, edit_game,
@@ -18,9 +19,13 @@ from .views import (
     list_players, add_player, player_detail, edit_player, delete_player,
     add_contract, edit_contract, delete_contract,
     add_goal, edit_goal, delete_goal,
-    league_detail, season_detail, team_detail, game_detail,
+    season_detail, team_detail, game_detail,
 )
 from .views import CustomTokenObtainPairView
+from .authentication import (
+    RevocationCheckingTokenRefreshSerializer, RevocationCheckingTokenVerifySerializer,
+)
+from . import async_views
 
 # API router for viewsets
 router = DefaultRouter()
@@ -33,18 +38,30 @@ router.register('players', PlayerViewSet, basename='player')
 router.register('goals', GoalViewSet, basename='goal')
 router.register('users', UserViewSet, basename='user')
 router.register('stats', StatsViewSet, basename='stats')
+router.register('jobs', JobViewSet, basename='job')
 
 urlpatterns = [
     # Authentication endpoints
     path('api/auth/token/', CustomTokenObtainPairView.as_view(), name='token_obtain_pair'),
-    path('api/auth/token/refresh/', TokenRefreshView.as_view(), name='token_refresh'),
-    path('api/auth/token/verify/', TokenVerifyView.as_view(), name='token_verify'),
+    path('api/auth/token/refresh/', TokenRefreshView.as_view(serializer_class=RevocationCheckingTokenRefreshSerializer), name='token_refresh'),
+    path('api/auth/token/verify/', TokenVerifyView.as_view(serializer_class=RevocationCheckingTokenVerifySerializer), name='token_verify'),
     path('api/auth/user/', UserViewSet.as_view({'get': 'me'}), name='user_me'),
     
     # Prediction endpoints
     path('predict/match/', predict_winner, name='predict_match'),
     path('predict/season/', predict_season, name='predict_season'),
+
+    # Delta sync
+    path('api/sync/', sync_changes, name='sync_changes'),
+
+    # Search
+    path('api/search/', search_api, name='search_api'),
+    path('search/', search_page, name='search'),
+    path('api/lookup/<str:kind>/', lookup_choices, name='lookup'),
     
+    # Prometheus scrape target
+    path('metrics', metrics_endpoint, name='metrics'),
+
     # Include router URLs
     # path('', include(router.urls)),
     # Site/listing pages (HTML views)
@@ -52,7 +69,7 @@ urlpatterns = [
     path('seasons/', list_seasons, name='list_seasons'),
     path('teams/', list_teams, name='list_teams'),
     path('games/', list_games, name='list_games'),
-    path('leagues/<int:pk>/', league_detail, name='league_detail'),
+    path('leagues/<int:pk>/', async_views.league_detail, name='league_detail'),
     path('seasons/<int:pk>/', season_detail, name='season_detail'),
     path('teams/<int:pk>/', team_detail, name='team_detail'),
     # Add views
@@ -90,7 +107,12 @@ urlpatterns = [
     path('goals/<int:pk>/edit/', edit_goal, name='edit_goal'),
     path('goals/<int:pk>/delete/', delete_goal, name='delete_goal'),
     
-    # API routes
+    # API routes (async read actions first so they take precedence over the router)
+    path('api/leagues/<int:pk>/standings/', async_views.league_standings, name='league_standings'),
+    path('api/teams/<int:pk>/fixtures/', async_views.team_fixtures, name='team_fixtures'),
+    # Live updates (server-sent events)
+    path('api/seasons/<int:pk>/events/', async_views.season_events, name='season_events'),
+    path('api/games/<int:pk>/events/', async_views.game_events, name='game_events'),
     path('api/', include(router.urls)),
     
     # Predictions
@@ -0,0 +1,164 @@
+"""Data versions used to key caches of derived results.
+
+Cached results are keyed by the version of the data they were computed
+from, so they are never served stale and never need explicit deletes.
+Versions are kept per scope in ``DataVersion`` rows shared by every process
+(web workers, ``ingest_events``, ``run_jobs``, ``rebuild_derived``):
+
+- ``season_scope(id)``: a season's games, goals, squads and standings;
+- ``league_scope(id)``: every season of a league;
+- ``ALL``: every league (all-time boards, match predictions);
+- ``CONTRACTS``: player contracts (roster timelines), bumped by contract
+  writes only.
+
+A write to a season's results bumps that season, its league and ``ALL``, so
+entries of other seasons and leagues stay valid. ``bump_data_version()``
+without scopes bumps the ``EPOCH`` that is part of every version, which
+invalidates everything (bulk rebuilds, deleted teams and seasons).
+
+Bumps run when the transaction of the write commits, once per scope and
+transaction, so no version is read before the data it stands for. Lookups
+keep the versions they read for ``DATA_VERSION_TTL`` seconds: a bump made
+by another process is seen up to that much later, one made by this process
+at once. Read-only requests read versions from the same database as their
+data (the replica, when it is used), so a version never keys results
+computed from older data.
+"""
+import threading
+import time
+from collections import defaultdict
+
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, router, transaction
+from django.db.models import F
+
+from .models import DataVersion, Season
+from .sqlite import write_transaction
+
+ALL = 'all'
+CONTRACTS = 'contracts'
+EPOCH = 'epoch'
+DEFAULT_TTL = 2.0
+
+
+def season_scope(season_id):
+    return f'season:{season_id}'
+
+
+def league_scope(league_id):
+    return f'league:{league_id}'
+
+
+class _Versions:
+    """``{(alias, scope): (expires, version)}`` read by this process."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._entries = {}
+        # Bumped on every discard so a read that raced a bump isn't kept
+        self._generation = 0
+
+    def get(self, alias, scope):
+        now = time.monotonic()
+        entry = self._entries.get((alias, scope))
+        if entry is not None and entry[0] > now:
+            return entry[1]
+        generation = self._generation
+        found = dict(DataVersion.objects.using(alias).filter(scope__in=[scope, EPOCH]).values_list('scope', 'version'))
+        version = f'{found.get(EPOCH, 0)}.{found.get(scope, 0)}'
+        ttl = getattr(settings, 'DATA_VERSION_TTL', DEFAULT_TTL)
+        with self._lock:
+            if ttl > 0 and generation == self._generation:
+                self._entries[(alias, scope)] = (now + ttl, version)
+        return version
+
+    def discard(self, scopes):
+        with self._lock:
+            self._generation += 1
+            if EPOCH in scopes:
+                self._entries.clear()
+                return
+            for key in [key for key in self._entries if key[1] in scopes]:
+                del self._entries[key]
+
+
+_versions = _Versions()
+
+
+class _Pending(threading.local):
+    """Scopes and seasons to bump when the transaction of each alias commits."""
+
+    def __init__(self):
+        self.scopes = defaultdict(set)
+        self.seasons = defaultdict(set)
+
+
+_pending = _Pending()
+
+
+def get_data_version(scope=ALL):
+    """The current version of ``scope``, as a cache key fragment."""
+    return _versions.get(router.db_for_read(DataVersion), scope)
+
+
+def forget_versions():
+    """Drop this process's copies of the versions and this thread's pending bumps.
+
+    The next lookups read the versions again. Bumps pending from a
+    transaction that was rolled back would otherwise be made by the next
+    commit (harmless, but it invalidates more than it needs to).
+    """
+    _versions.discard({EPOCH})
+    _pending.scopes.clear()
+    _pending.seasons.clear()
+
+
+def _bump(scopes):
+    rows = DataVersion.objects.using(router.db_for_write(DataVersion))
+
+    def bump():
+        if rows.filter(scope__in=scopes).update(version=F('version') + 1) < len(scopes):
+            existing = set(rows.filter(scope__in=scopes).values_list('scope', flat=True))
+            rows.bulk_create(
+                [DataVersion(scope=scope, version=1) for scope in scopes - existing], ignore_conflicts=True,
+            )
+
+    write_transaction(bump, using=rows.db)
+    _versions.discard(scopes)
+
+
+def _flush(using):
+    scopes = _pending.scopes.pop(using, set())
+    seasons = _pending.seasons.pop(using, set())
+    if seasons:
+        leagues = dict(Season.objects.using(using).filter(pk__in=seasons).values_list('pk', 'league_id'))
+        if len(leagues) < len(seasons):
+            # A deleted season: its league is unknown
+            scopes.add(EPOCH)
+        scopes.update(season_scope(pk) for pk in seasons)
+        scopes.update(league_scope(league_id) for league_id in leagues.values())
+        scopes.add(ALL)
+    if scopes:
+        _bump(scopes)
+
+
+def _schedule(using, scopes=(), seasons=()):
+    _pending.scopes[using].update(scopes)
+    _pending.seasons[using].update(seasons)
+    # Runs at once outside a transaction; later callbacks of the same transaction find nothing left
+    transaction.on_commit(lambda: _flush(using), using=using)
+
+
+def bump_data_version(*scopes, using=DEFAULT_DB_ALIAS):
+    """Invalidate ``scopes`` (default: everything) once ``using``'s current transaction commits."""
+    _schedule(using, scopes or (EPOCH,))
+
+
+def bump_season(season_id, using=DEFAULT_DB_ALIAS):
+    """Invalidate a season, its league and ``ALL`` once the write on ``using`` commits."""
+    _schedule(using, seasons=(season_id,))
+
+
+def versioned_key(scope, *parts):
+    """Build a cache key that is only valid for the current version of ``scope``."""
+    return ':'.join(['api', scope, get_data_version(scope)] + [str(p) for p in parts])
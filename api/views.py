@@ -1,12 +1,12 @@
+from django.http import HttpResponse
 from django.shortcuts import render, redirect
 from django.utils import timezone
-from rest_framework import viewsets, status
-from rest_framework.decorators import api_view, action
+from rest_framework import mixins, permissions, viewsets, status
+from rest_framework.decorators import api_view, action, throttle_classes
 from rest_framework.response import Response
 from rest_framework.views import APIView
 from django.utils import timezone
-from django.db.models import Count
-from django.db.models import Q, Sum, Prefetch
+from django.db.models import Q, Prefetch, Exists, OuterRef
 from .models import (
     League, Season, Team, Game, LeagueStanding,
     Player, PlayerContract, Goal
@@ -15,13 +15,19 @@ from .serializers import (
     LeagueSerializer, SeasonSerializer, TeamSerializer,
     GameSerializer, LeagueStandingSerializer
 )
-from .serializers import UserSerializer
+from .serializers import UserSerializer, JobSerializer, JobCreateSerializer
+from .fastpath import (
+    FastListMixin, GameValuesSerializer, LeagueStandingValuesSerializer,
+    PlayerValuesSerializer, GoalValuesSerializer,
+)
 from django.contrib.auth.models import User
 from .forms import (
     LeagueForm, SeasonForm, TeamForm, GameForm,
     PlayerForm, PlayerContractForm, GoalForm
 )
 from django.urls import reverse
+from . import analytics, authentication, jobs, leaderboards, listing, lookups, metrics, predictions, queries, rosters, search, sharding, sync
+from .throttling import MatchPredictionThrottle, SeasonPredictionThrottle, StatsThrottle
 from django.shortcuts import get_object_or_404
 from rest_framework_simplejwt.serializers import TokenObtainPairSerializer
 from rest_framework_simplejwt.views import TokenObtainPairView, TokenRefreshView, TokenVerifyView
@@ -33,7 +39,10 @@ def index(request):
 
 
 def dashboard(request):
-    """Dashboard view showing league standings and recent games."""
+    """Dashboard view showing league standings and recent games.
+
+    See ``api.async_views.dashboard`` for the concurrent version served by default.
+    """
     # Get the first league (in a real app, you'd select based on user preference)
     league = League.objects.first()
     if not league:
@@ -44,105 +53,8 @@ def dashboard(request):
     if not season:
         return render(request, 'dashboard.html', {'error': 'No active season found'})
 
-    # Get standings
-    standings = LeagueStanding.objects.filter(season=season)
-
-    # Get recent and upcoming games
-    now = timezone.now()
-    recent_games = Game.objects.filter(
-        season=season,
-        played_at__lt=now,
-        home_score__isnull=False
-    ).order_by('-played_at')[:5]
-
-    upcoming_games = Game.objects.filter(
-        season=season,
-        played_at__gt=now
-    ).order_by('played_at')[:5]
-
-    # Get next matchday games
-    next_matchday_date = upcoming_games.first().played_at.date() if upcoming_games.exists() else None
-    next_matchday_games = []
-    if next_matchday_date:
-        next_matchday_games = Game.objects.filter(
-            season=season,
-            played_at__date=next_matchday_date
-        ).order_by('played_at')
-
-    # Calculate form table (last 5 games)
-    form_data = []
-    for standing in standings:
-        team_games = Game.objects.filter(
-            Q(home_team=standing.team) | Q(away_team=standing.team),
-            season=season,
-            played_at__lt=now,
-            home_score__isnull=False
-        ).order_by('-played_at')[:5]
-
-        form = []
-        for game in team_games:
-            if game.home_team == standing.team:
-                if game.home_score > game.away_score:
-                    form.append('W')
-                elif game.home_score < game.away_score:
-                    form.append('L')
-                else:
-                    form.append('D')
-            else:
-                if game.away_score > game.home_score:
-                    form.append('W')
-                elif game.away_score < game.home_score:
-                    form.append('L')
-                else:
-                    form.append('D')
-        
-        form_data.append({
-            'team': standing.team,
-            'form': form[::-1]  # Reverse to show oldest to newest
-        })
-
-    # Calculate top scorers and assisters
-    top_scorers = Player.objects.filter(
-        goals__game__season=season
-    ).annotate(
-        goals_count=Count('goals')
-    ).order_by('-goals_count')[:5]
-    
-    # Get top assisters
-    top_assisters = Player.objects.filter(
-        assists__game__season=season
-    ).annotate(
-        assists_count=Count('assists')
-    ).order_by('-assists_count')[:5]
-
-    # League level statistics
-    games_qs = Game.objects.filter(season=season, home_score__isnull=False, away_score__isnull=False)
-    total_games = games_qs.count()
-    agg = games_qs.aggregate(total_home=Sum('home_score'), total_away=Sum('away_score'))
-    total_goals = (agg.get('total_home') or 0) + (agg.get('total_away') or 0)
-    avg_goals_per_game = (total_goals / total_games) if total_games else 0
-    # total clean sheets across teams (sum of standing clean_sheets)
-    total_clean_sheets = sum([s.clean_sheets for s in standings]) if standings else 0
-
-    context = {
-        'league': league,
-        'season': season,
-        'standings': standings,
-        'recent_games': recent_games,
-        'upcoming_games': upcoming_games,
-        'next_matchday_games': next_matchday_games,
-        'next_matchday_date': next_matchday_date,
-        'form_data': form_data,
-        'top_scorers': [{'player': p, 'goals': p.goals_count} for p in top_scorers],
-        'top_assisters': [{'player': p, 'assists': p.assists_count} for p in top_assisters],
-        'league_stats': {
-            'total_games': total_games,
-            'total_goals': total_goals,
-            'avg_goals_per_game': avg_goals_per_game,
-            'total_clean_sheets': total_clean_sheets,
-        },
-    }
-    return render(request, 'dashboard.html', context)
+    results = {name: run() for name, run in queries.dashboard_queries(season, timezone.now()).items()}
+    return render(request, 'dashboard.html', queries.dashboard_context(league, season, results))
 
 
 def add_league(request):
@@ -185,7 +97,7 @@ def add_game(request):
             form.save()
             # update standings for that season
             season = form.cleaned_data.get('season')
-            LeagueStanding.update_standings(season)
+            jobs.queue_standings(season)
             return redirect('list_games')
     else:
         form = GameForm()
@@ -193,24 +105,100 @@ def add_game(request):
 
 
 # List views
+def _sort_choices(sortable, labels):
+    choices = []
+    for name in sortable:
+        choices.append((name, f'{labels[name]} (ascending)'))
+        choices.append((f'-{name}', f'{labels[name]} (descending)'))
+    return choices
+
+
+def _league_choices():
+    return sorted(sharding.gather_list(League.objects.values_list('id', 'name').order_by('name')), key=lambda c: c[1])
+
+
 def list_leagues(request):
-    leagues = League.objects.all().order_by('name')
-    return render(request, 'lists/league_list.html', {'leagues': leagues, 'title': 'Leagues'})
+    sortable = {'name': 'name', 'created': 'created_at'}
+    leagues = League.objects.all()
+    page = listing.keyset_paginate(request, leagues, sortable, 'name', databases=sharding.databases())
+    return render(request, 'lists/league_list.html', {
+        'leagues': page, 'page': page, 'title': 'Leagues',
+        'sort_choices': _sort_choices(sortable, {'name': 'Name', 'created': 'Created'}),
+    })
 
 
 def list_seasons(request):
-    seasons = Season.objects.all().order_by('-name')
-    return render(request, 'lists/season_list.html', {'seasons': seasons, 'title': 'Seasons'})
+    sortable = {'name': 'name', 'start': 'start_date'}
+    league_id = listing.int_param(request, 'league')
+    seasons = Season.objects.select_related('league')
+    if league_id:
+        seasons = seasons.filter(league_id=league_id)
+    page = listing.keyset_paginate(request, seasons, sortable, '-name', databases=sharding.databases())
+    return render(request, 'lists/season_list.html', {
+        'seasons': page, 'page': page, 'title': 'Seasons',
+        'filters': [
+            listing.select_filter('league', 'League', _league_choices(), league_id),
+        ],
+        'sort_choices': _sort_choices(sortable, {'name': 'Name', 'start': 'Start date'}),
+    })
 
 
 def list_teams(request):
-    teams = Team.objects.all().order_by('name')
-    return render(request, 'lists/team_list.html', {'teams': teams, 'title': 'Teams'})
+    sortable = {'name': 'name', 'founded': 'founded_year'}
+    league_id = listing.int_param(request, 'league')
+    teams = Team.objects.select_related('league')
+    if league_id:
+        teams = teams.filter(league_id=league_id)
+    page = listing.keyset_paginate(request, teams, sortable, 'name', databases=sharding.databases())
+    return render(request, 'lists/team_list.html', {
+        'teams': page, 'page': page, 'title': 'Teams',
+        'filters': [
+            listing.select_filter('league', 'League', _league_choices(), league_id),
+        ],
+        'sort_choices': _sort_choices(sortable, {'name': 'Name', 'founded': 'Founded'}),
+    })
 
 
 def list_games(request):
-    games = Game.objects.all().order_by('-played_at')
-    return render(request, 'lists/game_list.html', {'games': games, 'title': 'Games'})
+    sortable = {'date': 'played_at', 'id': 'id'}
+    league_id = listing.int_param(request, 'league')
+    season_id = listing.int_param(request, 'season')
+    team_id = listing.int_param(request, 'team')
+    start, end = listing.date_range(request)
+
+    games = Game.objects.select_related('home_team', 'away_team', 'season')
+    if league_id:
+        games = games.filter(season__league_id=league_id)
+    if season_id:
+        games = games.filter(season_id=season_id)
+    if team_id:
+        games = games.filter(Q(home_team_id=team_id) | Q(away_team_id=team_id))
+    if start:
+        games = games.filter(played_at__gte=start)
+    if end:
+        games = games.filter(played_at__lt=end)
+    page = listing.keyset_paginate(request, games, sortable, '-date', databases=sharding.databases())
+
+    season_choices = Season.objects.select_related('league').order_by('league__name', '-start_date')
+    team_choices = Team.objects.order_by('name')
+    if league_id:
+        season_choices = season_choices.filter(league_id=league_id)
+        team_choices = team_choices.filter(league_id=league_id)
+    season_choices = sorted(
+        sharding.gather_list(season_choices), key=lambda s: (s.league.name, -s.start_date.toordinal())
+    )
+    team_choices = sorted(sharding.gather_list(team_choices.values_list('id', 'name')), key=lambda c: c[1])
+    return render(request, 'lists/game_list.html', {
+        'games': page, 'page': page, 'title': 'Games',
+        'filters': [
+            listing.select_filter('league', 'League', _league_choices(), league_id),
+            listing.select_filter('season', 'Season', [(s.id, str(s)) for s in season_choices], season_id),
+            listing.select_filter('team', 'Team', team_choices, team_id),
+            listing.date_filter('date_from', 'From', request),
+            listing.date_filter('date_to', 'To', request),
+        ],
+        'sort_choices': _sort_choices(sortable, {'date': 'Date', 'id': 'Added'}),
+    })
 
 
 # Edit views
@@ -256,7 +244,7 @@ def edit_game(request, pk):
         form = GameForm(request.POST, instance=game)
         if form.is_valid():
             game = form.save()
-            LeagueStanding.update_standings(game.season)
+            jobs.queue_standings(game.season)
             return redirect('list_games')
     else:
         form = GameForm(instance=game)
@@ -286,17 +274,30 @@ def delete_game(request, pk):
     game = get_object_or_404(Game, pk=pk)
     season = game.season  # store before deletion
     game.delete()
-    LeagueStanding.update_standings(season)  # update standings after deletion
+    jobs.queue_standings(season)  # update standings after deletion
     return redirect('list_games')
 
 
 # Player views
 def list_players(request):
-    players = Player.objects.annotate(
-        goals_count=Count('goals'),
-        assists_count=Count('assists')
-    ).order_by('name')
-    return render(request, 'lists/player_list.html', {'players': players, 'title': 'Players'})
+    sortable = {'name': 'name', 'birth_date': 'birth_date'}
+    team_id = listing.int_param(request, 'team')
+    today = timezone.now().date()
+    players = Player.objects.prefetch_related(Prefetch(
+        'contracts',
+        queryset=PlayerContract.objects.filter(start_date__lte=today, end_date__gte=today).select_related('team__league'),
+        to_attr='current_contracts',
+    ))
+    if team_id:
+        players = players.filter(Exists(PlayerContract.objects.filter(player=OuterRef('pk'), team_id=team_id)))
+    page = listing.keyset_paginate(request, players, sortable, 'name')
+    return render(request, 'lists/player_list.html', {
+        'players': page, 'page': page, 'title': 'Players',
+        'filters': [
+            listing.select_filter('team', 'Team', Team.objects.values_list('id', 'name').order_by('name'), team_id),
+        ],
+        'sort_choices': _sort_choices(sortable, {'name': 'Name', 'birth_date': 'Birth date'}),
+    })
 
 
 def player_detail(request, pk):
@@ -389,7 +390,7 @@ def add_goal(request):
         if form.is_valid():
             goal = form.save()
             season = goal.game.season
-            LeagueStanding.update_standings(season)  # update standings when goal added
+            jobs.queue_standings(season)  # update standings when goal added
             return redirect('list_games')
     else:
         initial = {}
@@ -405,7 +406,7 @@ def edit_goal(request, pk):
         form = GoalForm(request.POST, instance=goal)
         if form.is_valid():
             goal = form.save()
-            LeagueStanding.update_standings(goal.game.season)
+            jobs.queue_standings(goal.game.season)
             return redirect('list_games')
     else:
         form = GoalForm(instance=goal)
@@ -419,11 +420,21 @@ def delete_goal(request, pk):
     goal = get_object_or_404(Goal, pk=pk)
     season = goal.game.season
     goal.delete()
-    LeagueStanding.update_standings(season)
+    jobs.queue_standings(season)
     return redirect('list_games')
 
 
-class LeagueViewSet(viewsets.ModelViewSet):
+class ShardedListMixin:
+    """``list`` reads every league shard."""
+
+    def list(self, request, *args, **kwargs):
+        if not sharding.enabled():
+            return super().list(request, *args, **kwargs)
+        rows = sharding.gather_list(self.filter_queryset(self.get_queryset()))
+        return Response(self.get_serializer(rows, many=True).data)
+
+
+class LeagueViewSet(ShardedListMixin, viewsets.ModelViewSet):
     queryset = League.objects.all()
     serializer_class = LeagueSerializer
 
@@ -443,21 +454,19 @@ class LeagueViewSet(viewsets.ModelViewSet):
             )
 
 
-class SeasonViewSet(viewsets.ModelViewSet):
+class SeasonViewSet(ShardedListMixin, viewsets.ModelViewSet):
     queryset = Season.objects.all()
     serializer_class = SeasonSerializer
 
     @action(detail=True, methods=['post'])
     def update_standings(self, request, pk=None):
-        """Update standings for this season."""
+        """Queue a standings update for this season; poll the returned job."""
         season = self.get_object()
-        LeagueStanding.update_standings(season)
-        standings = LeagueStanding.objects.filter(season=season)
-        serializer = LeagueStandingSerializer(standings, many=True)
-        return Response(serializer.data)
+        job, _ = jobs.queue_standings(season, created_by=request.user.pk)
+        return Response(JobSerializer(job).data, status=status.HTTP_202_ACCEPTED)
 
 
-class TeamViewSet(viewsets.ModelViewSet):
+class TeamViewSet(ShardedListMixin, viewsets.ModelViewSet):
     queryset = Team.objects.all().order_by('name')
     serializer_class = TeamSerializer
 
@@ -480,14 +489,16 @@ class TeamViewSet(viewsets.ModelViewSet):
             )
 
 
-class GameViewSet(viewsets.ModelViewSet):
+class GameViewSet(ShardedListMixin, FastListMixin, viewsets.ModelViewSet):
     queryset = Game.objects.all()
     serializer_class = GameSerializer
+    fast_serializer_class = GameValuesSerializer
 
 
-class LeagueStandingViewSet(viewsets.ModelViewSet):
+class LeagueStandingViewSet(ShardedListMixin, FastListMixin, viewsets.ModelViewSet):
     queryset = LeagueStanding.objects.all()
     serializer_class = LeagueStandingSerializer
+    fast_serializer_class = LeagueStandingValuesSerializer
 
 
 class UserViewSet(viewsets.ReadOnlyModelViewSet):
@@ -500,12 +511,21 @@ class UserViewSet(viewsets.ReadOnlyModelViewSet):
         """Return the currently authenticated user's serialized data."""
         if not request.user or not request.user.is_authenticated:
             return Response({'detail': 'Not authenticated'}, status=status.HTTP_401_UNAUTHORIZED)
-        serializer = self.get_serializer(request.user)
+        # Token users only carry the claims; the full record is read here
+        user = authentication.database_user(request.user)
+        if user is None:
+            return Response({'detail': 'Not authenticated'}, status=status.HTTP_401_UNAUTHORIZED)
+        serializer = self.get_serializer(user)
         return Response(serializer.data)
 
 
 class CustomTokenObtainPairSerializer(TokenObtainPairSerializer):
     """Customize the token response to include basic user info for SPA convenience."""
+    @classmethod
+    def get_token(cls, user):
+        # Claims read by StatelessJWTAuthentication instead of the user row
+        return authentication.add_user_claims(super().get_token(user), user)
+
     def validate(self, attrs):
         data = super().validate(attrs)
         # include user data
@@ -518,31 +538,142 @@ class CustomTokenObtainPairView(TokenObtainPairView):
     serializer_class = CustomTokenObtainPairSerializer
 
 
-class PlayerViewSet(viewsets.ModelViewSet):
+class PlayerViewSet(FastListMixin, viewsets.ModelViewSet):
     """CRUD for players."""
     queryset = Player.objects.all().order_by('name')
     # import serializer lazily to avoid circular import issues
     from .serializers import PlayerSerializer
     serializer_class = PlayerSerializer
+    fast_serializer_class = PlayerValuesSerializer
 
 
-class GoalViewSet(viewsets.ModelViewSet):
+class GoalViewSet(ShardedListMixin, FastListMixin, viewsets.ModelViewSet):
     """CRUD for goals."""
     queryset = Goal.objects.all().select_related('scorer', 'assistant', 'game')
     from .serializers import GoalSerializer
     serializer_class = GoalSerializer
+    fast_serializer_class = GoalValuesSerializer
+
+
+class JobViewSet(mixins.CreateModelMixin, mixins.RetrieveModelMixin, viewsets.GenericViewSet):
+    """Queue a background job (staff only) and poll its status, progress and result (staff or its creator)."""
+    serializer_class = JobSerializer
+
+    def get_queryset(self):
+        # Always the primary: a replica may not have the job yet
+        queryset = jobs.primary()
+        user = self.request.user
+        if user.is_staff:
+            return queryset
+        return queryset.filter(created_by_id=user.pk) if user.is_authenticated else queryset.none()
+
+    def get_permissions(self):
+        if self.action == 'create':
+            return [permissions.IsAdminUser()]
+        return [permissions.IsAuthenticated()]
+
+    def create(self, request, *args, **kwargs):
+        serializer = JobCreateSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        job, created = jobs.enqueue(**serializer.validated_data, created_by=request.user.pk)
+        # An active job with the same dedup_key is returned instead of a new one
+        return Response(
+            JobSerializer(job).data, status=status.HTTP_201_CREATED if created else status.HTTP_200_OK
+        )
+
+
+def _default_season():
+    """The season shown when none is given: the latest active one, in any shard."""
+    return sharding.first(
+        Season.objects.filter(is_active=True), key=lambda season: (-season.start_date.toordinal(), season.pk)
+    )
 
 
 class StatsViewSet(viewsets.ViewSet):
-    """Simple stats endpoints. `list` returns top scorers."""
+    """Leaderboards for a season or league.
+
+    Query params:
+        season (id) or league (id). Defaults to the first active season.
+        board: comma separated subset of the available boards (default: all).
+        limit: rows per board (default 10, max 100).
+        min_appearances: threshold for `goals_per_appearance` and `goals_per_90` (default 1).
+    """
+    throttle_classes = [StatsThrottle]
+
     def list(self, request):
-        top = Player.objects.annotate(goals_count=Count('goals')).order_by('-goals_count')[:10]
-        from .serializers import PlayerSerializer
-        serializer = PlayerSerializer(top, many=True)
-        return Response({'top_scorers': serializer.data})
+        season_id = request.query_params.get('season')
+        league_id = request.query_params.get('league')
+        season = league = None
+        try:
+            if season_id:
+                season = Season.objects.get(pk=int(season_id))
+            elif league_id:
+                league = League.objects.get(pk=int(league_id))
+            else:
+                season = _default_season()
+        except (ValueError, Season.DoesNotExist, League.DoesNotExist):
+            return Response({'detail': 'Invalid season or league id.'}, status=status.HTTP_400_BAD_REQUEST)
+        if season is None and league is None:
+            return Response({'detail': 'No season found.'}, status=status.HTTP_404_NOT_FOUND)
+
+        boards = request.query_params.get('board')
+        boards = [b.strip() for b in boards.split(',') if b.strip()] if boards else list(leaderboards.BOARDS)
+        unknown = [b for b in boards if b not in leaderboards.BOARDS]
+        if unknown:
+            return Response(
+                {'detail': f"Unknown board(s): {', '.join(unknown)}. Choose from: {', '.join(leaderboards.BOARDS)}."},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        try:
+            limit = int(request.query_params.get('limit', leaderboards.DEFAULT_LIMIT))
+            min_appearances = int(request.query_params.get('min_appearances', 1))
+        except ValueError:
+            return Response({'detail': 'limit and min_appearances must be integers.'}, status=status.HTTP_400_BAD_REQUEST)
+        limit = max(1, min(limit, leaderboards.MAX_LIMIT))
+
+        with sharding.use_instance(season or league):
+            tallies = leaderboards.get_tallies(season=season, league=league)
+            data = leaderboards.leaderboards(tallies, boards, limit, max(1, min_appearances))
+        response = {
+            'season': season.id if season else None,
+            'league': league.id if league else season.league_id,
+            'leaderboards': data,
+        }
+        if 'goals' in data:
+            # kept for clients of the original endpoint
+            response['top_scorers'] = [row['player'] for row in data['goals']]
+        return Response(response)
+
+    @action(detail=False, methods=['get'], url_path='goal-timing')
+    def goal_timing(self, request):
+        """Goals per 15-minute bucket, first-goal results, comebacks and goal shares.
+
+        Query params: season (id, default the first active season), team (id, optional).
+        """
+        season_id = request.query_params.get('season')
+        try:
+            if season_id:
+                season = Season.objects.get(pk=int(season_id))
+            else:
+                season = _default_season()
+            team_id = int(request.query_params['team']) if request.query_params.get('team') else None
+        except (ValueError, Season.DoesNotExist):
+            return Response({'detail': 'Invalid season or team id.'}, status=status.HTTP_400_BAD_REQUEST)
+        if season is None:
+            return Response({'detail': 'No season found.'}, status=status.HTTP_404_NOT_FOUND)
+
+        with sharding.use_instance(season):
+            data = analytics.goal_timing(season)
+        if team_id is not None:
+            teams = [row for row in data['teams'] if row['team'] == team_id]
+            if not teams:
+                return Response({'detail': 'Team does not play in this season.'}, status=status.HTTP_404_NOT_FOUND)
+            data = {**data, 'teams': teams}
+        return Response(data)
 
 
 @api_view(['GET'])
+@throttle_classes([MatchPredictionThrottle])
 def predict_winner(request):
     """Predict a winner between two teams using simple historical win rates.
 
@@ -561,47 +692,14 @@ def predict_winner(request):
         return Response({'detail': 'Provide two different team ids.'}, status=status.HTTP_400_BAD_REQUEST)
 
     try:
-        team1 = Team.objects.get(pk=t1)
-        team2 = Team.objects.get(pk=t2)
+        # cached per team pair until the next result write
+        return Response(predictions.predict_match(t1, t2))
     except Team.DoesNotExist:
         return Response({'detail': 'One or both teams do not exist.'}, status=status.HTTP_404_NOT_FOUND)
 
-    # compute wins and total matches between/overall — we'll use overall matches involving the team
-    def stats(team):
-        played = Game.objects.filter(Q(home_team=team) | Q(away_team=team)).exclude(home_score__isnull=True, away_score__isnull=True)
-        wins = 0
-        for g in played:
-            w = g.winner()
-            if w and w.id == team.id:
-                wins += 1
-        total = played.count()
-        return wins, total
-
-    w1, n1 = stats(team1)
-    w2, n2 = stats(team2)
-
-    # win rate with Laplace smoothing
-    rate1 = (w1 + 1) / (n1 + 2) if n1 >= 0 else 0.5
-    rate2 = (w2 + 1) / (n2 + 2) if n2 >= 0 else 0.5
-
-    # normalize to probability
-    s = rate1 + rate2
-    prob1 = rate1 / s if s > 0 else 0.5
-    prob2 = rate2 / s if s > 0 else 0.5
-
-    predicted = team1.id if prob1 >= prob2 else team2.id
-
-    return Response({
-        'team1': team1.id,
-        'team2': team2.id,
-        'team1_win_rate': round(rate1, 3),
-        'team2_win_rate': round(rate2, 3),
-        'predicted_winner': predicted,
-        'probability': round(max(prob1, prob2), 3),
-    })
-
 
 @api_view(['GET'])
+@throttle_classes([SeasonPredictionThrottle])
 def predict_season(request):
     """Simple season winner prediction: returns team with highest points in latest standings if available.
 
@@ -612,51 +710,105 @@ def predict_season(request):
         if season_id:
             season = Season.objects.get(pk=int(season_id))
         else:
-            season = Season.objects.filter(is_active=True).first()
+            season = _default_season()
     except (ValueError, Season.DoesNotExist):
         return Response({'detail': 'Invalid or missing season id.'}, status=status.HTTP_400_BAD_REQUEST)
 
     if not season:
         return Response({'detail': 'No season found.'}, status=status.HTTP_404_NOT_FOUND)
 
-    # Use cached standings if available
-    standing = LeagueStanding.objects.filter(season=season).order_by('-points', '-goal_difference').first()
-    if not standing:
+    try:
+        with sharding.use_instance(season):
+            return Response(predictions.predict_season(season.pk))
+    except LeagueStanding.DoesNotExist:
         return Response({'detail': 'No standings available for this season.'}, status=status.HTTP_404_NOT_FOUND)
 
-    return Response({'predicted_winner': standing.team.id, 'team': standing.team.name, 'points': standing.points})
+
+@api_view(['GET'])
+def sync_changes(request):
+    """Changes to a season's games, goals and standings since a version.
+
+    Query params: season (id), since (version the client last saw; omit for a full snapshot), limit.
+    Returns: {season, version, reset, snapshot?, changes, has_more}
+    """
+    season_id = request.query_params.get('season')
+    since = request.query_params.get('since')
+    try:
+        season = Season.objects.get(pk=int(season_id))
+        since = int(since) if since not in (None, '') else None
+        limit = int(request.query_params.get('limit', sync.DEFAULT_LIMIT))
+    except (TypeError, ValueError, Season.DoesNotExist):
+        return Response({'detail': 'Provide a valid season id and integer since/limit.'}, status=status.HTTP_400_BAD_REQUEST)
+    limit = max(1, min(limit, sync.MAX_LIMIT))
+    return Response(sync.changes_since(season, since, limit))
+
+
+def metrics_endpoint(request):
+    """Prometheus metrics of every worker process, in the text exposition format."""
+    return HttpResponse(metrics.render(metrics.collect()), content_type=metrics.CONTENT_TYPE)
+
+
+def _search_params(params):
+    kinds = [kind for kind in params.get('type', '').split(',') if kind] or None
+    try:
+        limit = int(params.get('limit', search.DEFAULT_LIMIT))
+    except ValueError:
+        limit = search.DEFAULT_LIMIT
+    return params.get('q', ''), kinds, max(1, min(limit, search.MAX_LIMIT))
+
+
+@api_view(['GET'])
+def search_api(request):
+    """Search players, teams and leagues by name (prefix matching, best match first).
+
+    Query params: q, type (comma-separated player/team/league), limit.
+    Returns: {query, results: [{type, id, name, detail, url}]}
+    """
+    text, kinds, limit = _search_params(request.query_params)
+    return Response({'query': text, 'results': search.search(text, kinds, limit)})
+
+
+def search_page(request):
+    """View for the global search results page."""
+    text, kinds, limit = _search_params(request.GET)
+    return render(request, 'search.html', {
+        'query': text,
+        'results': search.search(text, kinds, limit),
+    })
+
+
+@api_view(['GET'])
+def lookup_choices(request, kind):
+    """Choices for an autocomplete form field (see ``api.lookups``).
+
+    Query params: q, plus the scope of the kind (player: game/team, team: season/league,
+    season: league, game: season).
+    Returns: {results: [{id, text}]}
+    """
+    if kind not in lookups.LOOKUPS:
+        return Response({'detail': f'Unknown lookup: {kind}.'}, status=status.HTTP_404_NOT_FOUND)
+    return Response({'results': lookups.lookup(kind, request.query_params.get('q', ''), request.query_params)})
+
 
 def league_detail(request, pk):
-    """View for showing detailed league information."""
+    """View for showing detailed league information.
+
+    See ``api.async_views.league_detail`` for the concurrent version served by default.
+    """
     league = get_object_or_404(League, pk=pk)
-    seasons = league.seasons.all().order_by('-start_date')
-    active_season = league.seasons.filter(is_active=True).first()
+    seasons = list(league.seasons.all().order_by('-start_date'))
+    active_season = next((s for s in seasons if s.is_active), None)
 
     if active_season:
-        standings = LeagueStanding.objects.filter(season=active_season)
-        recent_games = Game.objects.filter(
-            season=active_season,
-            played_at__lt=timezone.now()
-        ).exclude(
-            home_score__isnull=True
-        ).order_by('-played_at')[:5]
-        
-        upcoming_games = Game.objects.filter(
-            season=active_season,
-            played_at__gt=timezone.now()
-        ).order_by('played_at')[:5]
+        results = {name: run() for name, run in queries.league_detail_queries(active_season, timezone.now()).items()}
     else:
-        standings = []
-        recent_games = []
-        upcoming_games = []
+        results = {'standings': [], 'recent_games': [], 'upcoming_games': []}
 
     return render(request, 'league_detail.html', {
         'league': league,
         'seasons': seasons,
         'active_season': active_season,
-        'standings': standings,
-        'recent_games': recent_games,
-        'upcoming_games': upcoming_games,
+        **results,
     })
 
 def season_detail(request, pk):
@@ -683,12 +835,7 @@ def team_detail(request, pk):
             raise Http404("Team has no associated league")
         
         # Get current players
-        current_players = PlayerContract.objects.filter(
-            team=team,
-            start_date__lte=timezone.now()
-        ).select_related('player').filter(
-            Q(end_date__isnull=True) | Q(end_date__gt=timezone.now())
-        )
+        current_players = rosters.contracts_with_players(rosters.squad_at(team.pk))
 
         # Get all games for the team
         games = Game.objects.filter(
@@ -714,19 +861,10 @@ def game_detail(request, game_id):
     )
     
     # Get players for both teams at the time of the game
-    home_players = PlayerContract.objects.filter(
-        team=game.home_team,
-        start_date__lte=game.played_at
-    ).select_related('player').filter(
-        Q(end_date__isnull=True) | Q(end_date__gt=game.played_at)
-    )
-    
-    away_players = PlayerContract.objects.filter(
-        team=game.away_team,
-        start_date__lte=game.played_at
-    ).select_related('player').filter(
-        Q(end_date__isnull=True) | Q(end_date__gt=game.played_at)
-    )
+    home_squad, away_squad = rosters.squads_for_games([game])[game.pk]
+    contracts = rosters.contracts_with_players(home_squad + away_squad)
+    home_players = [c for c in contracts if c.team_id == game.home_team_id]
+    away_players = [c for c in contracts if c.team_id == game.away_team_id]
     
     return render(request, 'game_detail.html', {
         'game': game,
@@ -0,0 +1,41 @@
+import json
+
+from django import forms
+from django.urls import reverse
+
+
+class AutocompleteSelect(forms.Select):
+    """Select that renders only its current value and loads other choices on demand.
+
+    Choices come from ``GET /api/lookup/<kind>/`` (see ``api.lookups``) as the
+    user types. ``scope`` maps lookup parameters to other fields of the same
+    form whose values narrow the choices, e.g. ``{'game': 'game'}`` for the
+    players of the selected game.
+    """
+
+    class Media:
+        js = ('js/autocomplete.js',)
+
+    def __init__(self, kind, scope=None, attrs=None):
+        super().__init__(attrs)
+        self.kind = kind
+        self.scope = scope or {}
+
+    def build_attrs(self, base_attrs, extra_attrs=None):
+        attrs = super().build_attrs(base_attrs, extra_attrs)
+        attrs['data-autocomplete-url'] = reverse('lookup', args=[self.kind])
+        if self.scope:
+            attrs['data-autocomplete-scope'] = json.dumps(self.scope)
+        return attrs
+
+    def optgroups(self, name, value, attrs=None):
+        """The empty choice plus the selected ones, without iterating the whole queryset."""
+        selected = [v for v in value if str(v).isdigit()]
+        options = [self.create_option(name, '', self.choices.field.empty_label or '---------', not selected, 0)]
+        if selected:
+            field = self.choices.field
+            for obj in field.queryset.filter(pk__in=selected):
+                options.append(self.create_option(
+                    name, obj.pk, field.label_from_instance(obj), True, len(options)
+                ))
+        return [(None, options, 0)]
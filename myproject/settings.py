@@ -27,6 +27,9 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'api.metrics.metrics_middleware',
+    'api.replica.replica_middleware',
+    'api.sharding.shard_middleware',
     'corsheaders.middleware.CorsMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
@@ -56,6 +59,7 @@ TEMPLATES = [
 ]
 
 WSGI_APPLICATION = 'myproject.wsgi.application'
+ASGI_APPLICATION = 'myproject.asgi.application'
 
 
 # Database
@@ -64,9 +68,36 @@ DATABASES = {
     'default': {
         'ENGINE': 'django.db.backends.sqlite3',
         'NAME': BASE_DIR / 'db.sqlite3',
+        # Write transactions take the lock up front instead of failing on a lock upgrade (Django 5.1+)
+        'OPTIONS': {'transaction_mode': 'IMMEDIATE'},
+        # Reuse connections (and the pragmas set on them) for a minute, in request
+        # threads and in the query threads of the async views alike
+        'CONN_MAX_AGE': 60,
     }
 }
 
+# Pragmas applied to every SQLite connection, over api.sqlite.DEFAULTS (WAL,
+# synchronous=normal, 256 MiB mmap, 64 MiB page cache, in-memory temp store,
+# 5 s busy timeout), and the retries of write transactions that still find
+# the database locked. None leaves a pragma at SQLite's default.
+SQLITE_PROFILE = {}
+
+# Read replica (api/replica.py): add a 'replica' alias, e.g.
+#     DATABASES['replica'] = {'ENGINE': 'django.db.backends.sqlite3', 'NAME': BASE_DIR / 'db.replica.sqlite3'}
+# and keep it fresh with `python manage.py refresh_replica --interval 5`.
+# Read-only requests use the primary while the copy is older than REPLICA_MAX_LAG seconds.
+REPLICA_MAX_LAG = 30
+# Seconds a worker may miss a token client's pin taken by a worker that doesn't share its cache.
+REPLICA_PIN_TTL = 1.0
+
+# League shards (api/sharding.py): map league ids to extra database aliases, e.g.
+#     DATABASES['shard1'] = {'ENGINE': 'django.db.backends.sqlite3', 'NAME': BASE_DIR / 'db.shard1.sqlite3',
+#                            'OPTIONS': {'transaction_mode': 'IMMEDIATE'}}
+#     LEAGUE_SHARDS = {1: 'shard1', 2: 'shard1'}
+# then move the existing rows with `python manage.py split_shards`.
+LEAGUE_SHARDS = {}
+DATABASE_ROUTERS = ['api.routers.LeagueShardRouter', 'api.routers.ReplicaRouter']
+
 
 # Password validation
 AUTH_PASSWORD_VALIDATORS = []
@@ -85,10 +116,11 @@ STATICFILES_DIRS = [BASE_DIR / 'static']
 
 DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 
-# REST framework configuration: include JWTAuthentication so API endpoints can accept JWTs
+# REST framework configuration: accept JWTs, taking the user from the token's
+# claims (see api/authentication.py) instead of a query per request
 REST_FRAMEWORK = {
     'DEFAULT_AUTHENTICATION_CLASSES': (
-        'rest_framework_simplejwt.authentication.JWTAuthentication',
+        'api.authentication.StatelessJWTAuthentication',
         'rest_framework.authentication.SessionAuthentication',
     ),
 }
@@ -110,3 +142,56 @@ SIMPLE_JWT = {
     'BLACKLIST_AFTER_ROTATION': False,
     'AUTH_HEADER_TYPES': ('Bearer',),
 }
+
+# Seconds a worker keeps the user of a token without user claims (issued
+# before they were added) before reading it again; 0 reads it every request.
+JWT_USER_CACHE_TTL = 60
+
+# Seconds a worker keeps its snapshot of the token revocations. Workers
+# sharing the default cache see a revocation at once; with a per-process
+# cache, other workers see it within this delay. 0 reads them every request.
+JWT_REVOCATION_TTL = 5
+
+# Token-bucket throttling of the prediction and stats endpoints (api/throttling.py):
+# (capacity, tokens refilled per second) per user and per anonymous address,
+# the cost of a request per endpoint, and an optional cache alias to share
+# buckets between worker processes.
+API_THROTTLE = {
+    'user': (60, 1.0),
+    'anon': (20, 0.2),
+    'costs': {'predict_match': 5, 'predict_season': 1, 'stats': 2},
+    'cache': None,
+}
+
+# Seconds a worker reuses the data versions that key cached leaderboards,
+# analytics, rosters and predictions (api/versioning.py) before reading them
+# again. A result written by another process is seen up to that much later.
+DATA_VERSION_TTL = 2
+
+# Prediction responses (api/predictions.py): in-process LRU size, optional
+# cache alias to share them between worker processes, and that cache's timeout.
+PREDICTION_CACHE = {
+    'max_entries': 1024,
+    'cache': None,
+    'timeout': 60 * 60,
+}
+
+# Live events (server-sent events). With several worker processes, run
+# `python manage.py event_relay` and point every worker at it, e.g. '127.0.0.1:8765'.
+EVENTS_RELAY = None
+
+# Directory `export_static` (command and background job) renders into; the
+# exporter replaces and deletes files there, so point it at a dedicated directory.
+STATIC_EXPORT_ROOT = None
+
+# Background jobs (api/jobs.py, run by `python manage.py run_jobs`): seconds
+# before the first retry of a failed job (doubled per attempt), and seconds
+# without a heartbeat after which a running job's worker is presumed dead.
+JOBS = {
+    'retry_backoff': 10,
+    'stale_after': 300,
+}
+
+# Prometheus metrics (`GET /metrics`). With several worker processes, set this
+# to a directory shared by all of them so a scrape reports every process.
+METRICS_DIR = None
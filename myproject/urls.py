@@ -3,11 +3,12 @@ from django.urls import path, include
 from django.conf import settings
 from django.conf.urls.static import static
 from api import views as api_views
+from api import async_views
 
 urlpatterns = [
     path('admin/', admin.site.urls),
     path('', api_views.index, name='index'),
-    path('dashboard/', api_views.dashboard, name='dashboard'),
+    path('dashboard/', async_views.dashboard, name='dashboard'),
     path('', include('api.urls')),  # Include API URLs at root
 ]
 
@@ -0,0 +1,55 @@
+// Progressive enhancement for api.widgets.AutocompleteSelect: a search box
+// above each select loads matching choices from the lookup endpoint.
+(function () {
+    function scopeParams(select) {
+        const scope = JSON.parse(select.dataset.autocompleteScope || '{}');
+        const params = new URLSearchParams();
+        Object.entries(scope).forEach(function ([param, field]) {
+            const input = select.form.elements[field];
+            if (input && input.value) params.set(param, input.value);
+        });
+        return params;
+    }
+
+    function load(select, query) {
+        const params = scopeParams(select);
+        params.set('q', query);
+        fetch(select.dataset.autocompleteUrl + '?' + params)
+            .then(function (response) { return response.json(); })
+            .then(function (data) {
+                const current = select.value;
+                const options = [select.options[0]];
+                if (current) options.push(select.selectedOptions[0]);
+                data.results.forEach(function (choice) {
+                    if (String(choice.id) !== current) options.push(new Option(choice.text, choice.id));
+                });
+                select.replaceChildren(...options);
+                select.value = current;
+            });
+    }
+
+    document.querySelectorAll('select[data-autocomplete-url]').forEach(function (select) {
+        const input = document.createElement('input');
+        input.type = 'search';
+        input.className = 'form-control form-control-sm mb-1';
+        input.placeholder = 'Type to search...';
+        select.parentNode.insertBefore(input, select);
+
+        let timer;
+        input.addEventListener('input', function () {
+            clearTimeout(timer);
+            timer = setTimeout(function () { load(select, input.value); }, 200);
+        });
+
+        // Reload (and clear) scoped choices when a field they depend on changes.
+        Object.values(JSON.parse(select.dataset.autocompleteScope || '{}')).forEach(function (field) {
+            const source = select.form.elements[field];
+            if (source) source.addEventListener('change', function () {
+                select.value = '';
+                load(select, input.value);
+            });
+        });
+
+        load(select, '');
+    });
+})();